@@ -0,0 +1,46 @@
+"""add_pain_assessment_jobs_table
+
+Revision ID: b7e41c9d2a10
+Revises: 12877e2393a7, 47612d72a90f
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e41c9d2a10'
+down_revision = ('12877e2393a7', '47612d72a90f')
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Create pain_assessment_jobs table (also merges the two current heads)
+    op.create_table(
+        'pain_assessment_jobs',
+        sa.Column('id', sa.String(36), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('engine', sa.String(20), nullable=False),
+        sa.Column('status', sa.String(20), nullable=False, server_default='queued'),
+        sa.Column('result', sa.Text(), nullable=True),
+        sa.Column('error_type', sa.String(50), nullable=True),
+        sa.Column('error_message', sa.Text(), nullable=True),
+        sa.Column('wait_ms', sa.Integer(), nullable=True),
+        sa.Column('service_ms', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_pain_assessment_jobs_user_id', 'pain_assessment_jobs', ['user_id'])
+    op.create_index('ix_pain_assessment_jobs_status', 'pain_assessment_jobs', ['status'])
+
+
+def downgrade() -> None:
+    # Drop pain_assessment_jobs table
+    op.drop_index('ix_pain_assessment_jobs_status', table_name='pain_assessment_jobs')
+    op.drop_index('ix_pain_assessment_jobs_user_id', table_name='pain_assessment_jobs')
+    op.drop_table('pain_assessment_jobs')
@@ -0,0 +1,265 @@
+"""
+Load test the remote assessment endpoints without spending quota
+
+Drives the FastAPI app at a target concurrency and reports throughput,
+latency percentiles, status codes, which path / model served each answer
+(fallback behaviour) and the server-side counters from /diagnostics (model
+router, result cache, request coalescing, inference client).
+
+By default the app runs in-process with REMOTE_MODEL_BACKEND=fake, so remote
+calls are answered by services/fake_remote_model.py; shape them with the
+FAKE_REMOTE_* variables (latency distribution, error and quota rates,
+exhausted models). Authentication is bypassed in-process, and each virtual
+client gets its own address so the per-IP rate limit does not dominate.
+/api/pain-assessment-ai is mounted on the in-process app when main.py does
+not mount it.
+
+With --url the same load is sent to a running server instead (pass --token,
+of an admin for the /diagnostics counters; that server's own backend and
+rate limits apply).
+
+Usage:
+    FAKE_REMOTE_LATENCY=lognormal:800:0.4 FAKE_REMOTE_QUOTA_RATE=0.05 \\
+        python benchmark_remote_path.py --endpoint /predict-eld --concurrency 16 --requests 400 --unique-images 40
+    FAKE_REMOTE_EXHAUSTED_MODELS=gemini-3-flash-preview python benchmark_remote_path.py --requests 100
+    python benchmark_remote_path.py --url http://localhost:8000 --token $TOKEN --images path/to/cats
+"""
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from types import SimpleNamespace
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp'}
+
+# Rate limit of RateLimitMiddleware per client address and minute
+REQUESTS_PER_CLIENT_ADDRESS = 50
+
+# Sections of the diagnostics endpoint included in the report
+STATS_SECTIONS = (
+    'model_router', 'model_pool', 'result_cache', 'coalescing',
+    'inference', 'routing', 'remote_responses', 'upload_optimizer',
+)
+
+
+def configure_fake_environment():
+    """Settings for an in-process run; must happen before the app is imported"""
+    os.environ.setdefault('REMOTE_MODEL_BACKEND', 'fake')
+    os.environ.setdefault('API_KEY', 'load-test')
+    os.environ.setdefault('AI_API_KEY', 'load-test')
+    if not os.getenv('DATABASE_URL'):
+        os.environ['DATABASE_URL'] = f"sqlite:///{Path(tempfile.mkdtemp()) / 'load_test.db'}"
+
+
+def synthetic_images(count, size=640, seed=0):
+    """Distinct JPEGs (random blocks of colour), so the cache sees `count` different images"""
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(seed)
+    images = []
+    for _ in range(count):
+        image = Image.new('RGB', (size, size), tuple(rng.randrange(256) for _ in range(3)))
+        draw = ImageDraw.Draw(image)
+        for _ in range(12):
+            x, y = rng.randrange(size), rng.randrange(size)
+            draw.rectangle([x, y, x + rng.randrange(20, size // 2), y + rng.randrange(20, size // 2)],
+                           fill=tuple(rng.randrange(256) for _ in range(3)))
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=90)
+        images.append(buffer.getvalue())
+    return images
+
+
+def load_images(images_dir, limit=None):
+    paths = sorted(p for p in Path(images_dir).rglob('*') if p.suffix.lower() in IMAGE_EXTENSIONS)
+    if limit:
+        paths = paths[:limit]
+    return [p.read_bytes() for p in paths]
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def describe(status, body):
+    """Outcome of one response: error type, serving path, model and cache flag"""
+    outcome = {'status': status}
+    if not isinstance(body, dict):
+        return outcome
+    detail = body.get('detail')
+    if isinstance(detail, dict):
+        outcome['error_type'] = detail.get('error_type')
+    elif status >= 400:
+        outcome['error_type'] = body.get('error_type') or str(detail)[:60]
+    outcome['served_by'] = body.get('served_by')
+    metadata = body.get('_processing_metadata') or {}
+    outcome['model'] = metadata.get('model_used')
+    outcome['cached'] = body.get('cached')
+    return outcome
+
+
+async def run_load(clients, endpoint, images, total, concurrency, form):
+    """Send `total` requests, `concurrency` at a time; returns per-request records and wall time"""
+    records = []
+    next_index = iter(range(total))
+
+    async def worker():
+        for i in next_index:
+            client = clients[i % len(clients)]
+            data = images[i % len(images)]
+            started = time.perf_counter()
+            try:
+                response = await client.post(endpoint, files={'file': (f'cat_{i}.jpg', data, 'image/jpeg')}, data=form)
+                try:
+                    body = response.json()
+                except ValueError:
+                    body = None
+                record = describe(response.status_code, body)
+            except Exception as e:
+                record = {'status': 'client_error', 'error_type': type(e).__name__}
+            record['latency_ms'] = (time.perf_counter() - started) * 1000.0
+            records.append(record)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return records, time.perf_counter() - started
+
+
+def summarize(records, wall_seconds):
+    latencies = sorted(r['latency_ms'] for r in records)
+    ok = [r for r in records if r['status'] == 200]
+
+    def counts(key, rows):
+        return dict(Counter(str(r.get(key)) for r in rows if r.get(key) is not None).most_common())
+
+    return {
+        'requests': len(records),
+        'wall_seconds': round(wall_seconds, 2),
+        'throughput_rps': round(len(records) / wall_seconds, 2) if wall_seconds else None,
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies), 1) if latencies else None,
+            **{f'p{q}': round(percentile(latencies, q), 1) for q in (50, 90, 95, 99) if latencies},
+            'max': round(latencies[-1], 1) if latencies else None,
+        },
+        'status_codes': counts('status', records),
+        'error_types': counts('error_type', records),
+        'served_by': counts('served_by', ok),
+        'models_used': counts('model', ok),
+        'cached': sum(1 for r in ok if r.get('cached')),
+    }
+
+
+async def fetch_stats(client):
+    """Server-side sections of /diagnostics (needs an admin token with --url)"""
+    try:
+        response = await client.get('/diagnostics')
+    except Exception as e:
+        return {'error': str(e)}
+    if response.status_code != 200:
+        return {'error': f"/diagnostics returned {response.status_code}"}
+    diagnostics = response.json()
+    return {name: diagnostics.get(name) for name in STATS_SECTIONS}
+
+
+async def in_process_clients(endpoint, count):
+    import httpx
+    import main
+    from core.auth import get_current_admin, get_current_user
+
+    app = main.app
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id=0, email='load-test@localhost')
+    app.dependency_overrides[get_current_admin] = lambda: SimpleNamespace(id=0, email='load-test@localhost')
+    if not any(getattr(route, 'path', None) == endpoint for route in app.routes):
+        if endpoint == '/api/pain-assessment-ai':
+            from routers import ai_processor
+            app.include_router(ai_processor.router)
+        else:
+            raise SystemExit(f"Unknown endpoint {endpoint}")
+    await app.router.startup()
+    return [
+        httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app, client=(f'10.0.{i // 250}.{i % 250 + 1}', 40000)),
+            base_url='http://load-test', timeout=None,
+        )
+        for i in range(count)
+    ]
+
+
+async def main_async(args):
+    import httpx
+
+    if args.images:
+        images = load_images(args.images, args.unique_images)
+    else:
+        images = synthetic_images(args.unique_images or args.requests, seed=args.seed)
+    if not images:
+        raise SystemExit('No images to send')
+
+    form = {'save_to_db': 'false'} if args.endpoint == '/api/pain-assessment-ai' else None
+    if args.url:
+        headers = {'Authorization': f'Bearer {args.token}'} if args.token else {}
+        clients = [httpx.AsyncClient(base_url=args.url, headers=headers, timeout=None)]
+    else:
+        client_count = max(args.concurrency, math.ceil(args.requests / REQUESTS_PER_CLIENT_ADDRESS))
+        clients = await in_process_clients(args.endpoint, client_count)
+
+    try:
+        records, wall_seconds = await run_load(clients, args.endpoint, images, args.requests, args.concurrency, form)
+        report = {
+            'endpoint': args.endpoint,
+            'concurrency': args.concurrency,
+            'unique_images': len(images),
+            **summarize(records, wall_seconds),
+            'server': await fetch_stats(clients[0]),
+        }
+        if not args.url:
+            from services.eld_processing_lib import REMOTE_MODEL_BACKEND
+            report['remote_backend'] = REMOTE_MODEL_BACKEND
+            if REMOTE_MODEL_BACKEND == 'fake':
+                from services.fake_remote_model import fake_backend
+                report['fake_remote'] = fake_backend.stats()
+    finally:
+        for client in clients:
+            await client.aclose()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the remote assessment endpoints')
+    parser.add_argument('--endpoint', default='/predict-eld',
+                        help='/predict-eld, /api/predict-eld or /api/pain-assessment-ai')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--unique-images', type=int, default=None,
+                        help='Distinct images to cycle through (fewer -> more cache hits and coalescing)')
+    parser.add_argument('--images', type=str, default=None, help='Directory of images (default: synthetic)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--url', type=str, default=None, help='Running server to load instead of the in-process app')
+    parser.add_argument('--token', type=str, default=None, help='Bearer token for --url')
+    parser.add_argument('--output', type=str, default=None, help='Write the JSON report here as well')
+    args = parser.parse_args()
+
+    if not args.url:
+        configure_fake_environment()
+        sys.path.insert(0, str(Path(__file__).parent))
+
+    report = asyncio.run(main_async(args))
+    print(json.dumps(report, indent=2, default=str))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, default=str))
+
+
+if __name__ == '__main__':
+    main()
@@ -379,4 +379,20 @@ class ReproductiveRecord(Base):
     date = Column(Date, nullable=True)
     contact_number = Column(String(50), nullable=True)
     owner_birthday = Column(Date, nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class PainAssessmentJob(Base):
+    __tablename__ = "pain_assessment_jobs"
+
+    id = Column(String(36), primary_key=True)  # UUID4, returned to the client
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    engine = Column(String(20), nullable=False)  # "eld" or "ai"
+    status = Column(String(20), nullable=False, default="queued", index=True)  # queued, running, succeeded, failed
+    result = Column(Text, nullable=True)  # JSON assessment result
+    error_type = Column(String(50), nullable=True)
+    error_message = Column(Text, nullable=True)
+    wait_ms = Column(Integer, nullable=True)  # Time spent queued
+    service_ms = Column(Integer, nullable=True)  # Time spent processing
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field, field_validator, model_validator, field_serializer
-from typing import Optional
+from typing import Optional, Any, Dict
 from datetime import datetime, date, time
 
 class AdminBase(BaseModel):
@@ -752,4 +752,20 @@ class PainAssessment(PainAssessmentBase):
         return data
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+
+class PainAssessmentJob(BaseModel):
+    job_id: str
+    status: str  # queued, running, succeeded, failed
+    engine: str
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    wait_ms: Optional[int] = None
+    service_ms: Optional[int] = None
+    result: Optional[Dict[str, Any]] = None
+    error_type: Optional[str] = None
+    error_message: Optional[str] = None
+    status_url: Optional[str] = None
+    events_url: Optional[str] = None
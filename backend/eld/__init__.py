@@ -6,6 +6,13 @@ model for feline pain assessment using the Magnifying Ensemble Method.
 
 Components:
 - eld_model.py: Core ELD implementation with 48-landmark detection
+- landmark_clustering.py: Grid-bucketed consensus clustering of landmark candidates
+- feature_schema.py: Fixed-layout float32 feature vectors for the pain classifier
+- feature_cache.py: Parallel, content-hash cached feature extraction for training
+- classifier_tuning.py: Cross-validated RandomForest search on accuracy, latency and size
+- forest_compiler.py: Flattened RandomForest for low-latency single-image prediction
+- model_registry.py: Lazy, process-wide cache of model artifacts with load cost reporting
+- instrumentation.py: Opt-in per-stage timing records and latency histograms
 - train_eld_model.py: Training script for the ELD model
 - requirements_eld.txt: ELD-specific dependencies
 - README_ELD.md: Comprehensive documentation
@@ -22,6 +29,8 @@ Architecture:
 """
 
 from .eld_model import FelinePainAssessmentELD, MagnifyingEnsemble, FelineFaceDetector, RegionDetector, SpecialistModel
+from .feature_schema import FeatureSchema, PainFeatureVector, ELD_FEATURE_SCHEMA
+from .model_registry import ModelRegistry, model_registry
 
 __version__ = "1.0.0"
 __author__ = "PawThos Team"
@@ -32,6 +41,11 @@ __all__ = [
     'MagnifyingEnsemble', 
     'FelineFaceDetector',
     'RegionDetector',
-    'SpecialistModel'
+    'SpecialistModel',
+    'FeatureSchema',
+    'PainFeatureVector',
+    'ELD_FEATURE_SCHEMA',
+    'ModelRegistry',
+    'model_registry'
 ]
 
@@ -1,18 +1,43 @@
 """
 Dataset Augmentation Script - Works with annotations/ and images/ folders
 Augments severe pain class from 31 samples to 200+ samples
+
+Augmentation runs on a process pool: each class's source images are planned
+up front (how many variants each one gets), sharded into small tasks and
+augmented with a seed derived from (--seed, class, filename, variant), so the
+output is identical for any --workers. Workers encode their images, which
+stream as bytes through a bounded queue to writer threads that only write
+them, and progress and throughput are reported per class. Sources that turn
+out to be unreadable are replaced by extra variants of the readable ones, so
+every class still reaches its target.
+
+Unchanged originals and annotations are linked into the output rather than
+copied (see dataset_materializer.py, --link-mode), and the output gets a
+dataset_manifest.json next to labels_clean.csv.
 """
+import os
 import cv2
+import time
+import queue
+import random
+import hashlib
+import threading
 import numpy as np
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from .dataset_materializer import DatasetMaterializer, LINK_MODES
+except ImportError:  # Run as a script from eld/
+    from dataset_materializer import DatasetMaterializer, LINK_MODES
 from albumentations import (
     Compose, Rotate, HorizontalFlip, RandomBrightnessContrast,
     ShiftScaleRotate, ElasticTransform, GaussianBlur, CLAHE,
     RandomGamma, HueSaturationValue
 )
 import json
-import shutil
 from tqdm import tqdm
 
 def create_augmentation_pipeline(class_type='severe'):
@@ -47,12 +72,147 @@ def create_augmentation_pipeline(class_type='severe'):
             RandomBrightnessContrast(brightness_limit=0.1, contrast_limit=0.1, p=0.3),
         ], p=1.0)
 
+# Source images per pool task: small enough to balance classes of a few dozen images
+SOURCES_PER_TASK = 4
+
+# Writes of encoded images are plain file I/O
+WRITER_THREADS = 4
+
+# Finished images waiting for a writer; bounds memory when writing falls behind
+WRITE_QUEUE_SIZE = 64
+
+AUGMENTATION_TYPES = {2: 'severe', 1: 'moderate', 0: 'no_pain'}
+
+
+def item_seed(seed: int, class_label: int, filename: str, aug_index: int) -> int:
+    """Seed of one augmented variant: depends only on what is generated, not on who generates it"""
+    key = f"{seed}:{class_label}:{filename}:{aug_index}".encode()
+    return int.from_bytes(hashlib.blake2b(key, digest_size=4).digest(), 'little')
+
+
+def plan_class(filenames: List[str], target_count: int, augmentations_per_image: int) -> List[Tuple[str, int]]:
+    """
+    Number of augmented variants for every source image of a class
+
+    Same allocation as generating serially: every original is kept, then
+    variants are added image by image (at most twice the average) until the
+    class reaches its target.
+    """
+    plan = []
+    total = 0
+    for filename in filenames:
+        total += 1
+        variants = 0
+        while total < target_count and variants < augmentations_per_image * 2:
+            variants += 1
+            total += 1
+        plan.append((filename, variants))
+    return plan
+
+
+# Augmentation pipelines of a pool worker, built once per type
+_pipelines: Dict[str, Compose] = {}
+
+
+def augment_sources(aug_type: str, class_label: int, seed: int,
+                    items: List[Tuple[str, str, str, int, int]]) -> List[dict]:
+    """
+    Augment (filename, image path, annotation path, first variant, end variant) items
+
+    Returns one result per item: whether the image could be read, its
+    annotation and the (filename, encoded image bytes) variants to write.
+    """
+    augmentation = _pipelines.get(aug_type)
+    if augmentation is None:
+        augmentation = _pipelines[aug_type] = create_augmentation_pipeline(aug_type)
+
+    results = []
+    for filename, image_path, annotation_path, first_variant, end_variant in items:
+        image = cv2.imread(image_path)
+        if image is None:
+            results.append({'filename': filename, 'ok': False, 'annotation': None, 'variants': []})
+            continue
+
+        annotation_data = None
+        if Path(annotation_path).exists():
+            with open(annotation_path, 'r') as f:
+                annotation_data = json.load(f)
+
+        # Convert BGR to RGB for albumentations
+        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        base_name = Path(filename).stem
+        ext = Path(filename).suffix
+        generated = []
+        for aug_count in range(first_variant, end_variant):
+            variant_seed = item_seed(seed, class_label, filename, aug_count)
+            random.seed(variant_seed)
+            np.random.seed(variant_seed)
+            if hasattr(augmentation, 'set_random_seed'):
+                # Newer albumentations draw from their own generator
+                augmentation.set_random_seed(variant_seed)
+            augmented = augmentation(image=image_rgb)['image']
+            # Convert back to BGR and encode here, so only bytes cross the process boundary
+            encoded, data = cv2.imencode(ext, cv2.cvtColor(augmented, cv2.COLOR_RGB2BGR))
+            if not encoded:
+                raise IOError(f"Could not encode {base_name}_aug_{aug_count:03d}{ext}")
+            generated.append((f"{base_name}_aug_{aug_count:03d}{ext}", data.tobytes()))
+        results.append({'filename': filename, 'ok': True, 'annotation': annotation_data, 'variants': generated})
+    return results
+
+
+class DatasetWriter:
+    """Bounded queue of file writes drained by a few threads"""
+
+    def __init__(self, threads: int = WRITER_THREADS, max_pending: int = WRITE_QUEUE_SIZE):
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._errors: List[BaseException] = []
+        self._threads = [threading.Thread(target=self._drain, daemon=True) for _ in range(threads)]
+        for thread in self._threads:
+            thread.start()
+
+    def _drain(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                fn, args = job
+                fn(*args)
+            except BaseException as e:
+                self._errors.append(e)
+            finally:
+                self._queue.task_done()
+
+    def submit(self, fn, *args):
+        """Queue a write; blocks while the queue is full"""
+        if self._errors:
+            raise self._errors[0]
+        self._queue.put((fn, args))
+
+    def close(self):
+        """Wait for every queued write, then stop the threads"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        if self._errors:
+            raise self._errors[0]
+
+
+def _write_image(materializer: DatasetMaterializer, path: Path, data: bytes):
+    with open(materializer.written(path), 'wb') as f:
+        f.write(data)
+
+
 def augment_dataset(
     input_images_dir: str,
     input_annotations_dir: str,
     labels_csv: str,
     output_dir: str,
-    target_counts: dict = {0: 800, 1: 600, 2: 200}
+    target_counts: dict = {0: 800, 1: 600, 2: 200},
+    workers: Optional[int] = None,
+    seed: int = 0,
+    link_mode: str = 'auto'
 ):
     """
     Augment dataset with annotations and images
@@ -63,9 +223,13 @@ def augment_dataset(
         labels_csv: Path to labels CSV file
         output_dir: Path to output directory
         target_counts: Target number of samples per class
+        workers: Augmentation processes (default: all cores; 1 runs in this process)
+        seed: Base seed; the same seed gives the same dataset for any worker count
+        link_mode: How unchanged files are placed: auto, reflink, hardlink or copy
     """
     # Load labels
     df = pd.read_csv(labels_csv)
+    workers = workers or os.cpu_count() or 1
     
     # Create output directories
     output_path = Path(output_dir)
@@ -79,133 +243,158 @@ def augment_dataset(
     
     # Track augmented files
     augmented_data = []
+    materializer = DatasetMaterializer(output_path, link_mode)
+    writer = DatasetWriter()
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
     
-    # Process each class
-    for class_label, target_count in target_counts.items():
-        class_data = df[df['pain_level'] == class_label].copy()
-        current_count = len(class_data)
-        
-        if current_count >= target_count:
-            print(f"Class {class_label}: Already has {current_count} samples (target: {target_count})")
-            # Just copy original files
-            for idx, row in class_data.iterrows():
-                filename = row['filename']
-                image_src = input_images_path / filename
-                annotation_src = input_annotations_path / f"{Path(filename).stem}.json"
-                
-                if image_src.exists():
-                    shutil.copy2(image_src, output_images_dir / filename)
-                if annotation_src.exists():
-                    shutil.copy2(annotation_src, output_annotations_dir / f"{Path(filename).stem}.json")
-                
-                augmented_data.append({
-                    'filename': filename,
-                    'pain_level': class_label
-                })
-            continue
-        
-        # Determine augmentation strategy
-        if class_label == 2:
-            aug_type = 'severe'
-            augmentations_per_image = (target_count + current_count - 1) // current_count  # Ceiling division
-        elif class_label == 1:
-            aug_type = 'moderate'
-            augmentations_per_image = (target_count + current_count - 1) // current_count
-        else:
-            aug_type = 'no_pain'
-            augmentations_per_image = max(1, (target_count + current_count - 1) // current_count)
-        
-        augmentation = create_augmentation_pipeline(aug_type)
-        
-        print(f"\nAugmenting Class {class_label} ({aug_type}):")
-        print(f"  Current: {current_count} samples")
-        print(f"  Target: {target_count} samples")
-        print(f"  Augmentations per image: ~{augmentations_per_image}")
-        
-        # Augment each image
-        total_generated = 0
-        for idx, row in tqdm(class_data.iterrows(), total=len(class_data), desc=f"Class {class_label}"):
-            filename = row['filename']
-            image_path = input_images_path / filename
-            annotation_path = input_annotations_path / f"{Path(filename).stem}.json"
+    try:
+        # Process each class
+        for class_label, target_count in target_counts.items():
+            class_data = df[df['pain_level'] == class_label].copy()
+            current_count = len(class_data)
             
-            if not image_path.exists():
-                print(f"Warning: {image_path} not found, skipping")
+            if current_count >= target_count:
+                print(f"Class {class_label}: Already has {current_count} samples (target: {target_count})")
+                # Just copy original files
+                for idx, row in class_data.iterrows():
+                    filename = row['filename']
+                    image_src = input_images_path / filename
+                    annotation_src = input_annotations_path / f"{Path(filename).stem}.json"
+                    
+                    if image_src.exists():
+                        writer.submit(materializer.place, image_src, output_images_dir / filename)
+                    if annotation_src.exists():
+                        writer.submit(materializer.place, annotation_src, output_annotations_dir / f"{Path(filename).stem}.json")
+                    
+                    augmented_data.append({
+                        'filename': filename,
+                        'pain_level': class_label
+                    })
+                    materializer.add_sample(filename, class_label, has_annotation=annotation_src.exists())
                 continue
             
-            # Load image
-            image = cv2.imread(str(image_path))
-            if image is None:
-                print(f"Warning: Could not load {image_path}, skipping")
-                continue
+            # Determine augmentation strategy
+            aug_type = AUGMENTATION_TYPES.get(class_label, 'no_pain')
+            augmentations_per_image = max(1, (target_count + current_count - 1) // current_count)  # Ceiling division
+            
+            print(f"\nAugmenting Class {class_label} ({aug_type}):")
+            print(f"  Current: {current_count} samples")
+            print(f"  Target: {target_count} samples")
+            print(f"  Augmentations per image: ~{augmentations_per_image}")
+            
+            sources = []
+            for filename in class_data['filename']:
+                if not (input_images_path / filename).exists():
+                    print(f"Warning: {input_images_path / filename} not found, skipping")
+                    continue
+                sources.append(filename)
+            plan = plan_class(sources, target_count, augmentations_per_image)
             
-            # Load annotation
-            annotation_data = None
-            if annotation_path.exists():
-                with open(annotation_path, 'r') as f:
-                    annotation_data = json.load(f)
+            # Results are written as they arrive; the CSV keeps the planned order.
+            # Only variant names are kept once written
+            results: Dict[str, dict] = {}
+            started = time.perf_counter()
+            images_written = 0
+            progress = tqdm(total=len(plan), desc=f"Class {class_label}")
             
-            # Convert BGR to RGB for albumentations
-            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            def handle(task_results):
+                nonlocal images_written
+                for result in task_results:
+                    progress.update(1)
+                    filename = result['filename']
+                    known = results.get(filename)
+                    variant_names = [aug_filename for aug_filename, _ in result['variants']]
+                    if known is None:
+                        results[filename] = dict(result, variants=variant_names)
+                    else:
+                        known['variants'].extend(variant_names)
+                    if not result['ok']:
+                        continue
+                    annotation_src = input_annotations_path / f"{Path(filename).stem}.json"
+                    annotation_data = result['annotation']
+                    if known is None:
+                        # Link original
+                        writer.submit(materializer.place, input_images_path / filename, output_images_dir / filename)
+                        if annotation_data:
+                            writer.submit(materializer.place, annotation_src, output_annotations_dir / f"{Path(filename).stem}.json")
+                        images_written += 1
+                    for aug_filename, encoded in result['variants']:
+                        writer.submit(_write_image, materializer, output_images_dir / aug_filename, encoded)
+                        # Link annotation (landmarks stay the same relative positions)
+                        # Note: In a real implementation, you'd transform landmarks too
+                        if annotation_data:
+                            writer.submit(materializer.place, annotation_src, output_annotations_dir / f"{Path(aug_filename).stem}.json")
+                    images_written += len(result['variants'])
             
-            # Copy original
-            dst_image = output_images_dir / filename
-            cv2.imwrite(str(dst_image), image)
+            def run(class_plan):
+                """Augment (filename, first variant, end variant) entries"""
+                items = [
+                    (filename, str(input_images_path / filename),
+                     str(input_annotations_path / f"{Path(filename).stem}.json"), first_variant, end_variant)
+                    for filename, first_variant, end_variant in class_plan
+                ]
+                tasks = [items[i:i + SOURCES_PER_TASK] for i in range(0, len(items), SOURCES_PER_TASK)]
+                if pool is None:
+                    for task in tasks:
+                        handle(augment_sources(aug_type, class_label, seed, task))
+                    return
+                # Keep a bounded number of tasks in flight so results cannot pile up in memory
+                pending = set()
+                for task in tasks:
+                    pending.add(pool.submit(augment_sources, aug_type, class_label, seed, task))
+                    if len(pending) >= workers * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            handle(future.result())
+                for future in pending:
+                    handle(future.result())
             
-            if annotation_data:
-                dst_annotation = output_annotations_dir / f"{Path(filename).stem}.json"
-                with open(dst_annotation, 'w') as f:
-                    json.dump(annotation_data, f)
+            run([(filename, 0, variants) for filename, variants in plan])
             
-            augmented_data.append({
-                'filename': filename,
-                'pain_level': class_label
-            })
-            total_generated += 1
+            # Unreadable sources only show up once a worker opens them; re-plan over
+            # the readable ones and add the variants they are now owed
+            readable = [filename for filename, _ in plan if results[filename]['ok']]
+            if readable and len(readable) < len(plan):
+                print(f"  {len(plan) - len(readable)} unreadable images, rebalancing over {len(readable)}")
+                top_up = []
+                for filename, variants in plan_class(readable, target_count, -(-target_count // len(readable))):
+                    generated = len(results[filename]['variants'])
+                    if variants > generated:
+                        top_up.append((filename, generated, variants))
+                progress.total += len(top_up)
+                progress.refresh()
+                run(top_up)
+            progress.close()
             
-            # Generate augmented versions
-            aug_count = 0
-            while total_generated < target_count and aug_count < augmentations_per_image * 2:  # Safety limit
-                augmented = augmentation(image=image_rgb)['image']
-                
-                # Convert back to BGR
-                augmented_bgr = cv2.cvtColor(augmented, cv2.COLOR_RGB2BGR)
-                
-                # Generate filename
-                base_name = Path(filename).stem
-                ext = Path(filename).suffix
-                aug_filename = f"{base_name}_aug_{aug_count:03d}{ext}"
-                
-                # Save augmented image
-                dst_aug = output_images_dir / aug_filename
-                cv2.imwrite(str(dst_aug), augmented_bgr)
-                
-                # Copy annotation (landmarks stay the same relative positions)
-                # Note: In a real implementation, you'd transform landmarks too
-                if annotation_data:
-                    aug_annotation = annotation_data.copy()
-                    dst_aug_annotation = output_annotations_dir / f"{base_name}_aug_{aug_count:03d}.json"
-                    with open(dst_aug_annotation, 'w') as f:
-                        json.dump(aug_annotation, f)
-                
-                augmented_data.append({
-                    'filename': aug_filename,
-                    'pain_level': class_label
-                })
-                total_generated += 1
-                aug_count += 1
-                
-                if total_generated >= target_count:
-                    break
+            elapsed = time.perf_counter() - started
+            for filename, _ in plan:
+                result = results.get(filename)
+                if result is None or not result['ok']:
+                    print(f"Warning: Could not load {input_images_path / filename}, skipping")
+                    continue
+                has_annotation = bool(result['annotation'])
+                augmented_data.append({'filename': filename, 'pain_level': class_label})
+                materializer.add_sample(filename, class_label, has_annotation=has_annotation)
+                for aug_filename in result['variants']:
+                    augmented_data.append({'filename': aug_filename, 'pain_level': class_label})
+                    materializer.add_sample(aug_filename, class_label, has_annotation=has_annotation)
+            print(f"  Generated {images_written} images in {elapsed:.1f}s "
+                  f"({images_written / elapsed if elapsed > 0 else 0:.1f} images/s)")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        writer.close()
     
     # Save augmented labels CSV
     augmented_df = pd.DataFrame(augmented_data)
     output_csv = output_path / 'labels_clean.csv'
     augmented_df.to_csv(output_csv, index=False)
+    manifest_path = materializer.write_manifest(source=str(labels_csv), seed=seed)
     
     print(f"\n✅ Augmentation complete!")
     print(f"   Output directory: {output_dir}")
     print(f"   Total images: {len(augmented_df)}")
+    print(f"   Files: {materializer.summary()} (manifest: {manifest_path.name})")
     print(f"   Class distribution:")
     print(augmented_df['pain_level'].value_counts().sort_index())
     
@@ -229,6 +418,12 @@ if __name__ == "__main__":
                        help='Target count for Moderate Pain class')
     parser.add_argument('--target-severe', type=int, default=200,
                        help='Target count for Severe Pain class')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='Augmentation processes (default: all cores)')
+    parser.add_argument('--seed', type=int, default=0,
+                       help='Base random seed (output does not depend on --workers)')
+    parser.add_argument('--link-mode', choices=LINK_MODES, default='auto',
+                       help='How unchanged originals and annotations are placed in the output')
     
     args = parser.parse_args()
     
@@ -241,6 +436,9 @@ if __name__ == "__main__":
             0: args.target_no_pain,
             1: args.target_moderate,
             2: args.target_severe
-        }
+        },
+        workers=args.workers,
+        seed=args.seed,
+        link_mode=args.link_mode
     )
 
@@ -0,0 +1,155 @@
+"""
+Benchmark the planned face detector against the previous full-resolution path
+
+For every image both FelineFaceDetector.detect_face (downscaled scan + ROI
+refinement) and detect_face_exhaustive (the previous behaviour) are timed,
+and their boxes compared by IoU. Reports latency percentiles, speedup,
+detection rates and agreement, plus how often the planned path answers with
+the frontal (human) cascade where the baseline found a cat face, e.g. a
+small cat face with a person in frame.
+
+Usage:
+    python benchmark_face_detection.py --images path/to/images [--max-edge 960] [--limit 200]
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+from eld_model import FelineFaceDetector
+from model_registry import model_registry
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+
+
+def box_iou(a, b):
+    """Intersection over union of two (x, y, w, h) boxes"""
+    ax1, ay1, ax2, ay2 = a[0], a[1], a[0] + a[2], a[1] + a[3]
+    bx1, by1, bx2, by2 = b[0], b[1], b[0] + b[2], b[1] + b[3]
+    iw = max(0, min(ax2, bx2) - max(ax1, bx1))
+    ih = max(0, min(ay2, by2) - max(ay1, by1))
+    inter = iw * ih
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union > 0 else 0.0
+
+
+def time_call(fn, image, repeat):
+    """Best-of-`repeat` wall time in milliseconds and the (last) result"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(image)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000.0, result
+
+
+def latency_summary(values):
+    values = np.asarray(values, dtype=np.float64)
+    if values.size == 0:
+        return {}
+    return {
+        'mean_ms': round(float(values.mean()), 2),
+        'p50_ms': round(float(np.percentile(values, 50)), 2),
+        'p95_ms': round(float(np.percentile(values, 95)), 2),
+        'max_ms': round(float(values.max()), 2),
+    }
+
+
+def benchmark(images_dir, max_edge=None, limit=None, repeat=1, iou_threshold=0.5):
+    """
+    Run both detection paths over a directory of images
+
+    Returns:
+        Summary dict (latency, detection rates, agreement)
+    """
+    paths = sorted(p for p in Path(images_dir).rglob('*') if p.suffix.lower() in IMAGE_EXTENSIONS)
+    if limit:
+        paths = paths[:limit]
+
+    detector = FelineFaceDetector(max_detection_edge=max_edge)
+    # Load the cascades before timing anything
+    model_registry.prewarm(['cat_face_cascade', 'frontal_face_cascade'])
+
+    baseline_ms, planned_ms, ious = [], [], []
+    baseline_found = planned_found = agree = 0
+    baseline_cat = planned_cat = cat_lost = 0
+    images = 0
+    for path in paths:
+        image = cv2.imread(str(path))
+        if image is None:
+            continue
+        images += 1
+        t_base, (base_box, base_source) = time_call(detector.locate_face_exhaustive, image, repeat)
+        t_plan, (plan_box, plan_source) = time_call(detector.locate_face, image, repeat)
+        baseline_ms.append(t_base)
+        planned_ms.append(t_plan)
+        baseline_found += base_box is not None
+        planned_found += plan_box is not None
+        baseline_cat += base_source == 'cat'
+        planned_cat += plan_source == 'cat'
+        # A cat face the baseline finds must not lose to a human face or a miss
+        cat_lost += base_source == 'cat' and plan_source != 'cat'
+
+        if base_box is None and plan_box is None:
+            agree += 1
+        elif base_box is not None and plan_box is not None:
+            iou = box_iou(base_box, plan_box)
+            ious.append(iou)
+            agree += iou >= iou_threshold
+
+    summary = {
+        'images': images,
+        'max_detection_edge': detector.max_detection_edge,
+        'baseline': dict(latency_summary(baseline_ms), faces_found=baseline_found, cat_faces_found=baseline_cat),
+        'planned': dict(latency_summary(planned_ms), faces_found=planned_found, cat_faces_found=planned_cat),
+        'cat_faces_lost': cat_lost,
+        'speedup': round(float(np.sum(baseline_ms) / np.sum(planned_ms)), 2) if planned_ms else None,
+        'agreement_rate': round(agree / images, 4) if images else None,
+        'mean_iou': round(float(np.mean(ious)), 4) if ious else None,
+        'iou_threshold': iou_threshold,
+    }
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark ELD face detection latency and accuracy')
+    parser.add_argument('--images', type=str, required=True,
+                       help='Directory of images to run detection on')
+    parser.add_argument('--max-edge', type=int, default=None,
+                       help='Long edge of the coarse detection image (default: ELD_DETECTION_MAX_EDGE or 960)')
+    parser.add_argument('--limit', type=int, default=None,
+                       help='Only benchmark the first N images')
+    parser.add_argument('--repeat', type=int, default=1,
+                       help='Runs per image; the fastest is reported')
+    parser.add_argument('--iou-threshold', type=float, default=0.5,
+                       help='IoU at which two boxes count as the same face')
+    parser.add_argument('--json', type=str, default=None,
+                       help='Optional path to write the summary as JSON')
+
+    args = parser.parse_args()
+
+    summary = benchmark(args.images, args.max_edge, args.limit, args.repeat, args.iou_threshold)
+
+    print("="*70)
+    print("FACE DETECTION BENCHMARK")
+    print("="*70)
+    print(f"Images: {summary['images']}  (coarse long edge: {summary['max_detection_edge']}px)")
+    for name in ('baseline', 'planned'):
+        stats = summary[name]
+        print(f"   {name:<9} faces={stats.get('faces_found')} (cat: {stats.get('cat_faces_found')})  mean={stats.get('mean_ms')} ms  "
+              f"p50={stats.get('p50_ms')} ms  p95={stats.get('p95_ms')} ms")
+    print(f"   speedup: {summary['speedup']}x")
+    print(f"   agreement (IoU >= {summary['iou_threshold']}): {summary['agreement_rate']}")
+    print(f"   mean IoU when both found a face: {summary['mean_iou']}")
+    print(f"   cat faces found by the baseline but not as a cat by the planned path: {summary['cat_faces_lost']}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+        print(f"\n✅ Summary saved to: {args.json}")
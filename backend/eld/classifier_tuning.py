@@ -0,0 +1,238 @@
+"""
+Hyperparameter search for the ELD RandomForest
+
+train_eld_classifier.py --mode tune evaluates RandomForest configurations
+on features extracted once (through the feature cache):
+
+- the training matrix is written to a .npy file that every pool worker opens
+  memory-mapped, so configurations are evaluated in parallel without
+  re-extracting or copying features per task
+- each configuration is scored with stratified k-fold CV; scaling and SMOTE
+  are fitted inside each fold on its training part only, so oversampled
+  points never leak into the fold they are scored on
+- next to accuracy and macro F1, every configuration records fit time,
+  single-image inference latency through CompiledForest (the path
+  FelinePainAssessmentELD serves with) and model size
+
+The configurations on the accuracy / latency Pareto frontier are reported
+and one is chosen: the fastest configuration whose accuracy is within a
+tolerance of the best, optionally under a latency budget.
+"""
+
+import itertools
+import os
+import pickle
+import random
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import StratifiedKFold
+from sklearn.preprocessing import StandardScaler
+
+try:
+    from .forest_compiler import CompiledForest
+except ImportError:  # Loaded as a top-level module (e.g. training scripts run from eld/)
+    from forest_compiler import CompiledForest
+
+# RandomForest parameters of train_classifier before tuning
+DEFAULT_CLASSIFIER_PARAMS = {
+    'n_estimators': 300,
+    'max_depth': 10,
+    'min_samples_split': 5,
+    'min_samples_leaf': 2,
+    'max_features': 'sqrt',
+}
+
+DEFAULT_PARAM_GRID = {
+    'n_estimators': [50, 100, 200, 300],
+    'max_depth': [6, 8, 10, 14, None],
+    'min_samples_split': [2, 5],
+    'min_samples_leaf': [1, 2, 4],
+    'max_features': ['sqrt', 0.5],
+}
+
+# Single-row predictions timed per configuration and fold
+LATENCY_SAMPLES = 50
+
+
+def grid_configs(param_grid: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """Every combination of the grid"""
+    names = list(param_grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(param_grid[name] for name in names))]
+
+
+def random_configs(param_grid: Dict[str, List[Any]], n_iter: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """n_iter distinct combinations drawn from the grid (all of them if it is smaller)"""
+    configs = grid_configs(param_grid)
+    if n_iter >= len(configs):
+        return configs
+    return random.Random(seed).sample(configs, n_iter)
+
+
+def smote_resample(X: np.ndarray, y: np.ndarray, random_state: int):
+    """Balance every class to the largest one, as train_classifier does"""
+    from imblearn.over_sampling import SMOTE
+
+    unique, counts = np.unique(y, return_counts=True)
+    # SMOTE needs more samples than neighbours in every class it oversamples
+    k_neighbors = min(3, int(counts.min()) - 1)
+    if len(unique) < 2 or k_neighbors < 1:
+        return X, y
+    smote = SMOTE(
+        sampling_strategy={int(label): int(counts.max()) for label in unique},
+        k_neighbors=k_neighbors,
+        random_state=random_state
+    )
+    return smote.fit_resample(X, y)
+
+
+def single_row_latency_ms(compiled: CompiledForest, X: np.ndarray, samples: int = LATENCY_SAMPLES) -> float:
+    """Median time of a one-row predict_with_proba, in milliseconds"""
+    rows = X[np.arange(samples) % len(X)]
+    compiled.predict_with_proba(rows[:1])  # Warm up
+    timings = []
+    for i in range(len(rows)):
+        started = time.perf_counter()
+        compiled.predict_with_proba(rows[i:i + 1])
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings) * 1000.0)
+
+
+# Training data opened by each pool worker
+_worker_data = None
+
+
+def _init_worker(x_path: str, y_path: str) -> None:
+    global _worker_data
+    _worker_data = (np.load(x_path, mmap_mode='r'), np.load(y_path))
+
+
+def evaluate_config(config: Dict[str, Any], folds: int, use_smote: bool, random_state: int,
+                    data=None) -> Dict[str, Any]:
+    """Cross-validated accuracy, fit time, inference latency and size of one configuration"""
+    X, y = data if data is not None else _worker_data
+    scores = {'accuracy': [], 'f1_macro': [], 'fit_seconds': [], 'latency_ms': [], 'model_bytes': [], 'nodes': []}
+    splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=random_state)
+    for train_index, test_index in splitter.split(np.zeros(len(y)), y):
+        scaler = StandardScaler()
+        X_train = scaler.fit_transform(X[train_index])
+        X_test = scaler.transform(X[test_index])
+        y_train = y[train_index]
+        if use_smote:
+            X_train, y_train = smote_resample(X_train, y_train, random_state)
+
+        clf = RandomForestClassifier(
+            **config,
+            class_weight='balanced',
+            random_state=random_state,
+            n_jobs=1  # Configurations already run in parallel
+        )
+        started = time.perf_counter()
+        clf.fit(X_train, y_train)
+        scores['fit_seconds'].append(time.perf_counter() - started)
+
+        compiled = CompiledForest.from_sklearn(clf)
+        _, y_pred = compiled.predict_with_proba(X_test)
+        scores['accuracy'].append(accuracy_score(y[test_index], y_pred))
+        scores['f1_macro'].append(f1_score(y[test_index], y_pred, average='macro'))
+        scores['latency_ms'].append(single_row_latency_ms(compiled, X_test))
+        scores['model_bytes'].append(len(pickle.dumps(clf, protocol=pickle.HIGHEST_PROTOCOL)))
+        scores['nodes'].append(len(compiled.left))
+
+    return {
+        'params': config,
+        'accuracy': float(np.mean(scores['accuracy'])),
+        'accuracy_std': float(np.std(scores['accuracy'])),
+        'f1_macro': float(np.mean(scores['f1_macro'])),
+        'fit_seconds': float(np.mean(scores['fit_seconds'])),
+        'latency_ms': float(np.mean(scores['latency_ms'])),
+        'model_bytes': int(np.mean(scores['model_bytes'])),
+        'nodes': int(np.mean(scores['nodes'])),
+    }
+
+
+def run_search(
+    X: np.ndarray,
+    y: np.ndarray,
+    configs: List[Dict[str, Any]],
+    folds: int = 5,
+    use_smote: bool = True,
+    workers: int = 1,
+    random_state: int = 42,
+    progress: Optional[Callable[[int], None]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Evaluate configurations with stratified CV
+
+    Args:
+        X, y: Training features and labels
+        configs: RandomForest keyword arguments to evaluate
+        folds: CV folds (reduced to the smallest class size if needed)
+        use_smote: Oversample each fold's training part
+        workers: Processes evaluating configurations (1 runs in this process)
+        random_state: Seed for folds, SMOTE and forests
+        progress: Called with 1 after every configuration
+
+    Returns:
+        One result per configuration, in the order of `configs`
+    """
+    folds = max(2, min(folds, int(np.unique(y, return_counts=True)[1].min())))
+    results: List[Optional[Dict[str, Any]]] = [None] * len(configs)
+
+    if workers > 1 and len(configs) > 1:
+        data_dir = tempfile.mkdtemp(prefix='eld_tune_')
+        try:
+            x_path = os.path.join(data_dir, 'X.npy')
+            y_path = os.path.join(data_dir, 'y.npy')
+            np.save(x_path, np.ascontiguousarray(X))
+            np.save(y_path, np.asarray(y))
+            with ProcessPoolExecutor(max_workers=min(workers, len(configs)), initializer=_init_worker,
+                                     initargs=(x_path, y_path)) as pool:
+                futures = {
+                    pool.submit(evaluate_config, config, folds, use_smote, random_state): i
+                    for i, config in enumerate(configs)
+                }
+                for future in as_completed(futures):
+                    results[futures[future]] = future.result()
+                    if progress is not None:
+                        progress(1)
+        finally:
+            shutil.rmtree(data_dir, ignore_errors=True)
+    else:
+        for i, config in enumerate(configs):
+            results[i] = evaluate_config(config, folds, use_smote, random_state, data=(X, y))
+            if progress is not None:
+                progress(1)
+    return results
+
+
+def pareto_frontier(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Results no other result beats on both accuracy and latency, fastest first"""
+    frontier = []
+    best_accuracy = -1.0
+    for result in sorted(results, key=lambda r: (r['latency_ms'], -r['accuracy'])):
+        if result['accuracy'] > best_accuracy:
+            frontier.append(result)
+            best_accuracy = result['accuracy']
+    return frontier
+
+
+def choose_config(results: List[Dict[str, Any]], accuracy_tolerance: float = 0.005,
+                  max_latency_ms: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """
+    The fastest frontier configuration within accuracy_tolerance of the best accuracy
+
+    With max_latency_ms only configurations at or under the budget are
+    considered; None when none is.
+    """
+    candidates = [r for r in pareto_frontier(results) if max_latency_ms is None or r['latency_ms'] <= max_latency_ms]
+    if not candidates:
+        return None
+    best_accuracy = max(r['accuracy'] for r in candidates)
+    return next(r for r in candidates if r['accuracy'] >= best_accuracy - accuracy_tolerance)
@@ -1,11 +1,29 @@
 """
 Create labels CSV file from images and annotations
 Optionally uses ELD model to predict pain levels as starting point
+
+Labelling a fresh dataset dump is parallel:
+
+- annotations are validated on a thread pool (the work is file reads)
+- ELD predictions run on a process pool; each worker loads one
+  FelinePainAssessmentELD and assesses batches of images through
+  assess_pain_batch, so specialist inference and classification run once
+  per batch instead of once per image
+- the model is loaded once in this process first, so a model that cannot load
+  falls back to a CSV without predictions instead of breaking the pool; if a
+  worker dies anyway, the remaining batches are predicted in this process
+- rows are appended to <output>.partial as batches finish. An interrupted run
+  picks up from that file (images already listed are not predicted again)
+  when it was written in the same mode (with or without --use-eld); the
+  finished CSV, in image order, replaces it at the end
 """
 import os
 import json
+import csv
 import pandas as pd
 import cv2
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 import argparse
 from tqdm import tqdm
@@ -14,18 +32,42 @@ import sys
 # Add backend to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+CSV_COLUMNS = ['filename', 'pain_level', 'has_annotation', 'annotation_file']
+
+# Images per assess_pain_batch call
+DEFAULT_BATCH_SIZE = 8
+
+# Label used when a prediction fails
+DEFAULT_PAIN_LEVEL = 1
+
+# First line of a .partial file: how its rows were labelled
+PARTIAL_MODE_PREFIX = '# mode='
+
 def load_annotation(annotation_path):
     """Load and validate annotation file"""
     try:
         with open(annotation_path, 'r') as f:
             data = json.load(f)
-        
+
         if 'labels' in data and len(data['labels']) >= 10:
             return True, data
         return False, None
     except:
         return False, None
 
+def pain_level_from_result(result):
+    """Map an assess_pain result to 0, 1 or 2 (None when the assessment failed)"""
+    if not result or not result.get('success'):
+        return None
+    pain_level_str = result.get('pain_level', 'Level 1 (Mild Pain)')
+    if 'Level 0' in pain_level_str or 'No Pain' in pain_level_str:
+        return 0
+    elif 'Level 1' in pain_level_str or 'Mild' in pain_level_str:
+        return 1
+    elif 'Level 2' in pain_level_str or 'Severe' in pain_level_str:
+        return 2
+    return 1  # Default
+
 def predict_with_eld(image_path, eld_model=None):
     """Predict pain level using ELD model"""
     if eld_model is None:
@@ -35,86 +77,136 @@ def predict_with_eld(image_path, eld_model=None):
         except Exception as e:
             print(f"⚠️  Could not load ELD model: {e}")
             return None
-    
+
     try:
         image = cv2.imread(str(image_path))
         if image is None:
             return None
-        
-        result = eld_model.assess_pain(image)
-        
-        if result.get('success'):
-            pain_level_str = result.get('pain_level', 'Level 1 (Mild Pain)')
-            # Map to 0, 1, 2
-            if 'Level 0' in pain_level_str or 'No Pain' in pain_level_str:
-                return 0
-            elif 'Level 1' in pain_level_str or 'Mild' in pain_level_str:
-                return 1
-            elif 'Level 2' in pain_level_str or 'Severe' in pain_level_str:
-                return 2
-            else:
-                return 1  # Default
-        return None
+        return pain_level_from_result(eld_model.assess_pain(image))
     except Exception as e:
         return None
 
-def create_labels_csv(
-    images_dir,
-    annotations_dir,
-    output_csv='labels_clean.csv',
-    use_eld_predictions=False,
-    eld_model=None
-):
+# Per-process model for pool workers
+_worker_model = None
+
+def _init_worker():
+    global _worker_model
+    from eld.eld_model import FelinePainAssessmentELD
+    # Each worker assesses one batch at a time; library threads would only oversubscribe the pool
+    cv2.setNumThreads(1)
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+    _worker_model = FelinePainAssessmentELD()
+
+def predict_batch(image_paths, eld_model=None):
+    """Pain levels (None where prediction failed) for a batch of images, in input order"""
+    eld_model = eld_model if eld_model is not None else _worker_model
+    images = [cv2.imread(str(path)) for path in image_paths]
+    try:
+        results = eld_model.assess_pain_batch(images)
+    except Exception as e:
+        print(f"⚠️  Batch prediction failed ({e}); assessing images one at a time")
+        results = []
+        for image in images:
+            try:
+                results.append(eld_model.assess_pain(image) if image is not None else None)
+            except Exception:
+                results.append(None)
+    return [pain_level_from_result(result) for result in results]
+
+def find_valid_pairs(images_dir, annotations_dir, threads=None):
     """
-    Create labels CSV from images and annotations
-    
-    Args:
-        images_dir: Directory with images
-        annotations_dir: Directory with JSON annotations
-        output_csv: Output CSV file path
-        use_eld_predictions: If True, use ELD model to predict pain levels
-        eld_model: Optional pre-loaded ELD model
+    Match images to annotations, validating annotations on a thread pool
+
+    Returns:
+        valid_pairs: (image path, annotation path, stem) in image order
+        missing_annotations: Names of images without a valid annotation
     """
     images_path = Path(images_dir)
     annotations_path = Path(annotations_dir)
-    
+
     # Get all image files
     image_files = []
     for ext in ['*.png', '*.jpg', '*.jpeg', '*.PNG', '*.JPG', '*.JPEG']:
         image_files.extend(list(images_path.glob(ext)))
-    
+
     print(f"📊 Found {len(image_files)} images")
-    
+
     # Get all annotation files
     annotation_files = {ann.stem: ann for ann in annotations_path.glob('*.json')}
     print(f"📊 Found {len(annotation_files)} annotations")
-    
-    # Match images to annotations
+
+    def check(img_file):
+        ann_file = annotation_files.get(img_file.stem)
+        return ann_file is not None and load_annotation(ann_file)[0]
+
+    print("\n🔍 Matching images to annotations...")
+    threads = threads or min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        valid = list(tqdm(pool.map(check, image_files), total=len(image_files), desc="Processing"))
+
     valid_pairs = []
     missing_annotations = []
-    
-    print("\n🔍 Matching images to annotations...")
-    for img_file in tqdm(image_files, desc="Processing"):
-        stem = img_file.stem
-        
-        if stem in annotation_files:
-            is_valid, _ = load_annotation(annotation_files[stem])
-            if is_valid:
-                valid_pairs.append((img_file, annotation_files[stem], stem))
-            else:
-                missing_annotations.append(img_file.name)
+    for img_file, is_valid in zip(image_files, valid):
+        if is_valid:
+            valid_pairs.append((img_file, annotation_files[img_file.stem], img_file.stem))
         else:
             missing_annotations.append(img_file.name)
-    
+    return valid_pairs, missing_annotations
+
+def partial_mode(partial_csv):
+    """Mode ('eld' or 'manual') recorded in a .partial file, None if it has none"""
+    with open(partial_csv, newline='') as f:
+        first_line = f.readline().strip()
+    return first_line[len(PARTIAL_MODE_PREFIX):] if first_line.startswith(PARTIAL_MODE_PREFIX) else None
+
+def read_partial(partial_csv):
+    """Rows of an interrupted run, keyed by filename"""
+    with open(partial_csv, newline='') as f:
+        lines = (line for line in f if not line.startswith('#'))
+        return {row['filename']: row for row in csv.DictReader(lines) if row.get('filename')}
+
+def create_labels_csv(
+    images_dir,
+    annotations_dir,
+    output_csv='labels_clean.csv',
+    use_eld_predictions=False,
+    eld_model=None,
+    workers=None,
+    batch_size=DEFAULT_BATCH_SIZE,
+    threads=None,
+    resume=True
+):
+    """
+    Create labels CSV from images and annotations
+
+    Args:
+        images_dir: Directory with images
+        annotations_dir: Directory with JSON annotations
+        output_csv: Output CSV file path
+        use_eld_predictions: If True, use ELD model to predict pain levels
+        eld_model: Optional pre-loaded ELD model (used when predicting in this process)
+        workers: Prediction processes (default: all cores; 1 predicts in this process)
+        batch_size: Images per batched ELD assessment
+        threads: Annotation validation threads (default: 4 per core, at most 32)
+        resume: Continue from <output_csv>.partial left by an interrupted run
+    """
+    valid_pairs, missing_annotations = find_valid_pairs(images_dir, annotations_dir, threads)
+
     print(f"✅ Found {len(valid_pairs)} valid image-annotation pairs")
     if missing_annotations:
         print(f"⚠️  {len(missing_annotations)} images without valid annotations")
-    
-    # Create CSV entries
-    entries = []
-    
+
+    workers = workers or os.cpu_count() or 1
+    batch_size = max(1, batch_size)
+
     if use_eld_predictions:
         print("\n🤖 Predicting pain levels using ELD model...")
+        # Loaded here even when predicting on workers: a model that cannot load would break the
+        # pool, and this copy predicts the remaining batches if a worker dies
         if eld_model is None:
             try:
                 from eld.eld_model import FelinePainAssessmentELD
@@ -124,34 +216,77 @@ def create_labels_csv(
                 print(f"❌ Could not load ELD model: {e}")
                 print("   Creating CSV without predictions (you'll need to label manually)")
                 use_eld_predictions = False
-    
+
+    # Rows finished by an interrupted run in the same mode
+    mode = 'eld' if use_eld_predictions else 'manual'
+    partial_csv = Path(f"{output_csv}.partial")
+    done = {}
+    if resume and partial_csv.exists() and partial_mode(partial_csv) == mode:
+        done = read_partial(partial_csv)
+        print(f"\n♻️  Resuming: {len(done)} entries already in {partial_csv}")
+    elif partial_csv.exists():
+        if resume:
+            print(f"\n♻️  {partial_csv} was not written in '{mode}' mode, starting over")
+        partial_csv.unlink()
+
+    todo = [pair for pair in valid_pairs if pair[0].name not in done]
+
     print("\n📝 Creating CSV entries...")
-    for img_file, ann_file, stem in tqdm(valid_pairs, desc="Creating entries"):
-        filename = img_file.name
-        
-        if use_eld_predictions and eld_model:
-            pain_level = predict_with_eld(img_file, eld_model)
-            if pain_level is None:
-                pain_level = 1  # Default to moderate if prediction fails
+    new_file = not partial_csv.exists() or partial_csv.stat().st_size == 0
+    with open(partial_csv, 'a', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+        if new_file:
+            f.write(f"{PARTIAL_MODE_PREFIX}{mode}\n")
+            writer.writeheader()
+
+        def write_rows(pairs, pain_levels):
+            for (img_file, ann_file, _), pain_level in zip(pairs, pain_levels):
+                if use_eld_predictions and pain_level is None:
+                    pain_level = DEFAULT_PAIN_LEVEL  # Default to moderate if prediction fails
+                row = {
+                    'filename': img_file.name,
+                    'pain_level': pain_level if pain_level is not None else '',
+                    'has_annotation': True,
+                    'annotation_file': ann_file.name
+                }
+                writer.writerow(row)
+                done[img_file.name] = row
+            # Flushed per batch, so an interruption loses at most the batches in flight
+            f.flush()
+
+        if not use_eld_predictions:
+            write_rows(todo, [None] * len(todo))
         else:
-            pain_level = None  # Will need manual labeling
-        
-        entries.append({
-            'filename': filename,
-            'pain_level': pain_level if pain_level is not None else '',
-            'has_annotation': True,
-            'annotation_file': ann_file.name
-        })
-    
-    # Create DataFrame
-    df = pd.DataFrame(entries)
-    
-    # Save CSV
-    df.to_csv(output_csv, index=False)
-    
+            batches = [todo[start:start + batch_size] for start in range(0, len(todo), batch_size)]
+            with tqdm(total=len(todo), desc="Predicting") as progress:
+                if workers > 1 and len(batches) > 1:
+                    try:
+                        with ProcessPoolExecutor(max_workers=min(workers, len(batches)), initializer=_init_worker) as pool:
+                            futures = [(batch, pool.submit(predict_batch, [img for img, _, _ in batch])) for batch in batches]
+                            for batch, future in futures:
+                                write_rows(batch, future.result())
+                                progress.update(len(batch))
+                            batches = []
+                    except BrokenProcessPool as e:
+                        print(f"\n⚠️  Prediction workers failed ({e}); predicting the rest in this process")
+                        batches = [batch for batch in batches if batch[0][0].name not in done]
+                for batch in batches:
+                    write_rows(batch, predict_batch([img for img, _, _ in batch], eld_model))
+                    progress.update(len(batch))
+
+    # Final CSV in image order; rows whose image is gone are dropped
+    df = pd.DataFrame(
+        [done[img_file.name] for img_file, _, _ in valid_pairs if img_file.name in done],
+        columns=CSV_COLUMNS
+    )
+    tmp_csv = Path(f"{output_csv}.tmp")
+    df.to_csv(tmp_csv, index=False)
+    os.replace(tmp_csv, output_csv)
+    partial_csv.unlink()
+
     print(f"\n✅ Created {output_csv}")
     print(f"   Total entries: {len(df)}")
-    
+
     if use_eld_predictions:
         print(f"\n📊 Predicted distribution:")
         print(df['pain_level'].value_counts().sort_index())
@@ -162,7 +297,7 @@ def create_labels_csv(
         print(f"   - 0 = No Pain")
         print(f"   - 1 = Moderate Pain")
         print(f"   - 2 = Severe Pain")
-    
+
     return output_csv
 
 if __name__ == "__main__":
@@ -175,14 +310,24 @@ if __name__ == "__main__":
                        help='Output CSV file')
     parser.add_argument('--use-eld', action='store_true',
                        help='Use ELD model to predict pain levels')
-    
+    parser.add_argument('--workers', type=int, default=None,
+                       help='Prediction processes, each loading one ELD model (default: all cores)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                       help='Images per batched ELD assessment')
+    parser.add_argument('--threads', type=int, default=None,
+                       help='Annotation validation threads')
+    parser.add_argument('--restart', action='store_true',
+                       help='Ignore the .partial file of an interrupted run and start over')
+
     args = parser.parse_args()
-    
+
     create_labels_csv(
         images_dir=args.images,
         annotations_dir=args.annotations,
         output_csv=args.output,
-        use_eld_predictions=args.use_eld
+        use_eld_predictions=args.use_eld,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        threads=args.threads,
+        resume=not args.restart
     )
-
-
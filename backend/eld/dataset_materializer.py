@@ -0,0 +1,170 @@
+"""
+Materialize dataset variants without duplicating files
+
+Filtered and augmented datasets keep most of their files unchanged, and
+copying them made every variant a full duplicate of the source. A
+DatasetMaterializer places unchanged files into an output dataset with the
+cheapest method the filesystem allows:
+
+- reflink: copy-on-write clone (Btrfs, XFS, APFS-style); independent of the
+  source, no extra space until either side is modified
+- hardlink: the same inode under a second name; no extra space
+- copy: full copy, when neither works (e.g. across filesystems)
+
+"auto" tries them in that order and stops probing a method for the rest of
+the run once the filesystem rejects it. Because hardlinked outputs share
+their source's inode, an existing output file is always unlinked before it
+is replaced or rewritten (claim()), so regenerating a dataset can never
+write through a link into the source.
+
+Every materialized dataset gets a dataset_manifest.json listing its samples
+(filename, label, image and annotation paths relative to the dataset), so
+downstream steps read the manifest instead of re-globbing directories.
+"""
+
+import errno
+import json
+import os
+import shutil
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+LINK_MODES = ('auto', 'reflink', 'hardlink', 'copy')
+
+MANIFEST_NAME = 'dataset_manifest.json'
+MANIFEST_VERSION = 1
+
+# Linux FICLONE ioctl (_IOW(0x94, 9, int))
+_FICLONE = 0x40049409
+
+# Errors meaning "this filesystem / pair of directories cannot do that"
+_UNSUPPORTED = {errno.EXDEV, errno.EPERM, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.ENOSYS, errno.EMLINK}
+
+
+def reflink(src: Path, dst: Path) -> None:
+    """Clone src to dst copy-on-write; raises OSError where unsupported"""
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError(errno.ENOSYS, 'reflink is not supported on this platform')
+    with open(src, 'rb') as source, open(dst, 'wb') as target:
+        try:
+            fcntl.ioctl(target.fileno(), _FICLONE, source.fileno())
+        except OSError:
+            target.close()
+            os.unlink(dst)
+            raise
+    shutil.copystat(src, dst)
+
+
+class DatasetMaterializer:
+    """Places files into an output dataset and records its manifest"""
+
+    def __init__(self, output_dir: Path, mode: str = 'auto'):
+        if mode not in LINK_MODES:
+            raise ValueError(f"Unknown link mode '{mode}'; use one of {', '.join(LINK_MODES)}")
+        self.output_dir = Path(output_dir)
+        self.mode = mode
+        self._methods = ['reflink', 'hardlink', 'copy'] if mode == 'auto' else [mode] + (['copy'] if mode != 'copy' else [])
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {'reflink': 0, 'hardlink': 0, 'copy': 0, 'written': 0}
+        self.samples: List[dict] = []
+
+    @staticmethod
+    def claim(dst: Path) -> Path:
+        """Remove whatever is at dst, so writing it never modifies a linked source"""
+        try:
+            os.unlink(dst)
+        except FileNotFoundError:
+            pass
+        return dst
+
+    def place(self, src: Path, dst: Path) -> str:
+        """Make dst a reflink, hardlink or copy of src; returns the method used"""
+        self.claim(dst)
+        for method in list(self._methods):
+            try:
+                if method == 'reflink':
+                    reflink(src, dst)
+                elif method == 'hardlink':
+                    os.link(src, dst)
+                else:
+                    shutil.copy2(src, dst)
+            except OSError as e:
+                if method == 'copy' or e.errno not in _UNSUPPORTED:
+                    raise
+                with self._lock:
+                    # Unsupported here; do not probe it again this run
+                    if method in self._methods and len(self._methods) > 1:
+                        self._methods.remove(method)
+                continue
+            with self._lock:
+                self.counts[method] += 1
+            return method
+        raise OSError(errno.EIO, f"Could not materialize {dst}")
+
+    def written(self, dst: Path) -> Path:
+        """Claim dst for a newly generated file and count it"""
+        with self._lock:
+            self.counts['written'] += 1
+        return self.claim(dst)
+
+    def add_sample(self, filename: str, pain_level: int, image: Optional[str] = None,
+                   annotation: Optional[str] = None, has_annotation: bool = True) -> None:
+        """
+        Record one dataset sample for the manifest
+
+        image / annotation are paths relative to the dataset directory
+        (default images/<filename> and annotations/<stem>.json).
+        """
+        if has_annotation:
+            annotation = annotation or f"annotations/{Path(filename).stem}.json"
+        self.samples.append({
+            'filename': filename,
+            'pain_level': int(pain_level),
+            'image': image or f"images/{filename}",
+            'annotation': annotation if has_annotation else None,
+        })
+
+    def write_manifest(self, **metadata) -> Path:
+        """Write dataset_manifest.json for the recorded samples"""
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'samples': self.samples,
+            'materialized': dict(self.counts),
+            **metadata,
+        }
+        path = self.output_dir / MANIFEST_NAME
+        tmp_path = path.with_suffix('.json.tmp')
+        tmp_path.write_text(json.dumps(manifest, indent=1))
+        os.replace(tmp_path, path)
+        return path
+
+    def summary(self) -> str:
+        return ', '.join(f"{count} {method}" for method, count in self.counts.items() if count)
+
+
+def read_manifest(dataset_dir: Path) -> Optional[pd.DataFrame]:
+    """
+    Samples of a materialized dataset, or None when it has no manifest
+
+    Returns a frame with filename, pain_level and absolute image_path /
+    annotation_path columns.
+    """
+    dataset_dir = Path(dataset_dir)
+    path = dataset_dir / MANIFEST_NAME
+    if not path.exists():
+        return None
+    manifest = json.loads(path.read_text())
+    samples = manifest.get('samples', [])
+    return pd.DataFrame({
+        'filename': [s['filename'] for s in samples],
+        'pain_level': [int(s['pain_level']) for s in samples],
+        'image_path': [dataset_dir / s['image'] for s in samples],
+        'annotation_path': [dataset_dir / s['annotation'] if s.get('annotation') else None for s in samples],
+    })
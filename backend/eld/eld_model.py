@@ -9,41 +9,191 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import StandardScaler
 import joblib
 import os
+from functools import partial
 from typing import List, Tuple, Dict, Optional, Any
 import logging
 
+try:
+    from .landmark_clustering import cluster_landmarks, select_consensus_landmarks, DEFAULT_CLUSTER_THRESHOLD
+    from .feature_schema import ELD_FEATURE_SCHEMA, ELD_FEATURE_NAMES, PainFeatureVector, TEXTURE_LANDMARKS, TEXTURE_PATCH_RADIUS
+    from .forest_compiler import CompiledForest
+    from .model_registry import model_registry
+    from . import instrumentation
+except ImportError:  # Loaded as a top-level module (e.g. training scripts run from eld/)
+    from landmark_clustering import cluster_landmarks, select_consensus_landmarks, DEFAULT_CLUSTER_THRESHOLD
+    from feature_schema import ELD_FEATURE_SCHEMA, ELD_FEATURE_NAMES, PainFeatureVector, TEXTURE_LANDMARKS, TEXTURE_PATCH_RADIUS
+    from forest_compiler import CompiledForest
+    from model_registry import model_registry
+    import instrumentation
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def _resolve_cat_cascade_path() -> str:
+    """Locate the cat face cascade XML (raises FileNotFoundError if missing)"""
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    # Preferred new location
+    cascade_candidates = [
+        os.path.join(base_dir, "models", "haarcascade_frontalcatface_extended.xml"),
+        # Legacy location (backward compatibility)
+        os.path.join(base_dir, "haarcascade_frontalcatface_extended.xml"),
+    ]
+    cascade_path = next((p for p in cascade_candidates if os.path.exists(p)), None)
+    if not cascade_path:
+        logger.error("Cat face cascade XML not found in expected locations: %s", cascade_candidates)
+        raise FileNotFoundError("haarcascade_frontalcatface_extended.xml not found. Place it under backend-python/models or backend-python.")
+    return cascade_path
+
+
+def _load_cat_cascade(cascade_path: str) -> cv2.CascadeClassifier:
+    cascade = cv2.CascadeClassifier(cascade_path)
+    if cascade.empty():
+        logger.error("Failed to load cat cascade from %s (classifier is empty)", cascade_path)
+        raise RuntimeError(f"Failed to load Haar cascade from {cascade_path}")
+    logger.info("Loaded cat face cascade from: %s", cascade_path)
+    return cascade
+
+
+def _load_frontal_face_cascade() -> cv2.CascadeClassifier:
+    return cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+
+
+# Long edge (pixels) of the downscaled image the face cascades scan first
+DETECTION_MAX_EDGE = int(os.getenv("ELD_DETECTION_MAX_EDGE", "960"))
+
+# Cascade parameters shared by every detection stage
+DETECTION_SCALE_FACTOR = 1.05
+DETECTION_MIN_NEIGHBORS = 3
+DETECTION_MIN_SIZE = 48
+# The cat cascade is trained on 24x24 windows; smaller minimums find nothing
+CASCADE_WINDOW = 24
+
+# ROI refinement: margin around the coarse box and accepted size range (fractions of its side)
+REFINE_MARGIN = 0.25
+REFINE_SIZE_RANGE = (0.7, 1.4)
+
+
 class FelineFaceDetector:
     """Step 1: Face Detection - Finds the general location of the cat's face"""
     
-    def __init__(self):
-            # Load cat face cascade classifier with robust path resolution
-            import os
-            base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            # Preferred new location
-            cascade_candidates = [
-                os.path.join(base_dir, "models", "haarcascade_frontalcatface_extended.xml"),
-                # Legacy location (backward compatibility)
-                os.path.join(base_dir, "haarcascade_frontalcatface_extended.xml"),
-            ]
-            cascade_path = next((p for p in cascade_candidates if os.path.exists(p)), None)
-            if not cascade_path:
-                logger.error("Cat face cascade XML not found in expected locations: %s", cascade_candidates)
-                raise FileNotFoundError("haarcascade_frontalcatface_extended.xml not found. Place it under backend-python/models or backend-python.")
-            self.cat_cascade = cv2.CascadeClassifier(cascade_path)
-            if self.cat_cascade.empty():
-                logger.error("Failed to load cat cascade from %s (classifier is empty)", cascade_path)
-                raise RuntimeError(f"Failed to load Haar cascade from {cascade_path}")
-            logger.info("Loaded cat face cascade from: %s", cascade_path)
-            
-            # Alternative: Use general face cascade as fallback
-            self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        
+    def __init__(self, max_detection_edge: Optional[int] = None):
+        # Resolve the path eagerly so a missing file still fails at construction;
+        # the cascades themselves are loaded once per process on first detection
+        self.cascade_path = _resolve_cat_cascade_path()
+        # Concurrent detectMultiScale calls on one CascadeClassifier corrupt its
+        # scale data, so every thread gets its own
+        model_registry.register('cat_face_cascade', partial(_load_cat_cascade, self.cascade_path), per_thread=True)
+        # Alternative: Use general face cascade as fallback
+        model_registry.register('frontal_face_cascade', _load_frontal_face_cascade, per_thread=True)
+        self.max_detection_edge = max_detection_edge or DETECTION_MAX_EDGE
+
+    @property
+    def cat_cascade(self) -> cv2.CascadeClassifier:
+        return model_registry.get('cat_face_cascade')
+
+    @property
+    def face_cascade(self) -> cv2.CascadeClassifier:
+        return model_registry.get('frontal_face_cascade')
+
     def detect_face(self, image: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
-        """Detect cat face and return bounding box (x, y, w, h) with tuned params and multi-scale retries"""
+        """Detect cat face and return bounding box (x, y, w, h) in original image coordinates"""
+        return self.locate_face(image)[0]
+
+    def locate_face(self, image: np.ndarray) -> Tuple[Optional[Tuple[int, int, int, int]], Optional[str]]:
+        """
+        Face bounding box (x, y, w, h) and the cascade that found it ('cat' or 'frontal')
+
+        Only a 'cat' box means a cat face was recognised; the frontal (human)
+        cascade is a fallback for landmark placement. (None, None) if no face.
+
+        Detection plan:
+        1. Cat cascade on one grayscale copy downscaled so its long edge is at
+           most max_detection_edge
+        2. A coarse hit is refined at full resolution inside a small ROI,
+           scanning only window sizes close to the coarse box
+        3. On a miss, the cat cascade escalates one pyramid level: twice the
+           coarse resolution for downscaled images, a 1.5x upscale otherwise
+        4. Only if the cat cascade misses on every level, the frontal cascade
+           runs the same levels
+        """
+        try:
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+            height, width = gray.shape[:2]
+            scale = min(1.0, self.max_detection_edge / float(max(height, width)))
+
+            if scale < 1.0:
+                # Coarse level, then one level at twice the resolution (capped at full size).
+                # The cascade window floor means the second level still reaches faces of
+                # roughly DETECTION_MIN_SIZE pixels in the original image.
+                level_scales = (scale, min(1.0, 2.0 * scale))
+            else:
+                level_scales = (1.0, 1.5)
+            levels: Dict[float, np.ndarray] = {}
+
+            def level_image(level_scale: float) -> np.ndarray:
+                # Each level is resized once and shared by both cascades
+                if level_scale not in levels:
+                    levels[level_scale] = gray if level_scale == 1.0 else cv2.resize(
+                        gray, (max(1, round(width * level_scale)), max(1, round(height * level_scale))),
+                        interpolation=cv2.INTER_AREA if level_scale < 1.0 else cv2.INTER_CUBIC)
+                return levels[level_scale]
+
+            for source, cascade in self._cascades():
+                for level_scale in level_scales:
+                    min_size = (max(CASCADE_WINDOW, int(DETECTION_MIN_SIZE * level_scale))
+                                if level_scale < 1.0 else DETECTION_MIN_SIZE)
+                    face = self._detect_largest(cascade, level_image(level_scale), min_size)
+                    if face is None:
+                        continue
+                    box = tuple(int(v / level_scale) if level_scale > 1.0 else int(round(v / level_scale))
+                                for v in face)
+                    if level_scale < 1.0:
+                        box = self._refine_in_roi(cascade, gray, box)
+                    return box, source
+
+        except Exception as e:
+            logger.warning(f"Face detection failed: {e}")
+        
+        return None, None
+
+    def _cascades(self) -> Tuple[Tuple[str, cv2.CascadeClassifier], ...]:
+        return (('cat', self.cat_cascade), ('frontal', self.face_cascade))
+
+    def _detect_largest(self, cascade: cv2.CascadeClassifier, gray: np.ndarray, min_size: int,
+                        max_size: Optional[int] = None) -> Optional[np.ndarray]:
+        """Largest detection of one cascade pass, or None"""
+        kwargs = {'maxSize': (max_size, max_size)} if max_size else {}
+        faces = cascade.detectMultiScale(gray, scaleFactor=DETECTION_SCALE_FACTOR, minNeighbors=DETECTION_MIN_NEIGHBORS,
+                                         minSize=(min_size, min_size), **kwargs)
+        if len(faces) == 0:
+            return None
+        return max(faces, key=lambda f: f[2] * f[3])
+
+    def _refine_in_roi(self, cascade: cv2.CascadeClassifier, gray: np.ndarray,
+                       coarse: Tuple[int, int, int, int]) -> Tuple[int, int, int, int]:
+        """Re-run the cascade at full resolution around a coarse box; keep the coarse box on a miss"""
+        x, y, w, h = coarse
+        side = max(w, h)
+        margin = int(side * REFINE_MARGIN)
+        x0, y0 = max(0, x - margin), max(0, y - margin)
+        x1, y1 = min(gray.shape[1], x + w + margin), min(gray.shape[0], y + h + margin)
+        roi = gray[y0:y1, x0:x1]
+
+        min_size = max(CASCADE_WINDOW, int(side * REFINE_SIZE_RANGE[0]))
+        max_size = int(side * REFINE_SIZE_RANGE[1])
+        face = self._detect_largest(cascade, roi, min_size, max_size)
+        if face is None:
+            return coarse
+        fx, fy, fw, fh = (int(v) for v in face)
+        return (fx + x0, fy + y0, fw, fh)
+
+    def detect_face_exhaustive(self, image: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+        """Previous full-resolution detection path, kept as the benchmark baseline"""
+        return self.locate_face_exhaustive(image)[0]
+
+    def locate_face_exhaustive(self, image: np.ndarray) -> Tuple[Optional[Tuple[int, int, int, int]], Optional[str]]:
+        """detect_face_exhaustive's box and the cascade that found it, like locate_face"""
         try:
             gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 
@@ -61,105 +211,83 @@ class FelineFaceDetector:
             # 1) Cat-specific cascade
             face = detect_with(self.cat_cascade, gray)
             if face is not None:
-                return tuple(face)
+                return tuple(face), 'cat'
 
             # 2) General frontal cascade fallback
             face = detect_with(self.face_cascade, gray)
             if face is not None:
-                return tuple(face)
+                return tuple(face), 'frontal'
 
             # 3) Multi-scale retry (upscale image)
             try:
                 up = cv2.resize(gray, None, fx=1.5, fy=1.5, interpolation=cv2.INTER_CUBIC)
-                face = detect_with(self.cat_cascade, up) or detect_with(self.face_cascade, up)
-                if face is not None:
-                    # Scale back coordinates
-                    x, y, w, h = face
-                    return (int(x/1.5), int(y/1.5), int(w/1.5), int(h/1.5))
+                for source, cascade in self._cascades():
+                    face = detect_with(cascade, up)
+                    if face is not None:
+                        # Scale back coordinates
+                        x, y, w, h = face
+                        return (int(x/1.5), int(y/1.5), int(w/1.5), int(h/1.5)), source
             except Exception:
                 pass
 
         except Exception as e:
             logger.warning(f"Face detection failed: {e}")
         
-        return None
+        return None, None
+
+# Region order shared by the region detector, the specialists and the 48-landmark layout
+REGION_NAMES = ('left_eye', 'right_eye', 'left_ear', 'right_ear', 'nose_whisker')
+
+# Region centre as fractions of the face box, region size as min(w, h) // divisor,
+# and whether the region top is clamped to the image (ears sit above the face)
+REGION_LAYOUT = {
+    'left_eye': (0.25, 0.3, 4, False),
+    'right_eye': (0.75, 0.3, 4, False),
+    'left_ear': (0.15, -0.2, 3, True),
+    'right_ear': (0.85, -0.2, 3, True),
+    'nose_whisker': (0.5, 0.7, 3, False),
+}
 
 class RegionDetector:
     """Step 2: Region Detection - Identifies centers of 5 key regions"""
     
     def __init__(self):
-        self.regions = {
-            'left_eye': None,
-            'right_eye': None,
-            'left_ear': None,
-            'right_ear': None,
-            'nose_whisker': None
-        }
+        self.regions = {name: None for name in REGION_NAMES}
     
     def detect_regions(self, image: np.ndarray, face_bbox: Tuple[int, int, int, int]) -> Dict[str, Tuple[int, int, int, int]]:
         """Detect 5 key regions within the face"""
-        x, y, w, h = face_bbox
-        
-        # Define region centers based on face proportions
-        regions = {}
-        
-        # Left eye region (upper left quadrant)
-        left_eye_x = x + int(w * 0.25)
-        left_eye_y = y + int(h * 0.3)
-        left_eye_size = min(w, h) // 4
-        regions['left_eye'] = (
-            left_eye_x - left_eye_size//2,
-            left_eye_y - left_eye_size//2,
-            left_eye_size,
-            left_eye_size
-        )
-        
-        # Right eye region (upper right quadrant)
-        right_eye_x = x + int(w * 0.75)
-        right_eye_y = y + int(h * 0.3)
-        right_eye_size = min(w, h) // 4
-        regions['right_eye'] = (
-            right_eye_x - right_eye_size//2,
-            right_eye_y - right_eye_size//2,
-            right_eye_size,
-            right_eye_size
-        )
-        
-        # Left ear region (top left)
-        left_ear_x = x + int(w * 0.15)
-        left_ear_y = y - int(h * 0.2)  # Above face
-        left_ear_size = min(w, h) // 3
-        regions['left_ear'] = (
-            left_ear_x - left_ear_size//2,
-            max(0, left_ear_y - left_ear_size//2),
-            left_ear_size,
-            left_ear_size
-        )
-        
-        # Right ear region (top right)
-        right_ear_x = x + int(w * 0.85)
-        right_ear_y = y - int(h * 0.2)  # Above face
-        right_ear_size = min(w, h) // 3
-        regions['right_ear'] = (
-            right_ear_x - right_ear_size//2,
-            max(0, right_ear_y - right_ear_size//2),
-            right_ear_size,
-            right_ear_size
-        )
+        boxes = self.detect_regions_batch(np.asarray([face_bbox], dtype=np.int64))[0]
+        return {name: tuple(int(v) for v in box) for name, box in zip(REGION_NAMES, boxes)}
+    
+    def detect_regions_batch(self, face_bboxes: np.ndarray) -> np.ndarray:
+        """Detect the 5 key regions for many face boxes at once
         
-        # Nose/whisker region (center bottom)
-        nose_x = x + w // 2
-        nose_y = y + int(h * 0.7)
-        nose_size = min(w, h) // 3
-        regions['nose_whisker'] = (
-            nose_x - nose_size//2,
-            nose_y - nose_size//2,
-            nose_size,
-            nose_size
-        )
+        Args:
+            face_bboxes: (C, 4) array of (x, y, w, h) face boxes
         
+        Returns:
+            (C, 5, 4) array of (x, y, w, h) region boxes in REGION_NAMES order
+        """
+        face_bboxes = np.asarray(face_bboxes, dtype=np.int64).reshape(-1, 4)
+        x, y, w, h = face_bboxes.T
+        min_side = np.minimum(w, h)
+        
+        regions = np.empty((len(face_bboxes), len(REGION_NAMES), 4), dtype=np.int64)
+        for r, name in enumerate(REGION_NAMES):
+            fx, fy, divisor, clamp_top = REGION_LAYOUT[name]
+            center_x = x + np.trunc(w * fx).astype(np.int64)
+            center_y = y + np.trunc(h * fy).astype(np.int64)
+            size = min_side // divisor
+            top = center_y - size // 2
+            regions[:, r, 0] = center_x - size // 2
+            regions[:, r, 1] = np.maximum(0, top) if clamp_top else top
+            regions[:, r, 2] = size
+            regions[:, r, 3] = size
         return regions
 
+# Side length that every region crop is resized to before reaching a specialist
+SPECIALIST_INPUT_SIZE = 64
+
 class SpecialistModel:
     """Step 3: Ensemble of Specialists - Specialized models for each region"""
     
@@ -177,6 +305,18 @@ class SpecialistModel:
         
         # THEN create the model
         self.model = self._create_specialist_model()
+        
+        # Until trained weights are loaded the heuristic layout is used instead of the CNN
+        self.trained = False
+        self._template_cache: Dict[int, np.ndarray] = {}
+    
+    def load_weights(self, weights_path: str) -> None:
+        """Load trained specialist weights and switch to model-based detection"""
+        state = torch.load(weights_path, map_location='cpu')
+        self.model.load_state_dict(state)
+        self.model.eval()
+        self.trained = True
+        logger.info(f"Loaded {self.region_type} specialist weights from: {weights_path}")
     
     def _create_specialist_model(self) -> nn.Module:
         """Create a specialized CNN model for the specific region"""
@@ -214,6 +354,36 @@ class SpecialistModel:
             logger.warning(f"Landmark detection failed for {self.region_type}: {e}")
             return []
     
+    def detect_landmarks_batch(self, batch: Optional[torch.Tensor], count: int, size: int = SPECIALIST_INPUT_SIZE) -> np.ndarray:
+        """Detect landmarks for a batch of region crops in one pass
+        
+        Args:
+            batch: (count, 3, size, size) float tensor scaled to [0, 1]; only
+                needed (and only built by the caller) once weights are loaded
+            count: Number of crops in the batch
+            size: Side length of the resized crops
+        
+        Returns:
+            (count, n_landmarks, 2) float array of coordinates in crop space
+        """
+        if self.trained and batch is not None:
+            with torch.inference_mode():
+                output = self.model(batch)
+            return output.reshape(count, -1, 2).numpy().astype(np.float64)
+        
+        template = self.landmark_template(size)
+        return np.broadcast_to(template, (count,) + template.shape)
+    
+    def landmark_template(self, size: int = SPECIALIST_INPUT_SIZE) -> np.ndarray:
+        """Heuristic landmark layout for a size x size crop (independent of pixel content)"""
+        template = self._template_cache.get(size)
+        if template is None:
+            placeholder = np.empty((size, size, 3), dtype=np.uint8)
+            template = np.asarray(self._heuristic_landmark_detection(placeholder), dtype=np.float64)
+            template.setflags(write=False)
+            self._template_cache[size] = template
+        return template
+    
     def _preprocess_image(self, image: np.ndarray) -> torch.Tensor:
         """Preprocess image for the specialist model"""
         # Resize to standard size
@@ -285,109 +455,232 @@ class MagnifyingEnsemble:
     
     def __init__(self, magnification_scales: List[float] = [1.0, 1.5, 2.0]):
         self.magnification_scales = magnification_scales
+        self.cluster_threshold = DEFAULT_CLUSTER_THRESHOLD
         self.face_detector = FelineFaceDetector()
         self.region_detector = RegionDetector()
         
-        # Initialize specialist models for each region
-        self.specialists = {
-            'left_eye': SpecialistModel('left_eye'),
-            'right_eye': SpecialistModel('right_eye'),
-            'left_ear': SpecialistModel('left_ear'),
-            'right_ear': SpecialistModel('right_ear'),
-            'nose_whisker': SpecialistModel('nose_whisker')
-        }
+        # Specialist models for each region are shared process-wide and built on first use
+        self._specialists: Optional[Dict[str, 'SpecialistModel']] = None
+        for name in REGION_NAMES:
+            model_registry.register(f'specialist:{name}', partial(SpecialistModel, name))
+        
+        # Candidate face crops: different scales and slight offsets (fractions of the face box)
+        self.face_crop_scales = [0.9, 1.0, 1.1, 1.25]
+        self.face_crop_offsets = [(0.0, 0.0), (0.05, 0.0), (-0.05, 0.0), (0.0, 0.05), (0.0, -0.05)]
     
+    @property
+    def specialists(self) -> Dict[str, 'SpecialistModel']:
+        if self._specialists is None:
+            self._specialists = {name: model_registry.get(f'specialist:{name}') for name in REGION_NAMES}
+        return self._specialists
+
     def detect_landmarks_multi_scale(self, image: np.ndarray) -> List[Tuple[int, int]]:
         """Detect landmarks using magnifying ensemble method with face multi-crop fallback"""
+        landmarks = self.detect_landmarks_batch([image])[0]
+        if isinstance(landmarks, Exception):
+            raise landmarks
+        return landmarks
+    
+    def detect_landmarks_batch(self, images: List[np.ndarray],
+                               face_boxes: Optional[List[Optional[Tuple[int, int, int, int]]]] = None) -> List[Any]:
+        """Detect landmarks for several images, sharing specialist batches across them
+        
+        Args:
+            images: BGR images
+            face_boxes: Face boxes already found for the images (None entries: no
+                face); when omitted, faces are detected here
+        
+        Returns:
+            Per image, the landmark list (empty when no face is found) or the
+            exception raised while processing that image
+        """
+        results: List[Any] = [[] for _ in images]
+        plans: Dict[int, Tuple[Dict[str, Any], np.ndarray]] = {}
+        
         # Step 1: Face Detection
-        face_bbox = self.face_detector.detect_face(image)
-        if face_bbox is None:
-            logger.warning("No face detected")
-            return []
-
-        x, y, w, h = face_bbox
-        # Candidate crops: different scales and slight offsets
-        scales = [0.9, 1.0, 1.1, 1.25]
-        offsets = [
-            (0, 0),
-            (int(0.05 * w), 0),
-            (-int(0.05 * w), 0),
-            (0, int(0.05 * h)),
-            (0, -int(0.05 * h)),
-        ]
-
-        best_landmarks: List[Tuple[int, int]] = []
-        best_count = 0
-
-        for s in scales:
-            for ox, oy in offsets:
-                cw = int(w * s)
-                ch = int(h * s)
-                cx = max(0, x + ox - (cw - w) // 2)
-                cy = max(0, y + oy - (ch - h) // 2)
-                cx2 = min(image.shape[1], cx + cw)
-                cy2 = min(image.shape[0], cy + ch)
-                if cx2 <= cx or cy2 <= cy:
+        for i, image in enumerate(images):
+            try:
+                if face_boxes is not None:
+                    face_bbox = face_boxes[i]
+                else:
+                    with instrumentation.stage('face_detection'):
+                        face_bbox = self.face_detector.detect_face(image)
+                if face_bbox is None:
+                    logger.warning("No face detected")
                     continue
-
-                # Step 2: Region Detection on this candidate face crop
-                regions = self.region_detector.detect_regions(image, (cx, cy, cx2 - cx, cy2 - cy))
-
-                # Step 3: Multi-scale processing for each region
-                all_landmarks = []
-                for region_name, region_bbox in regions.items():
-                    region_landmarks = self._process_region_multi_scale(image, region_bbox, region_name)
-                    all_landmarks.extend(region_landmarks)
-
-                combined = self._combine_landmarks(all_landmarks)
-                if len(combined) > best_count:
-                    best_count = len(combined)
-                    best_landmarks = combined
-
-                if best_count >= 48:
-                    break
-            if best_count >= 48:
+                with instrumentation.stage('region_planning'):
+                    plan = self._plan_region_crops(face_bbox, image.shape)
+                plans[i] = (plan, np.unique(plan['candidate']))
+                instrumentation.count('faces_detected')
+                instrumentation.count('face_candidates', len(plans[i][1]))
+            except Exception as e:
+                results[i] = e
+        
+        # Steps 2-3: Region crops for every candidate face crop, run through the specialists in batches.
+        # The first candidate usually yields all 48 landmarks, so first candidates of all images run
+        # together and the remaining candidates are only batched for images that fell short.
+        best_count = {i: 0 for i in plans}
+        for wave_index in (0, 1):
+            members = []
+            boxes, regions, image_index = [], [], []
+            for i, (plan, candidates) in plans.items():
+                wave = candidates[:1] if wave_index == 0 else candidates[1:]
+                if best_count[i] >= 48 or len(wave) == 0:
+                    continue
+                in_wave = np.isin(plan['candidate'], wave)
+                members.append((i, wave, plan['candidate'][in_wave], len(boxes)))
+                boxes.extend(plan['boxes'][in_wave])
+                regions.extend(plan['region'][in_wave])
+                image_index.extend([i] * int(in_wave.sum()))
+            if not members:
                 break
-
-        return best_landmarks
-    
-    def _process_region_multi_scale(self, image: np.ndarray, region_bbox: Tuple[int, int, int, int], region_name: str) -> List[Tuple[int, int]]:
-        """Process a region at multiple scales"""
-        x, y, w, h = region_bbox
-        region_landmarks = []
-        
-        for scale in self.magnification_scales:
-            # Calculate magnified region
-            magnified_w = int(w * scale)
-            magnified_h = int(h * scale)
-            
-            # Extract region with padding
-            start_x = max(0, x - (magnified_w - w) // 2)
-            start_y = max(0, y - (magnified_h - h) // 2)
-            end_x = min(image.shape[1], start_x + magnified_w)
-            end_y = min(image.shape[0], start_y + magnified_h)
             
-            # Extract region
-            region_image = image[start_y:end_y, start_x:end_x]
+            with instrumentation.stage('specialists'):
+                crop_landmarks = self._run_specialists_batched(
+                    images, np.asarray(boxes).reshape(-1, 4), np.asarray(regions), np.asarray(image_index))
+            instrumentation.count('specialist_waves')
+            instrumentation.count('specialist_crops', len(boxes))
             
-            if region_image.size == 0:
+            for i, wave, wave_candidates, offset in members:
+                for candidate in wave:
+                    selected = offset + np.flatnonzero(wave_candidates == candidate)
+                    all_landmarks = np.concatenate([crop_landmarks[k] for k in selected])
+                    
+                    with instrumentation.stage('consensus'):
+                        combined = self._combine_landmarks(all_landmarks)
+                    if len(combined) > best_count[i]:
+                        best_count[i] = len(combined)
+                        results[i] = combined
+                    
+                    if best_count[i] >= 48:
+                        break
+        
+        return results
+    
+    def _plan_face_crops(self, face_bbox: Tuple[int, int, int, int], image_shape: Tuple[int, ...]) -> np.ndarray:
+        """Candidate face crops around the detected face, in search order
+        
+        Returns:
+            (C, 4) array of (x, y, w, h) crops; crops falling outside the image have w or h <= 0
+        """
+        x, y, w, h = (int(v) for v in face_bbox)
+        scales = np.repeat(np.asarray(self.face_crop_scales, dtype=np.float64), len(self.face_crop_offsets))
+        offsets = np.tile(np.asarray(self.face_crop_offsets, dtype=np.float64), (len(self.face_crop_scales), 1))
+        
+        ox = np.trunc(offsets[:, 0] * w).astype(np.int64)
+        oy = np.trunc(offsets[:, 1] * h).astype(np.int64)
+        cw = np.trunc(w * scales).astype(np.int64)
+        ch = np.trunc(h * scales).astype(np.int64)
+        cx = np.maximum(0, x + ox - (cw - w) // 2)
+        cy = np.maximum(0, y + oy - (ch - h) // 2)
+        cx2 = np.minimum(image_shape[1], cx + cw)
+        cy2 = np.minimum(image_shape[0], cy + ch)
+        return np.stack([cx, cy, cx2 - cx, cy2 - cy], axis=1)
+    
+    def _magnify_boxes(self, region_boxes: np.ndarray, image_shape: Tuple[int, ...]) -> np.ndarray:
+        """Expand (..., 4) region boxes by every magnification scale
+        
+        Returns:
+            (..., S, 4) array of (start_x, start_y, end_x, end_y) clipped to the image
+        """
+        region_boxes = np.asarray(region_boxes, dtype=np.int64)
+        scales = np.asarray(self.magnification_scales, dtype=np.float64)
+        x, y, w, h = (region_boxes[..., i, None] for i in range(4))
+        
+        magnified_w = np.trunc(w * scales).astype(np.int64)
+        magnified_h = np.trunc(h * scales).astype(np.int64)
+        start_x = np.maximum(0, x - (magnified_w - w) // 2)
+        start_y = np.maximum(0, y - (magnified_h - h) // 2)
+        end_x = np.minimum(image_shape[1], start_x + magnified_w)
+        end_y = np.minimum(image_shape[0], start_y + magnified_h)
+        return np.stack([start_x, start_y, end_x, end_y], axis=-1)
+    
+    def _plan_region_crops(self, face_bbox: Tuple[int, int, int, int], image_shape: Tuple[int, ...]) -> Dict[str, Any]:
+        """Lay out all region crops (candidates x regions x magnification scales)
+        
+        Crops are ordered candidate-major, then region, then scale, which is the
+        order the consensus clustering consumes them in. Empty crops are dropped.
+        """
+        face_crops = self._plan_face_crops(face_bbox, image_shape)
+        valid_faces = (face_crops[:, 2] > 0) & (face_crops[:, 3] > 0)
+        
+        # Region detection only runs on usable face crops, but candidate ids keep the search order
+        region_boxes = self.region_detector.detect_regions_batch(face_crops[valid_faces])
+        boxes = self._magnify_boxes(region_boxes, image_shape)
+        
+        num_candidates, num_regions, num_scales = boxes.shape[:3]
+        candidate = np.repeat(np.flatnonzero(valid_faces), num_regions * num_scales)
+        region = np.tile(np.repeat(np.arange(num_regions), num_scales), num_candidates)
+        boxes = boxes.reshape(-1, 4)
+        
+        valid = (boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1])
+        return {
+            'boxes': boxes[valid],
+            'candidate': candidate[valid],
+            'region': region[valid],
+        }
+    
+    def _run_specialists_batched(self, images: List[np.ndarray], boxes: np.ndarray, regions: np.ndarray,
+                                 image_index: np.ndarray) -> List[np.ndarray]:
+        """Run each specialist once over all of its crops and map results to image coordinates
+        
+        Args:
+            images: Source images
+            boxes: (N, 4) crops as (start_x, start_y, end_x, end_y)
+            regions: (N,) index into REGION_NAMES for each crop
+            image_index: (N,) index into images for each crop
+        
+        Returns:
+            One (n_landmarks, 2) int64 array per crop, in input order
+        """
+        size = SPECIALIST_INPUT_SIZE
+        results: List[np.ndarray] = [None] * len(boxes)
+        
+        for r, region_name in enumerate(REGION_NAMES):
+            selected = np.flatnonzero(regions == r)
+            if len(selected) == 0:
                 continue
+            specialist = self.specialists[region_name]
+            region_boxes = boxes[selected]
             
-            # Resize to standard size for specialist model
-            region_image = cv2.resize(region_image, (64, 64))
+            batch = None
+            if specialist.trained:
+                batch = self._gather_crops(images, region_boxes, image_index[selected], size)
             
-            # Get landmarks from specialist model
-            specialist = self.specialists[region_name]
-            landmarks = specialist.detect_landmarks(region_image)
+            try:
+                landmarks = specialist.detect_landmarks_batch(batch, len(selected), size)
+            except Exception as e:
+                logger.warning(f"Landmark detection failed for {region_name}: {e}")
+                continue
             
-            # Scale landmarks back to original coordinates
-            for lx, ly in landmarks:
-                # Convert from 64x64 back to region coordinates
-                orig_x = start_x + int(lx * (end_x - start_x) / 64)
-                orig_y = start_y + int(ly * (end_y - start_y) / 64)
-                region_landmarks.append((orig_x, orig_y))
-        
-        return region_landmarks
+            # Scale landmarks back from size x size crop space to original coordinates
+            start = region_boxes[:, None, 0:2]
+            extent = (region_boxes[:, 2:4] - region_boxes[:, 0:2])[:, None, :]
+            coords = start + np.trunc(landmarks * extent / size).astype(np.int64)
+            for k, i in enumerate(selected):
+                results[i] = coords[k]
+        
+        empty = np.empty((0, 2), dtype=np.int64)
+        return [landmarks if landmarks is not None else empty for landmarks in results]
+    
+    def _gather_crops(self, images: List[np.ndarray], boxes: np.ndarray, image_index: np.ndarray, size: int) -> torch.Tensor:
+        """Resize crops into one preallocated (N, 3, size, size) tensor scaled to [0, 1]"""
+        pixels = np.empty((len(boxes), size, size, 3), dtype=np.uint8)
+        for k, (start_x, start_y, end_x, end_y) in enumerate(boxes):
+            image = images[image_index[k]]
+            cv2.resize(image[start_y:end_y, start_x:end_x], (size, size), dst=pixels[k])
+        
+        batch = torch.empty((len(boxes), 3, size, size), dtype=torch.float32)
+        batch.copy_(torch.from_numpy(pixels).permute(0, 3, 1, 2))
+        return batch.div_(255.0)
+    
+    def _process_region_multi_scale(self, image: np.ndarray, region_bbox: Tuple[int, int, int, int], region_name: str) -> List[Tuple[int, int]]:
+        """Process a region at multiple scales"""
+        boxes = self._magnify_boxes(np.asarray(region_bbox), image.shape)
+        boxes = boxes[(boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1])]
+        regions = np.full(len(boxes), REGION_NAMES.index(region_name))
+        crop_landmarks = self._run_specialists_batched([image], boxes, regions, np.zeros(len(boxes), dtype=np.int64))
+        return [(int(px), int(py)) for landmarks in crop_landmarks for px, py in landmarks]
     
     def _combine_landmarks(self, all_landmarks: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
         """Combine landmarks to produce final 48 landmarks"""
@@ -400,69 +693,27 @@ class MagnifyingEnsemble:
         return consensus_landmarks
     
     def _find_consensus_landmarks(self, landmarks: List[Tuple[int, int]], target_count: int = 48) -> List[Tuple[int, int]]:
-        """Find consensus landmarks using clustering"""
+        """Find consensus landmarks using grid-bucketed leader clustering"""
         if len(landmarks) == 0:
             return []
         
-        # Simple clustering based on distance
-        clusters = []
-        used = set()
-        threshold = 15  # Distance threshold for clustering
-        
-        for i, point in enumerate(landmarks):
-            if i in used:
-                continue
-            
-            cluster = [point]
-            used.add(i)
-            
-            for j, other_point in enumerate(landmarks):
-                if j in used:
-                    continue
-                
-                distance = np.sqrt((point[0] - other_point[0])**2 + (point[1] - other_point[1])**2)
-                if distance < threshold:
-                    cluster.append(other_point)
-                    used.add(j)
-            
-            clusters.append(cluster)
-        
-        # Get centroid of each cluster
-        consensus_points = []
-        for cluster in clusters:
-            if len(cluster) > 0:
-                avg_x = sum(p[0] for p in cluster) // len(cluster)
-                avg_y = sum(p[1] for p in cluster) // len(cluster)
-                consensus_points.append((avg_x, avg_y))
-        
-        # If we have more than target_count, select the most confident ones
-        if len(consensus_points) > target_count:
-            # Sort by cluster size (larger clusters = more confidence)
-            cluster_sizes = [len(cluster) for cluster in clusters]
-            sorted_indices = np.argsort(cluster_sizes)[::-1]
-            consensus_points = [consensus_points[i] for i in sorted_indices[:target_count]]
-        
-        # If we have fewer than target_count, duplicate some points
-        while len(consensus_points) < target_count:
-            if len(consensus_points) > 0:
-                # Duplicate a random point with small offset
-                point = consensus_points[np.random.randint(0, len(consensus_points))]
-                offset_x = np.random.randint(-5, 6)
-                offset_y = np.random.randint(-5, 6)
-                consensus_points.append((point[0] + offset_x, point[1] + offset_y))
-            else:
-                # If no landmarks, create default points
-                consensus_points.append((100, 100))
-        
-        return consensus_points[:target_count]
+        clusters = cluster_landmarks(landmarks, threshold=self.cluster_threshold)
+        consensus = select_consensus_landmarks(clusters, target_count=target_count)
+        return [(int(px), int(py)) for px, py in consensus]
 
 class FelinePainAssessmentELD:
     """Ensemble Landmark Detector for Feline Pain Assessment"""
     
-    def __init__(self, model_path: str = "eld_pain_model.pkl"):
+    def __init__(self, model_path: str = "eld_pain_model.pkl", instrument: Optional[bool] = None):
         self.magnifying_ensemble = MagnifyingEnsemble()
-        self.feature_extractor = self._create_feature_extractor()
-        self.classifier = self._load_classifier(model_path)
+        # Record per-stage timings for every call (debug=True records a single call)
+        self.instrument = instrumentation.INSTRUMENTATION_ENABLED if instrument is None else instrument
+        # Classifier and feature extractor live in the shared model registry and load on first use
+        self.model_path = model_path
+        self._classifier_key = f'pain_classifier:{model_path}'
+        self._classifier_override: Optional[Tuple[RandomForestClassifier, Optional[CompiledForest]]] = None
+        model_registry.register(self._classifier_key, partial(self._load_classifier_artifacts, model_path))
+        model_registry.register('feature_extractor', self._create_feature_extractor)
         self.scaler = StandardScaler()
         
         # Expected 48 landmarks
@@ -477,7 +728,48 @@ class FelinePainAssessmentELD:
             'overall_tension': 0.0
         }
     
-    def _create_feature_extractor(self) -> nn.Module:
+    @property
+    def classifier(self) -> RandomForestClassifier:
+        return self._classifier_artifacts()[0]
+
+    @classifier.setter
+    def classifier(self, clf: RandomForestClassifier) -> None:
+        # A classifier assigned to one instance (e.g. freshly trained) does not replace the shared one
+        self._classifier_override = (clf, self._compile_classifier(clf))
+
+    @property
+    def has_fitted_classifier(self) -> bool:
+        """False when no trained classifier file was found (predictions are heuristic guesses)"""
+        return hasattr(self.classifier, 'classes_')
+
+    @property
+    def face_detector(self) -> FelineFaceDetector:
+        return self.magnifying_ensemble.face_detector
+
+    @property
+    def compiled_classifier(self) -> Optional[CompiledForest]:
+        return self._classifier_artifacts()[1]
+
+    def _classifier_artifacts(self) -> Tuple[RandomForestClassifier, Optional[CompiledForest]]:
+        if self._classifier_override is not None:
+            return self._classifier_override
+        return model_registry.get(self._classifier_key)
+
+    @property
+    def feature_extractor(self) -> nn.Module:
+        # Not used by assess_pain; only built if something asks for it
+        return model_registry.get('feature_extractor')
+
+    def prewarm(self, include_feature_extractor: bool = False) -> Dict[str, Any]:
+        """Load every artifact this model uses now and return the registry report"""
+        names = ['cat_face_cascade', 'frontal_face_cascade', self._classifier_key]
+        names += [f'specialist:{name}' for name in REGION_NAMES]
+        if include_feature_extractor:
+            names.append('feature_extractor')
+        return model_registry.prewarm(names)
+
+    @staticmethod
+    def _create_feature_extractor() -> nn.Module:
         """Create feature extraction model using PyTorch"""
         try:
             model = models.resnet18(pretrained=True)
@@ -498,7 +790,13 @@ class FelinePainAssessmentELD:
             )
             return model
     
-    def _load_classifier(self, model_path: str) -> RandomForestClassifier:
+    @classmethod
+    def _load_classifier_artifacts(cls, model_path: str) -> Tuple[RandomForestClassifier, Optional[CompiledForest]]:
+        classifier = cls._load_classifier(model_path)
+        return classifier, cls._compile_classifier(classifier)
+
+    @classmethod
+    def _load_classifier(cls, model_path: str) -> RandomForestClassifier:
         """Load trained classifier from several candidate locations"""
         candidates = []
         # If absolute path provided
@@ -519,7 +817,7 @@ class FelinePainAssessmentELD:
                     logger.info(f"Loaded ELD classifier from: {path}")
                     # Apply sklearn compatibility patch (e.g., missing monotonic_cst)
                     try:
-                        self._patch_sklearn_compat(clf)
+                        cls._patch_sklearn_compat(clf)
                     except Exception as compat_err:
                         logger.warning(f"Failed to patch sklearn compatibility: {compat_err}")
                     return clf
@@ -529,7 +827,21 @@ class FelinePainAssessmentELD:
         logger.warning("ELD classifier file not found; using unfitted default classifier")
         return RandomForestClassifier(n_estimators=100, random_state=42)
 
-    def _patch_sklearn_compat(self, clf: RandomForestClassifier) -> None:
+    @staticmethod
+    def _compile_classifier(clf: RandomForestClassifier) -> Optional[CompiledForest]:
+        """Flatten a fitted forest for fast single-row prediction (None if not compilable)"""
+        if not hasattr(clf, 'classes_'):
+            return None
+        try:
+            compiled = CompiledForest.from_sklearn(clf)
+            logger.info(f"Compiled ELD classifier: {len(compiled.roots)} trees, {len(compiled.left)} nodes")
+            return compiled
+        except Exception as e:
+            logger.warning(f"Could not compile ELD classifier, using sklearn predict: {e}")
+            return None
+
+    @staticmethod
+    def _patch_sklearn_compat(clf: RandomForestClassifier) -> None:
         """Patch known sklearn attribute differences across versions.
 
         Some newer sklearn versions access `monotonic_cst` on tree estimators.
@@ -573,24 +885,115 @@ class FelinePainAssessmentELD:
         
         return features
     
+    def extract_feature_vector(self, image: np.ndarray, landmarks: List[Tuple[int, int]],
+                               out: Optional[PainFeatureVector] = None) -> PainFeatureVector:
+        """Extract the 70-dim classifier input directly into a fixed-layout vector
+        
+        Args:
+            image: BGR image
+            landmarks: Detected or annotated landmarks
+            out: Optional vector to fill in place (e.g. a row view of a dataset matrix);
+                it must be zeroed, as features that cannot be computed are left untouched
+        
+        Returns:
+            The filled PainFeatureVector (same values as
+            _prepare_feature_vector(extract_pain_features(image, landmarks)), as float32)
+        """
+        features = out if out is not None else ELD_FEATURE_SCHEMA.new_vector()
+        if len(landmarks) < 10:
+            return features
+        
+        points = np.asarray(landmarks, dtype=np.int64).reshape(-1, 2)
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        
+        features.group('landmarks')[:] = (len(points), len(points) / (image.shape[0] * image.shape[1]))
+        
+        distance_stats = self._distance_statistics(points)
+        if distance_stats is not None:
+            features.group('distances')[:] = distance_stats
+            features.group('hull')[0] = self._convex_hull_area(points)
+        
+        region_stats = self._region_statistics(points)
+        if region_stats is not None:
+            features.group('regions')[:] = region_stats
+        
+        texture_stats, present = self._texture_statistics(gray, points)
+        texture = features.group('texture').reshape(TEXTURE_LANDMARKS, 3)
+        texture[:len(present)][present] = texture_stats[present]
+        
+        return features
+    
     def _extract_texture_features(self, gray_image: np.ndarray, landmarks: List[Tuple[int, int]]) -> Dict[str, float]:
         """Extract texture features around landmarks"""
         features = {}
         
-        # Calculate local binary patterns or other texture features
-        for i, (x, y) in enumerate(landmarks[:20]):  # Use first 20 landmarks
-            if 0 <= x < gray_image.shape[1] and 0 <= y < gray_image.shape[0]:
-                # Extract 5x5 patch around landmark
-                patch = gray_image[max(0, y-2):min(gray_image.shape[0], y+3),
-                                 max(0, x-2):min(gray_image.shape[1], x+3)]
-                
-                if patch.size > 0:
-                    features[f'texture_mean_{i}'] = np.mean(patch)
-                    features[f'texture_std_{i}'] = np.std(patch)
-                    features[f'texture_entropy_{i}'] = self._calculate_entropy(patch)
+        points = np.asarray(landmarks, dtype=np.int64).reshape(-1, 2)
+        texture_stats, present = self._texture_statistics(gray_image, points)
+        for i in np.flatnonzero(present):
+            features[f'texture_mean_{i}'], features[f'texture_std_{i}'], features[f'texture_entropy_{i}'] = texture_stats[i]
         
         return features
     
+    def _texture_statistics(self, gray_image: np.ndarray, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Mean, std and entropy of the 5x5 patch around each of the first 20 landmarks
+        
+        Patches are gathered with fancy indexing and all entropies come from a
+        single bincount. Patches clipped by the image border fall back to the
+        per-patch reductions so that values stay identical.
+        
+        Returns:
+            (stats, present): (k, 3) statistics and (k,) mask of landmarks inside the image
+        """
+        points = points[:TEXTURE_LANDMARKS]
+        k = len(points)
+        stats = np.zeros((k, 3), dtype=np.float64)
+        height, width = gray_image.shape[:2]
+        x, y = points[:, 0], points[:, 1]
+        present = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        if not present.any():
+            return stats, present
+        
+        offsets = np.arange(-TEXTURE_PATCH_RADIUS, TEXTURE_PATCH_RADIUS + 1)
+        rows = y[present, None] + offsets
+        cols = x[present, None] + offsets
+        inside = ((rows >= 0) & (rows < height))[:, :, None] & ((cols >= 0) & (cols < width))[:, None, :]
+        patches = gray_image[np.clip(rows, 0, height - 1)[:, :, None], np.clip(cols, 0, width - 1)[:, None, :]]
+        
+        side = len(offsets)
+        n = len(patches)
+        flat = patches.reshape(n, side * side)
+        full = inside.reshape(n, -1).all(axis=1)
+        
+        means = np.empty(n, dtype=np.float64)
+        stds = np.empty(n, dtype=np.float64)
+        means[full] = flat[full].mean(axis=1)
+        stds[full] = flat[full].std(axis=1)
+        for j in np.flatnonzero(~full):
+            clipped = patches[j][inside[j]]
+            means[j] = np.mean(clipped)
+            stds[j] = np.std(clipped)
+        
+        # Entropy: one 256-bin histogram per patch from a single bincount
+        patch_ids = np.broadcast_to(np.arange(n)[:, None, None], patches.shape)
+        codes = (patch_ids * 256 + patches)[inside]
+        hist = np.bincount(codes, minlength=n * 256).reshape(n, 256)
+        hist_rows, hist_bins = np.nonzero(hist)
+        counts = hist[hist_rows, hist_bins]
+        prob = counts / np.bincount(hist_rows, weights=counts, minlength=n)[hist_rows]
+        terms = prob * np.log2(prob)
+        
+        # Sum each patch's non-empty bins in bin order; patches with the same number of
+        # occupied bins are reduced together so the summation order matches np.sum
+        occupied = np.bincount(hist_rows, minlength=n)
+        row_starts = np.cumsum(occupied) - occupied
+        entropies = np.empty(n, dtype=np.float64)
+        for m in np.unique(occupied):
+            same = np.flatnonzero(occupied == m)
+            entropies[same] = -terms[row_starts[same, None] + np.arange(m)].sum(axis=1)
+        
+        stats[present] = np.stack([means, stds, entropies], axis=1)
+        return stats, present
+    
     def _extract_geometric_features(self, landmarks: List[Tuple[int, int]]) -> Dict[str, float]:
         """Extract geometric features from landmarks"""
         features = {}
@@ -598,72 +1001,64 @@ class FelinePainAssessmentELD:
         if len(landmarks) < 3:
             return features
         
-        # Calculate distances between landmarks
-        distances = []
-        for i in range(len(landmarks)):
-            for j in range(i+1, len(landmarks)):
-                dist = np.sqrt((landmarks[i][0] - landmarks[j][0])**2 + 
-                             (landmarks[i][1] - landmarks[j][1])**2)
-                distances.append(dist)
-        
-        if distances:
-            features['min_distance'] = min(distances)
-            features['max_distance'] = max(distances)
-            features['mean_distance'] = np.mean(distances)
-            features['std_distance'] = np.std(distances)
+        points = np.asarray(landmarks, dtype=np.int64).reshape(-1, 2)
+        distance_stats = self._distance_statistics(points)
+        features['min_distance'], features['max_distance'], features['mean_distance'], features['std_distance'] = distance_stats
         
         # Calculate convex hull area
+        features['convex_hull_area'] = self._convex_hull_area(points)
+        
+        return features
+    
+    def _distance_statistics(self, points: np.ndarray) -> Optional[np.ndarray]:
+        """Min, max, mean and std of all pairwise landmark distances (condensed order)"""
+        if len(points) < 3:
+            return None
+        
+        first, second = np.triu_indices(len(points), k=1)
+        delta = points[first] - points[second]
+        distances = np.sqrt(delta[:, 0] ** 2 + delta[:, 1] ** 2)
+        return np.array([distances.min(), distances.max(), np.mean(distances), np.std(distances)])
+    
+    def _convex_hull_area(self, points: np.ndarray) -> float:
+        """Area enclosed by the landmarks (0.0 when degenerate or scipy is unavailable)"""
         try:
             from scipy.spatial import ConvexHull
-            points = np.array(landmarks)
             hull = ConvexHull(points)
-            features['convex_hull_area'] = hull.volume
+            return hull.volume
         except:
-            features['convex_hull_area'] = 0.0
-        
-        return features
+            return 0.0
     
     def _extract_region_features(self, landmarks: List[Tuple[int, int]]) -> Dict[str, float]:
         """Extract region-specific features for pain assessment"""
         features = {}
         
-        if len(landmarks) < 48:
-            return features
+        region_stats = self._region_statistics(np.asarray(landmarks, dtype=np.int64).reshape(-1, 2))
+        if region_stats is not None:
+            features['eye_opening'], features['ear_height_variation'], features['whisker_spread'] = region_stats
         
-        # Divide landmarks into regions (approximate)
-        # First 16: Eye regions (8 each)
-        # Next 16: Ear regions (8 each)  
-        # Last 16: Nose/whisker region
+        return features
+    
+    def _region_statistics(self, points: np.ndarray) -> Optional[np.ndarray]:
+        """Eye opening, ear height variation and whisker spread (requires 48 landmarks)
         
-        eye_landmarks = landmarks[:16]
-        ear_landmarks = landmarks[16:32]
-        nose_whisker_landmarks = landmarks[32:48]
+        First 16: Eye regions (8 each), next 16: Ear regions (8 each), last 16: Nose/whisker region
+        """
+        if len(points) < 48:
+            return None
         
-        # Eye region features (squinting detection)
-        if len(eye_landmarks) >= 8:
-            eye_distances = []
-            for i in range(0, 8, 2):
-                if i + 1 < len(eye_landmarks):
-                    dist = np.sqrt((eye_landmarks[i][0] - eye_landmarks[i+1][0])**2 + 
-                                 (eye_landmarks[i][1] - eye_landmarks[i+1][1])**2)
-                    eye_distances.append(dist)
-            features['eye_opening'] = np.mean(eye_distances) if eye_distances else 0.0
+        # Eye region features (squinting detection): distance between consecutive pairs of the first eye
+        eye_delta = points[0:8:2] - points[1:8:2]
+        eye_opening = np.mean(np.sqrt(eye_delta[:, 0] ** 2 + eye_delta[:, 1] ** 2))
         
         # Ear region features (ear position)
-        if len(ear_landmarks) >= 8:
-            ear_heights = [landmark[1] for landmark in ear_landmarks]
-            features['ear_height_variation'] = np.std(ear_heights) if ear_heights else 0.0
+        ear_height_variation = np.std(points[16:32, 1])
         
         # Nose/whisker region features (tension detection)
-        if len(nose_whisker_landmarks) >= 16:
-            whisker_spread = []
-            center_x = np.mean([landmark[0] for landmark in nose_whisker_landmarks])
-            for landmark in nose_whisker_landmarks:
-                spread = abs(landmark[0] - center_x)
-                whisker_spread.append(spread)
-            features['whisker_spread'] = np.mean(whisker_spread) if whisker_spread else 0.0
+        whisker_x = points[32:48, 0]
+        whisker_spread = np.mean(np.abs(whisker_x - np.mean(whisker_x)))
         
-        return features
+        return np.array([eye_opening, ear_height_variation, whisker_spread])
     
     def _calculate_entropy(self, patch: np.ndarray) -> float:
         """Calculate entropy of image patch"""
@@ -679,110 +1074,211 @@ class FelinePainAssessmentELD:
         entropy = -np.sum(prob * np.log2(prob))
         return entropy
     
-    def assess_pain(self, image: np.ndarray) -> Dict[str, any]:
-        """Assess pain level using ELD model with 48 landmarks"""
+    def assess_pain(self, image: np.ndarray, debug: bool = False,
+                    face_bbox: Optional[Tuple[int, int, int, int]] = None) -> Dict[str, any]:
+        """Assess pain level using ELD model with 48 landmarks
+        
+        With debug=True the per-stage timing record is attached under 'timings'.
+        face_bbox skips face detection when the caller has already found the face.
+        """
+        with instrumentation.timing_record('assess_pain', enabled=self.instrument or debug) as record:
+            if record is not None:
+                record.meta['image_shape'] = list(image.shape)
+            result = self._assess_pain(image, face_bbox)
+        if debug and record is not None:
+            result['timings'] = record.as_dict()
+        return result
+    
+    def _assess_pain(self, image: np.ndarray, face_bbox: Optional[Tuple[int, int, int, int]] = None) -> Dict[str, any]:
         try:
             # Detect 48 landmarks using magnifying ensemble
-            landmarks = self.magnifying_ensemble.detect_landmarks_multi_scale(image)
-            
-            if len(landmarks) < 10:
-                return {
-                    'success': False,
-                    'pain_level': 'Level 1 (Mild Pain)',
-                    'pain_score': 5,
-                    'confidence': 0.0,
-                    'error': 'Insufficient landmarks detected',
-                    'landmarks_detected': len(landmarks),
-                    'expected_landmarks': self.expected_landmarks,
-                    'model_type': 'ELD (48 Landmarks)'
-                }
-            
-            # Extract pain features
-            features = self.extract_pain_features(image, landmarks)
-            
-            # Prepare features for classification
-            feature_vector = self._prepare_feature_vector(features)
-            
-            # Predict pain level (guard for unfitted classifier)
-            if not hasattr(self.classifier, 'classes_'):
-                # Unfitted classifier: use a simple heuristic fallback based on features
-                eye_open = float(features.get('eye_opening', 0.0))
-                whisker = float(features.get('whisker_spread', 0.0))
-                # Very rough heuristic thresholds
-                if eye_open > 8 and whisker < 5:
-                    prediction = 0  # No Pain
-                elif eye_open > 5:
-                    prediction = 1  # Mild
-                else:
-                    prediction = 2  # Moderate
-                confidence = 0.4
+            if face_bbox is None:
+                landmarks = self.magnifying_ensemble.detect_landmarks_multi_scale(image)
             else:
-                if hasattr(self.classifier, 'predict_proba'):
-                    probabilities = self.classifier.predict_proba([feature_vector])[0]
-                    prediction = self.classifier.predict([feature_vector])[0]
-                    confidence = max(probabilities)
-                else:
-                    prediction = self.classifier.predict([feature_vector])[0]
-                    confidence = 0.5  # Default confidence
+                landmarks = self.magnifying_ensemble.detect_landmarks_batch([image], [face_bbox])[0]
+                if isinstance(landmarks, Exception):
+                    raise landmarks
+            instrumentation.count('landmarks', len(landmarks))
             
-            # Map prediction to pain level 
-            pain_level = self._map_prediction_to_pain_level(prediction)
+            if len(landmarks) < 10:
+                return self._insufficient_landmarks_result(len(landmarks))
             
-            # Calculate pain score
-            pain_score = self._calculate_pain_score(prediction, features)
+            # Extract pain features directly into the classifier layout
+            with instrumentation.stage('feature_extraction'):
+                features = self.extract_feature_vector(image, landmarks)
+            with instrumentation.stage('classification'):
+                predictions, confidences = self._classify(features.as_classifier_input(), [features])
             
-            # Convert landmarks to percentage coordinates
-            visual_landmarks = self._convert_landmarks_to_percentage(landmarks, image.shape)
-            fgs_breakdown = self._generate_fgs_breakdown(features, prediction)
-            detailed_explanation = self._generate_detailed_explanation(features, prediction)
-            actionable_advice = self._generate_actionable_advice(prediction)
-            
-            return {
-                'success': True,
-                'pain_level': pain_level,
-                'pain_score': pain_score,
-                'confidence': float(confidence),
-                'landmarks_detected': len(landmarks),
-                'expected_landmarks': self.expected_landmarks,
-                'fgs_breakdown': fgs_breakdown,
-                'detailed_explanation': detailed_explanation,
-                'actionable_advice': actionable_advice,
-                'visual_landmarks': visual_landmarks,
-                'model_type': 'ELD (48 Landmarks)'
-            }
+            with instrumentation.stage('result_building'):
+                return self._build_assessment(image.shape, landmarks, features, predictions[0], confidences[0])
             
         except Exception as e:
             logger.error(f"Error in pain assessment: {e}")
-            return {
-                'success': False,
-                'pain_level': 'Level 1 (Mild Pain)',
-                'pain_score': 5,
-                'confidence': 0.0,
-                'error': str(e),
-                'landmarks_detected': 0,
-                'expected_landmarks': self.expected_landmarks,
-                'model_type': 'ELD (48 Landmarks)'
-            }
+            return self._error_result(str(e))
     
-    def _prepare_feature_vector(self, features: Dict[str, float]) -> List[float]:
-        """Prepare feature vector for classification"""
-        # Define expected features
-        expected_features = [
-            'num_landmarks', 'landmark_density', 'min_distance', 'max_distance',
-            'mean_distance', 'std_distance', 'convex_hull_area',
-            'eye_opening', 'ear_height_variation', 'whisker_spread'
-        ]
+    def assess_pain_batch(self, images: List[Optional[np.ndarray]], debug: bool = False,
+                          face_boxes: Optional[List[Optional[Tuple[int, int, int, int]]]] = None) -> List[Dict[str, any]]:
+        """
+        Assess several images at once
         
-        # Add texture features
-        for i in range(20):
-            expected_features.extend([f'texture_mean_{i}', f'texture_std_{i}', f'texture_entropy_{i}'])
+        Specialist inference runs over the crops of all images together and the
+        classifier evaluates every feature row in one call. A failure on one
+        image only affects that image's result.
         
-        # Create feature vector
-        feature_vector = []
-        for feature in expected_features:
-            feature_vector.append(features.get(feature, 0.0))
+        Args:
+            images: BGR images; None entries (e.g. failed decodes) yield an error result
+            debug: Attach the batch timing record to every result under 'timings'
+            face_boxes: Face boxes already found per image (None entries: no face);
+                when omitted, faces are detected here
         
-        return feature_vector
+        Returns:
+            One assess_pain-style result dict per input image, in input order
+        """
+        with instrumentation.timing_record('assess_pain_batch', enabled=self.instrument or debug) as record:
+            if record is not None:
+                record.meta['batch_size'] = len(images)
+                record.meta['image_shapes'] = [None if image is None else list(image.shape) for image in images]
+            results = self._assess_pain_batch(images, face_boxes)
+        if debug and record is not None:
+            timings = record.as_dict()
+            for result in results:
+                result['timings'] = timings
+        return results
+    
+    def _assess_pain_batch(self, images: List[Optional[np.ndarray]],
+                           face_boxes: Optional[List[Optional[Tuple[int, int, int, int]]]] = None) -> List[Dict[str, any]]:
+        results: List[Optional[Dict[str, any]]] = [None] * len(images)
+        valid = [i for i, image in enumerate(images) if image is not None]
+        for i in range(len(images)):
+            if images[i] is None:
+                results[i] = self._error_result('Image could not be decoded')
+        
+        try:
+            batch_landmarks = self.magnifying_ensemble.detect_landmarks_batch(
+                [images[i] for i in valid], None if face_boxes is None else [face_boxes[i] for i in valid])
+        except Exception as e:
+            logger.error(f"Error in batch landmark detection: {e}")
+            for i in valid:
+                results[i] = self._error_result(str(e))
+            return results
+        
+        X = ELD_FEATURE_SCHEMA.new_matrix(len(valid))
+        rows, row_features, row_landmarks = [], [], []
+        for i, landmarks in zip(valid, batch_landmarks):
+            if isinstance(landmarks, Exception):
+                results[i] = self._error_result(str(landmarks))
+                continue
+            if len(landmarks) < 10:
+                results[i] = self._insufficient_landmarks_result(len(landmarks))
+                continue
+            features = ELD_FEATURE_SCHEMA.vector_view(X[len(rows)])
+            try:
+                with instrumentation.stage('feature_extraction'):
+                    self.extract_feature_vector(images[i], landmarks, out=features)
+            except Exception as e:
+                logger.error(f"Error extracting features for batch image {i}: {e}")
+                results[i] = self._error_result(str(e))
+                continue
+            rows.append(i)
+            row_features.append(features)
+            row_landmarks.append(landmarks)
+        
+        if rows:
+            try:
+                with instrumentation.stage('classification'):
+                    predictions, confidences = self._classify(X[:len(rows)], row_features)
+                with instrumentation.stage('result_building'):
+                    for k, i in enumerate(rows):
+                        results[i] = self._build_assessment(images[i].shape, row_landmarks[k], row_features[k],
+                                                            predictions[k], confidences[k])
+            except Exception as e:
+                logger.error(f"Error in batch pain classification: {e}")
+                for i in rows:
+                    results[i] = self._error_result(str(e))
+        
+        return results
+    
+    def _classify(self, X: np.ndarray, features: List[PainFeatureVector]) -> Tuple[List[Any], List[float]]:
+        """Predictions and confidences for the rows of a (n, n_features) matrix"""
+        # Predict pain level (guard for unfitted classifier)
+        if not hasattr(self.classifier, 'classes_'):
+            return [self._heuristic_prediction(f) for f in features], [0.4] * len(features)
+        if self.compiled_classifier is not None:
+            probabilities, predictions = self.compiled_classifier.predict_with_proba(X)
+            return list(predictions), probabilities.max(axis=1).tolist()
+        if hasattr(self.classifier, 'predict_proba'):
+            probabilities = self.classifier.predict_proba(X)
+            predictions = self.classifier.predict(X)
+            return list(predictions), probabilities.max(axis=1).tolist()
+        return list(self.classifier.predict(X)), [0.5] * len(X)  # Default confidence
+    
+    def _heuristic_prediction(self, features: PainFeatureVector) -> int:
+        """Unfitted classifier: use a simple heuristic fallback based on features"""
+        eye_open = float(features.get('eye_opening', 0.0))
+        whisker = float(features.get('whisker_spread', 0.0))
+        # Very rough heuristic thresholds
+        if eye_open > 8 and whisker < 5:
+            return 0  # No Pain
+        elif eye_open > 5:
+            return 1  # Mild
+        return 2  # Moderate
+    
+    def _build_assessment(self, image_shape: Tuple[int, ...], landmarks: List[Tuple[int, int]],
+                          features: PainFeatureVector, prediction: int, confidence: float) -> Dict[str, any]:
+        """Full result dict for one classified image"""
+        # Map prediction to pain level 
+        pain_level = self._map_prediction_to_pain_level(prediction)
+        
+        # Calculate pain score
+        pain_score = self._calculate_pain_score(prediction, features)
+        
+        # Convert landmarks to percentage coordinates
+        visual_landmarks = self._convert_landmarks_to_percentage(landmarks, image_shape)
+        fgs_breakdown = self._generate_fgs_breakdown(features, prediction)
+        detailed_explanation = self._generate_detailed_explanation(features, prediction)
+        actionable_advice = self._generate_actionable_advice(prediction)
+        
+        return {
+            'success': True,
+            'pain_level': pain_level,
+            'pain_score': pain_score,
+            'confidence': float(confidence),
+            'landmarks_detected': len(landmarks),
+            'expected_landmarks': self.expected_landmarks,
+            'fgs_breakdown': fgs_breakdown,
+            'detailed_explanation': detailed_explanation,
+            'actionable_advice': actionable_advice,
+            'visual_landmarks': visual_landmarks,
+            'model_type': 'ELD (48 Landmarks)'
+        }
+    
+    def _insufficient_landmarks_result(self, count: int) -> Dict[str, any]:
+        return {
+            'success': False,
+            'pain_level': 'Level 1 (Mild Pain)',
+            'pain_score': 5,
+            'confidence': 0.0,
+            'error': 'Insufficient landmarks detected',
+            'landmarks_detected': count,
+            'expected_landmarks': self.expected_landmarks,
+            'model_type': 'ELD (48 Landmarks)'
+        }
+    
+    def _error_result(self, error: str) -> Dict[str, any]:
+        return {
+            'success': False,
+            'pain_level': 'Level 1 (Mild Pain)',
+            'pain_score': 5,
+            'confidence': 0.0,
+            'error': error,
+            'landmarks_detected': 0,
+            'expected_landmarks': self.expected_landmarks,
+            'model_type': 'ELD (48 Landmarks)'
+        }
+    
+    def _prepare_feature_vector(self, features: Dict[str, float]) -> List[float]:
+        """Prepare feature vector for classification"""
+        return [features.get(feature, 0.0) for feature in ELD_FEATURE_NAMES]
     
     def _map_prediction_to_pain_level(self, prediction: int) -> str:
         """Map numerical prediction to feline pain level (3-level scale)
@@ -799,7 +1295,7 @@ class FelinePainAssessmentELD:
         }
         return pain_levels.get(prediction, "Level 1 - Moderate Pain")
     
-    def _calculate_pain_score(self, prediction: int, features: Dict[str, float]) -> int:
+    def _calculate_pain_score(self, prediction: int, features: PainFeatureVector) -> int:
         """Calculate pain score (0-10) from prediction and features"""
         # Map prediction to score range
         base_scores = {
@@ -884,7 +1380,7 @@ class FelinePainAssessmentELD:
         
         return visual_landmarks
     
-    def _generate_fgs_breakdown(self, features: Dict[str, float], prediction: int) -> Dict[str, Dict[str, Any]]:
+    def _generate_fgs_breakdown(self, features: PainFeatureVector, prediction: int) -> Dict[str, Dict[str, Any]]:
         """Generate FGS breakdown structure """
         # Estimate FGS scores from features
         eye_opening = features.get('eye_opening', 0.0)
@@ -919,7 +1415,7 @@ class FelinePainAssessmentELD:
             }
         }
     
-    def _generate_detailed_explanation(self, features: Dict[str, float], prediction: int) -> Dict[str, str]:
+    def _generate_detailed_explanation(self, features: PainFeatureVector, prediction: int) -> Dict[str, str]:
         """Generate detailed explanation"""
         pain_level_text = {
             0: "no signs of pain",
@@ -0,0 +1,299 @@
+"""
+Parallel, cached feature extraction for classifier training
+
+Extracting the 70 classifier features (image decode, annotation parsing and
+extract_feature_vector) dominates a training run on the augmented dataset,
+and every run used to redo it serially for every image. Here:
+
+- work is split into chunks of (row, image, annotation) items and run on a
+  process pool; each worker builds its FelinePainAssessmentELD once
+- finished rows are stored in a persistent cache: one float32 features.npy,
+  read memory-mapped, plus manifest.json mapping
+  "<image digest>:<annotation digest>" to a row (or -1 when the pair yields
+  no features). Keys are content hashes, so renamed or copied files hit and
+  edited ones miss; re-running after adding a few images only extracts those
+- file digests are remembered by path, size and mtime, so unchanged files
+  are not re-read to be hashed
+
+The manifest records FEATURE_CACHE_VERSION and the feature layout; a cache
+written for a different layout is ignored. Bump FEATURE_CACHE_VERSION when
+extract_feature_vector changes.
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+try:
+    from .feature_schema import ELD_FEATURE_SCHEMA, FEATURE_DTYPE
+except ImportError:  # Loaded as a top-level module (e.g. training scripts run from eld/)
+    from feature_schema import ELD_FEATURE_SCHEMA, FEATURE_DTYPE
+
+# Bump when extract_feature_vector changes so cached rows are recomputed
+FEATURE_CACHE_VERSION = 1
+
+# Annotations with fewer landmarks than this yield no features
+MIN_ANNOTATED_LANDMARKS = 10
+
+DEFAULT_CHUNK_SIZE = 32
+
+MANIFEST_NAME = 'manifest.json'
+FEATURES_NAME = 'features.npy'
+
+# Manifest row of an image/annotation pair that yields no features
+NO_FEATURES = -1
+
+
+def parse_landmarks(data: bytes) -> List[Tuple[int, int]]:
+    """Landmarks of a JSON annotation (empty when there are fewer than MIN_ANNOTATED_LANDMARKS)"""
+    annotation = json.loads(data)
+    if 'labels' in annotation and len(annotation['labels']) >= MIN_ANNOTATED_LANDMARKS:
+        return [(int(point[0]), int(point[1])) for point in annotation['labels']]
+    return []
+
+
+def load_landmarks_from_json(json_path: Path) -> List[Tuple[int, int]]:
+    """Load landmarks from JSON annotation file"""
+    try:
+        return parse_landmarks(Path(json_path).read_bytes())
+    except Exception as e:
+        print(f"Error loading {json_path}: {e}")
+        return []
+
+
+def file_digest(path: Path) -> str:
+    """Content hash of a file"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def layout_fingerprint() -> str:
+    """Identifies the cache format and feature layout rows were written with"""
+    text = json.dumps([FEATURE_CACHE_VERSION, list(ELD_FEATURE_SCHEMA.names)])
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+
+class FeatureCache:
+    """Feature rows keyed by image and annotation content, persisted in a directory"""
+
+    def __init__(self, cache_dir: Path):
+        self.dir = Path(cache_dir)
+        self.entries: Dict[str, int] = {}
+        self._files: Dict[str, List] = {}
+        self._features: Optional[np.ndarray] = None
+        self.fingerprint = layout_fingerprint()
+
+        manifest_path = self.dir / MANIFEST_NAME
+        if manifest_path.exists() and (self.dir / FEATURES_NAME).exists():
+            try:
+                manifest = json.loads(manifest_path.read_text())
+                if manifest.get('layout') == self.fingerprint:
+                    self.entries = manifest.get('entries', {})
+                    self._files = manifest.get('files', {})
+                else:
+                    print(f"⚠️  Feature cache in {self.dir} was written for another feature layout; rebuilding")
+            except (OSError, ValueError) as e:
+                print(f"⚠️  Ignoring unreadable feature cache manifest {manifest_path}: {e}")
+
+    @property
+    def features(self) -> Optional[np.ndarray]:
+        """All cached rows, memory-mapped read-only (None when the cache is empty)"""
+        if self._features is None and self.entries and (self.dir / FEATURES_NAME).exists():
+            self._features = np.load(self.dir / FEATURES_NAME, mmap_mode='r')
+        return self._features
+
+    def digest(self, path: Path) -> Optional[str]:
+        """Content hash of a file, reused while its size and mtime are unchanged; None if missing"""
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        name = str(path.resolve())
+        known = self._files.get(name)
+        if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            return known[2]
+        value = file_digest(path)
+        self._files[name] = [stat.st_size, stat.st_mtime_ns, value]
+        return value
+
+    def key(self, image_path: Path, annotation_path: Path) -> Optional[str]:
+        """Cache key of an image/annotation pair, or None when either file is missing"""
+        image_digest = self.digest(image_path)
+        annotation_digest = self.digest(annotation_path)
+        if image_digest is None or annotation_digest is None:
+            return None
+        return f"{image_digest}:{annotation_digest}"
+
+    def add(self, keys: Sequence[str], rows: np.ndarray, ok: np.ndarray) -> None:
+        """
+        Store extracted rows (rows[i] for keys[i] where ok[i]; failures are remembered too)
+
+        features.npy is rewritten to a temporary file and swapped in before the
+        manifest, so a crash in between leaves a consistent (older) cache.
+        """
+        self.dir.mkdir(parents=True, exist_ok=True)
+        old = self.features
+        n_old = 0 if old is None else len(old)
+        new_rows = rows[ok]
+
+        if len(new_rows):
+            tmp_path = self.dir / (FEATURES_NAME + '.tmp')
+            out = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=FEATURE_DTYPE,
+                                            shape=(n_old + len(new_rows), ELD_FEATURE_SCHEMA.size))
+            if n_old:
+                out[:n_old] = old
+            out[n_old:] = new_rows
+            out.flush()
+            del out
+            self._features = None
+            os.replace(tmp_path, self.dir / FEATURES_NAME)
+
+        row = n_old
+        for key, extracted in zip(keys, ok):
+            if extracted:
+                self.entries[key] = row
+                row += 1
+            else:
+                self.entries[key] = NO_FEATURES
+        self.save_manifest()
+
+    def save_manifest(self) -> None:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.dir / (MANIFEST_NAME + '.tmp')
+        tmp_path.write_text(json.dumps({
+            'layout': self.fingerprint,
+            'version': FEATURE_CACHE_VERSION,
+            'features': list(ELD_FEATURE_SCHEMA.names),
+            'entries': self.entries,
+            'files': self._files,
+        }))
+        os.replace(tmp_path, self.dir / MANIFEST_NAME)
+
+
+# Per-process model for pool workers
+_worker_model = None
+
+
+def _init_worker() -> None:
+    global _worker_model
+    try:
+        from .eld_model import FelinePainAssessmentELD
+    except ImportError:
+        from eld_model import FelinePainAssessmentELD
+    # One image per process at a time; OpenCV's own threads would only oversubscribe the pool
+    cv2.setNumThreads(1)
+    _worker_model = FelinePainAssessmentELD()
+
+
+def _extract_chunk(items: Sequence[Tuple[int, str, str]], model=None) -> Tuple[List[int], np.ndarray, np.ndarray]:
+    """Features of (index, image path, annotation path) items: (indices, rows, ok mask)"""
+    model = model if model is not None else _worker_model
+    rows = ELD_FEATURE_SCHEMA.new_matrix(len(items))
+    ok = np.zeros(len(items), dtype=bool)
+    for j, (_, image_path, annotation_path) in enumerate(items):
+        image = cv2.imread(image_path)
+        if image is None:
+            continue
+        landmarks = load_landmarks_from_json(Path(annotation_path))
+        if len(landmarks) < MIN_ANNOTATED_LANDMARKS:
+            continue
+        model.extract_feature_vector(image, landmarks, out=ELD_FEATURE_SCHEMA.vector_view(rows[j]))
+        ok[j] = True
+    return [index for index, _, _ in items], rows, ok
+
+
+def extract_features(
+    pairs: Sequence[Tuple[Path, Path]],
+    cache: Optional[FeatureCache] = None,
+    workers: int = 1,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    model=None,
+    progress: Optional[Callable[[int], None]] = None,
+) -> Tuple[np.ndarray, np.ndarray, Dict[str, int]]:
+    """
+    Feature rows for (image path, annotation path) pairs
+
+    Args:
+        pairs: One (image, annotation) pair per sample
+        cache: Persistent cache to read from and add to (None computes everything)
+        workers: Processes to extract with (1 extracts in this process with `model`)
+        chunk_size: Items per work unit sent to a worker
+        model: FelinePainAssessmentELD for in-process extraction (created if needed)
+        progress: Called with the number of items finished after every chunk
+
+    Returns:
+        X: (n, 70) float32 matrix (zero rows where ok is False)
+        ok: (n,) bool mask of samples with features
+        stats: Counts of cached, computed, failed and missing samples
+    """
+    X = ELD_FEATURE_SCHEMA.new_matrix(len(pairs))
+    ok = np.zeros(len(pairs), dtype=bool)
+    stats = {'cached': 0, 'computed': 0, 'failed': 0, 'missing': 0}
+
+    # Resolve cache hits; identical pairs (e.g. copied files) are extracted once
+    pending: Dict[str, List[int]] = {}
+    keys: List[Optional[str]] = []
+    for i, (image_path, annotation_path) in enumerate(pairs):
+        if cache is not None:
+            key = cache.key(image_path, annotation_path)
+        elif image_path.exists() and annotation_path.exists():
+            key = str(i)
+        else:
+            key = None
+        keys.append(key)
+        if key is None:
+            stats['missing'] += 1
+            continue
+        row = cache.entries.get(key) if cache is not None else None
+        if row is None:
+            pending.setdefault(key, []).append(i)
+        elif row == NO_FEATURES:
+            stats['failed'] += 1
+        else:
+            X[i] = cache.features[row]
+            ok[i] = True
+            stats['cached'] += 1
+
+    items = [(indices[0], str(pairs[indices[0]][0]), str(pairs[indices[0]][1])) for indices in pending.values()]
+    chunks = [items[start:start + chunk_size] for start in range(0, len(items), chunk_size)]
+
+    def collect(indices: List[int], rows: np.ndarray, extracted: np.ndarray) -> None:
+        for index, row, success in zip(indices, rows, extracted):
+            for i in pending[keys[index]]:
+                X[i] = row
+                ok[i] = success
+                stats['computed' if success else 'failed'] += 1
+        if progress is not None:
+            progress(len(indices))
+
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            for future in as_completed([pool.submit(_extract_chunk, chunk) for chunk in chunks]):
+                collect(*future.result())
+    elif chunks:
+        if model is None:
+            try:
+                from .eld_model import FelinePainAssessmentELD
+            except ImportError:
+                from eld_model import FelinePainAssessmentELD
+            model = FelinePainAssessmentELD()
+        for chunk in chunks:
+            collect(*_extract_chunk(chunk, model))
+
+    if cache is not None:
+        first = [indices[0] for indices in pending.values()]
+        if first:
+            cache.add([keys[i] for i in first], X[first], ok[first])
+        else:
+            # Refresh remembered file digests (new mtimes) even when nothing was extracted
+            cache.save_manifest()
+    return X, ok, stats
@@ -0,0 +1,122 @@
+"""
+Fixed-layout feature vectors for the ELD pain classifier
+
+The classifier consumes 70 features in a fixed order. Instead of building a
+string-keyed dict per image and re-reading it into a list, extractors write
+straight into a preallocated float32 array whose layout is described once by
+a FeatureSchema. float32 is the dtype scikit-learn trees evaluate in, so the
+array can be handed to the classifier as-is.
+
+A dict view is still available (as_dict / get) for debugging and for the
+FGS breakdown helpers that look features up by name.
+"""
+
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Number of landmarks whose surrounding patch contributes texture features
+TEXTURE_LANDMARKS = 20
+TEXTURE_PATCH_RADIUS = 2
+
+FEATURE_DTYPE = np.float32
+
+
+class FeatureSchema:
+    """Ordered feature names grouped into contiguous blocks"""
+
+    def __init__(self, groups: Sequence[Tuple[str, Sequence[str]]]):
+        names = []
+        self.groups: Dict[str, slice] = {}
+        for group, group_names in groups:
+            self.groups[group] = slice(len(names), len(names) + len(group_names))
+            names.extend(group_names)
+        self.names: Tuple[str, ...] = tuple(names)
+        self.index: Dict[str, int] = {name: i for i, name in enumerate(self.names)}
+        self.size = len(self.names)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def new_vector(self) -> 'PainFeatureVector':
+        """Allocate a zeroed feature vector"""
+        return PainFeatureVector(self)
+
+    def new_matrix(self, rows: int) -> np.ndarray:
+        """Allocate a zeroed (rows, size) matrix; rows can be filled in place via vector_view"""
+        return np.zeros((rows, self.size), dtype=FEATURE_DTYPE)
+
+    def vector_view(self, row: np.ndarray) -> 'PainFeatureVector':
+        """Wrap one row of a feature matrix without copying"""
+        return PainFeatureVector(self, row)
+
+
+ELD_FEATURE_SCHEMA = FeatureSchema([
+    ('landmarks', ('num_landmarks', 'landmark_density')),
+    ('distances', ('min_distance', 'max_distance', 'mean_distance', 'std_distance')),
+    ('hull', ('convex_hull_area',)),
+    ('regions', ('eye_opening', 'ear_height_variation', 'whisker_spread')),
+    ('texture', tuple(
+        f'texture_{stat}_{i}' for i in range(TEXTURE_LANDMARKS) for stat in ('mean', 'std', 'entropy')
+    )),
+])
+
+# Fixed classifier input layout (70 features)
+ELD_FEATURE_NAMES = ELD_FEATURE_SCHEMA.names
+
+
+class PainFeatureVector:
+    """A feature vector laid out according to a FeatureSchema"""
+
+    __slots__ = ('schema', 'values')
+
+    def __init__(self, schema: FeatureSchema = ELD_FEATURE_SCHEMA, values: Optional[np.ndarray] = None):
+        if values is None:
+            values = np.zeros(schema.size, dtype=FEATURE_DTYPE)
+        elif values.shape != (schema.size,) or values.dtype != FEATURE_DTYPE:
+            raise ValueError(f"Expected a ({schema.size},) {np.dtype(FEATURE_DTYPE).name} array, got {values.shape} {values.dtype}")
+        self.schema = schema
+        self.values = values
+
+    def group(self, name: str) -> np.ndarray:
+        """Writable view of one feature block (e.g. 'distances', 'texture')"""
+        return self.values[self.schema.groups[name]]
+
+    def __getitem__(self, name: str) -> float:
+        return float(self.values[self.schema.index[name]])
+
+    def __setitem__(self, name: str, value: float) -> None:
+        self.values[self.schema.index[name]] = value
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.schema.index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.schema.names)
+
+    def __len__(self) -> int:
+        return self.schema.size
+
+    def get(self, name: str, default: float = 0.0) -> float:
+        index = self.schema.index.get(name)
+        return default if index is None else float(self.values[index])
+
+    def as_dict(self) -> Dict[str, float]:
+        """Name -> value view for debugging and logging"""
+        return dict(zip(self.schema.names, self.values.tolist()))
+
+    def as_classifier_input(self) -> np.ndarray:
+        """(1, n_features) view suitable for predict / predict_proba"""
+        return self.values.reshape(1, -1)
+
+    def save(self, path: str) -> None:
+        """Save the raw values as a .npy file"""
+        np.save(path, self.values)
+
+    @classmethod
+    def load(cls, path: str, schema: FeatureSchema = ELD_FEATURE_SCHEMA) -> 'PainFeatureVector':
+        """Load values saved with save()"""
+        return cls(schema, np.load(path).astype(FEATURE_DTYPE, copy=False))
+
+    def __repr__(self) -> str:
+        return f"PainFeatureVector({self.as_dict()})"
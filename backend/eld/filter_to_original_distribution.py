@@ -4,20 +4,28 @@ Filter dataset to match original distribution:
 - Class 1 (Moderate Pain): 438 samples  
 - Class 2 (Severe Pain): 31 samples
 Total: 1,366 samples
+
+Selected files are hardlinked / reflinked into the output where possible
+(see dataset_materializer.py) and listed in its dataset_manifest.json.
 """
 import pandas as pd
 import argparse
 from pathlib import Path
-import shutil
 import random
 
+try:
+    from .dataset_materializer import DatasetMaterializer, LINK_MODES
+except ImportError:  # Run as a script from eld/
+    from dataset_materializer import DatasetMaterializer, LINK_MODES
+
 def filter_to_original_distribution(
     labels_csv,
     images_dir,
     annotations_dir,
     output_dir,
     target_counts=None,
-    random_seed=42
+    random_seed=42,
+    link_mode='auto'
 ):
     """
     Filter dataset to match original distribution
@@ -29,6 +37,7 @@ def filter_to_original_distribution(
         output_dir: Output directory for filtered dataset
         target_counts: Target counts per class
         random_seed: Random seed for reproducibility
+        link_mode: How files are placed in the output: auto, reflink, hardlink or copy
     """
     if target_counts is None:
         target_counts = {
@@ -96,7 +105,8 @@ def filter_to_original_distribution(
     images_path = Path(images_dir)
     annotations_path = Path(annotations_dir)
     
-    print(f"\n📁 Copying files to: {output_dir}")
+    materializer = DatasetMaterializer(output_path, link_mode)
+    print(f"\n📁 Materializing files in: {output_dir}")
     copied = 0
     for _, row in selected_df.iterrows():
         filename = row['filename']
@@ -106,7 +116,7 @@ def filter_to_original_distribution(
         src_img = images_path / filename
         if src_img.exists():
             dst_img = output_images / filename
-            shutil.copy2(src_img, dst_img)
+            materializer.place(src_img, dst_img)
             copied += 1
         else:
             print(f"   ⚠️  Image not found: {filename}")
@@ -119,15 +129,22 @@ def filter_to_original_distribution(
         
         if src_ann.exists():
             dst_ann = output_annotations / src_ann.name
-            shutil.copy2(src_ann, dst_ann)
+            materializer.place(src_ann, dst_ann)
+        
+        if src_img.exists():
+            materializer.add_sample(
+                filename, row['pain_level'],
+                annotation=f"annotations/{src_ann.name}", has_annotation=src_ann.exists()
+            )
     
     # Save filtered CSV
     output_csv = output_path / 'labels_clean.csv'
     selected_df[['filename', 'pain_level']].to_csv(output_csv, index=False)
+    manifest_path = materializer.write_manifest(source=str(labels_csv), random_seed=random_seed)
     
     print(f"\n✅ Filtering complete!")
-    print(f"   Copied {copied} images")
-    print(f"   Created {output_csv}")
+    print(f"   Materialized {copied} images ({materializer.summary()})")
+    print(f"   Created {output_csv} and {manifest_path.name}")
     print(f"   Output directory: {output_dir}")
 
 if __name__ == "__main__":
@@ -146,6 +163,8 @@ if __name__ == "__main__":
                        help='Target count for Moderate Pain class')
     parser.add_argument('--target-severe', type=int, default=31,
                        help='Target count for Severe Pain class')
+    parser.add_argument('--link-mode', choices=LINK_MODES, default='auto',
+                       help='How selected files are placed in the output')
     
     args = parser.parse_args()
     
@@ -158,7 +177,8 @@ if __name__ == "__main__":
             0: args.target_no_pain,
             1: args.target_moderate,
             2: args.target_severe
-        }
+        },
+        link_mode=args.link_mode
     )
 
 
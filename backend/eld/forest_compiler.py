@@ -0,0 +1,109 @@
+"""
+Compiled RandomForest predictor for ELD classification
+
+scikit-learn's predict / predict_proba are built for large batches: every
+call validates its input and dispatches one job per tree through joblib.
+For a single image that overhead dominates the actual tree walk.
+
+CompiledForest flattens all trees of a fitted forest into contiguous NumPy
+node arrays once (at model load time) and evaluates every tree for one or
+many rows in a vectorized traversal, returning probabilities and the
+predicted class from the same pass.
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+
+class CompiledForest:
+    """All trees of a fitted forest classifier packed into flat node arrays"""
+
+    def __init__(self, left: np.ndarray, right: np.ndarray, feature: np.ndarray, threshold: np.ndarray,
+                 leaf_proba: np.ndarray, roots: np.ndarray, classes: np.ndarray, max_depth: int, n_features: int):
+        self.left = left
+        self.right = right
+        self.feature = feature
+        self.threshold = threshold
+        self.leaf_proba = leaf_proba
+        self.roots = roots
+        self.classes_ = classes
+        self.max_depth = max_depth
+        self.n_features_in_ = n_features
+
+    @classmethod
+    def from_sklearn(cls, forest) -> 'CompiledForest':
+        """
+        Compile a fitted RandomForestClassifier / ExtraTreesClassifier
+
+        Raises:
+            ValueError: If the estimator is unfitted or not a single-output tree ensemble
+        """
+        if not hasattr(forest, 'classes_') or not hasattr(forest, 'estimators_'):
+            raise ValueError("Classifier is not a fitted tree ensemble")
+        if getattr(forest, 'n_outputs_', 1) != 1:
+            raise ValueError("Multi-output forests are not supported")
+
+        n_classes = len(forest.classes_)
+        lefts, rights, features, thresholds, probas, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            node_ids = np.arange(tree.node_count, dtype=np.int64)
+            is_leaf = tree.children_left == -1
+
+            # Leaves point at themselves so every row can take the same number of steps
+            left = np.where(is_leaf, node_ids, tree.children_left) + offset
+            right = np.where(is_leaf, node_ids, tree.children_right) + offset
+            feature = np.where(is_leaf, 0, tree.feature)
+
+            # Same normalisation as DecisionTreeClassifier.predict_proba
+            value = tree.value[:, 0, :n_classes].astype(np.float64)
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+
+            lefts.append(left)
+            rights.append(right)
+            features.append(feature)
+            thresholds.append(tree.threshold)
+            probas.append(value / normalizer)
+            roots.append(offset)
+            offset += tree.node_count
+            max_depth = max(max_depth, int(tree.max_depth))
+
+        return cls(
+            left=np.concatenate(lefts),
+            right=np.concatenate(rights),
+            feature=np.concatenate(features).astype(np.intp),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            leaf_proba=np.concatenate(probas),
+            roots=np.asarray(roots, dtype=np.int64),
+            classes=np.asarray(forest.classes_),
+            max_depth=max_depth,
+            n_features=int(getattr(forest, 'n_features_in_', 0)),
+        )
+
+    def _leaves(self, X: np.ndarray) -> np.ndarray:
+        """Walk every tree for every row; returns (n_rows, n_trees) leaf node ids"""
+        # sklearn compares float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32).reshape(-1, self.n_features_in_ or np.shape(X)[-1])
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Mean class probabilities over all trees, shape (n_rows, n_classes)"""
+        return self.leaf_proba[self._leaves(X)].mean(axis=1)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Predicted class labels, shape (n_rows,)"""
+        return self.predict_with_proba(X)[1]
+
+    def predict_with_proba(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Probabilities and argmax class labels from a single traversal"""
+        proba = self.predict_proba(X)
+        return proba, self.classes_.take(np.argmax(proba, axis=1))
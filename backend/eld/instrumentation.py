@@ -0,0 +1,178 @@
+"""
+Per-stage timing instrumentation for the ELD inference pipeline
+
+A TimingRecord collects wall and CPU time per pipeline stage (face
+detection, region planning, specialists, consensus, feature extraction,
+classification), plus counters such as candidate crops and image size, for
+one request. The active record is held in a context variable so the
+magnifying ensemble can report stages without threading a record through
+every call; when no record is active, stage() is a shared no-op.
+
+Finished records are folded into process-wide StageHistograms that the
+metrics endpoint reads.
+
+Instrumentation is opt-in: set ELD_INSTRUMENTATION=true, construct
+FelinePainAssessmentELD(instrument=True), or pass debug=True per call.
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+INSTRUMENTATION_ENABLED = os.getenv("ELD_INSTRUMENTATION", "false").lower() in ("1", "true", "yes")
+
+# Histogram bucket upper bounds in milliseconds (the last bucket is open-ended)
+HISTOGRAM_BUCKETS_MS: Tuple[float, ...] = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+class TimingRecord:
+    """Stage timings and counters for one request"""
+
+    def __init__(self, name: str = 'assess_pain'):
+        self.name = name
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, int] = {}
+        self.meta: Dict[str, Any] = {}
+        self._started_wall = time.perf_counter()
+        self._started_cpu = time.thread_time()
+        self.total_wall_ms: Optional[float] = None
+        self.total_cpu_ms: Optional[float] = None
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a block; repeated stages accumulate"""
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            stats = self.stages.setdefault(name, {'wall_ms': 0.0, 'cpu_ms': 0.0, 'calls': 0})
+            stats['wall_ms'] += (time.perf_counter() - wall) * 1000.0
+            stats['cpu_ms'] += (time.thread_time() - cpu) * 1000.0
+            stats['calls'] += 1
+
+    def count(self, name: str, value: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + int(value)
+
+    def finish(self) -> 'TimingRecord':
+        self.total_wall_ms = (time.perf_counter() - self._started_wall) * 1000.0
+        self.total_cpu_ms = (time.thread_time() - self._started_cpu) * 1000.0
+        return self
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'total_wall_ms': None if self.total_wall_ms is None else round(self.total_wall_ms, 3),
+            'total_cpu_ms': None if self.total_cpu_ms is None else round(self.total_cpu_ms, 3),
+            'stages': {
+                name: {'wall_ms': round(s['wall_ms'], 3), 'cpu_ms': round(s['cpu_ms'], 3), 'calls': s['calls']}
+                for name, s in self.stages.items()
+            },
+            'counters': dict(self.counters),
+            'meta': dict(self.meta),
+        }
+
+
+class StageHistograms:
+    """Process-wide wall-time histograms per stage, fed by finished records"""
+
+    def __init__(self, buckets_ms: Tuple[float, ...] = HISTOGRAM_BUCKETS_MS):
+        self.buckets_ms = tuple(buckets_ms)
+        self._lock = threading.Lock()
+        self._series: Dict[str, Dict[str, Any]] = {}
+
+    def _observe(self, series: str, wall_ms: float, cpu_ms: float) -> None:
+        entry = self._series.get(series)
+        if entry is None:
+            entry = self._series[series] = {
+                'count': 0, 'wall_ms_sum': 0.0, 'cpu_ms_sum': 0.0,
+                'buckets': [0] * (len(self.buckets_ms) + 1),
+            }
+        entry['count'] += 1
+        entry['wall_ms_sum'] += wall_ms
+        entry['cpu_ms_sum'] += cpu_ms
+        entry['buckets'][bisect_left(self.buckets_ms, wall_ms)] += 1
+
+    def record(self, record: TimingRecord) -> None:
+        with self._lock:
+            if record.total_wall_ms is not None:
+                self._observe(record.name, record.total_wall_ms, record.total_cpu_ms or 0.0)
+            for name, stats in record.stages.items():
+                self._observe(f'{record.name}.{name}', stats['wall_ms'], stats['cpu_ms'])
+
+    def _quantile(self, buckets, count: int, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (None if in the open bucket)"""
+        target = q * count
+        seen = 0
+        for bound, n in zip(self.buckets_ms, buckets):
+            seen += n
+            if seen >= target:
+                return bound
+        return None
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            series = {}
+            for name, entry in sorted(self._series.items()):
+                count = entry['count']
+                labels = [f'le_{bound:g}' for bound in self.buckets_ms] + ['le_inf']
+                series[name] = {
+                    'count': count,
+                    'wall_ms_mean': round(entry['wall_ms_sum'] / count, 3),
+                    'cpu_ms_mean': round(entry['cpu_ms_sum'] / count, 3),
+                    'wall_ms_p50': self._quantile(entry['buckets'], count, 0.5),
+                    'wall_ms_p95': self._quantile(entry['buckets'], count, 0.95),
+                    'buckets': dict(zip(labels, entry['buckets'])),
+                }
+            return {'buckets_ms': list(self.buckets_ms), 'series': series}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+# Histograms shared by every ELD instance in this process
+stage_histograms = StageHistograms()
+
+_current_record: ContextVar[Optional[TimingRecord]] = ContextVar('eld_timing_record', default=None)
+_NO_STAGE = nullcontext()
+
+
+def current_record() -> Optional[TimingRecord]:
+    return _current_record.get()
+
+
+def stage(name: str):
+    """Time a block against the active record; no-op when none is active"""
+    record = _current_record.get()
+    return record.stage(name) if record is not None else _NO_STAGE
+
+
+def count(name: str, value: int = 1) -> None:
+    record = _current_record.get()
+    if record is not None:
+        record.count(name, value)
+
+
+@contextmanager
+def timing_record(name: str = 'assess_pain', enabled: bool = True) -> Iterator[Optional[TimingRecord]]:
+    """
+    Make a new record active for the duration of the block
+
+    On exit the record is finished and added to stage_histograms. Yields
+    None (and records nothing) when `enabled` is false.
+    """
+    if not enabled:
+        yield None
+        return
+    record = TimingRecord(name)
+    token = _current_record.set(record)
+    try:
+        yield record
+    finally:
+        _current_record.reset(token)
+        stage_histograms.record(record.finish())
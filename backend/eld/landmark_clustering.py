@@ -0,0 +1,161 @@
+"""
+Consensus clustering for Magnifying Ensemble landmark candidates
+
+The magnifying ensemble produces several landmark candidates for every
+anatomical point (one per magnification scale and specialist). This module
+merges those candidates into consensus landmarks.
+
+Neighbour search uses a uniform grid with cell size equal to the clustering
+threshold, so every point only needs to be compared against the 3x3 block of
+cells around it. Candidate pairs, distances and cluster centroids are all
+computed on NumPy arrays; the only per-point work left in Python is the
+greedy leader assignment, which is linear in the number of candidates.
+"""
+
+from typing import NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Distance (in pixels) under which two candidates belong to the same cluster
+DEFAULT_CLUSTER_THRESHOLD = 15.0
+
+# Maximum jitter (in pixels) applied when padding short results
+PAD_JITTER = 5
+
+
+class ConsensusClusters(NamedTuple):
+    """Cluster centroids (k, 2) and member counts (k,) in discovery order"""
+    centroids: np.ndarray
+    sizes: np.ndarray
+
+
+def _as_points(landmarks) -> np.ndarray:
+    """Convert a landmark sequence or array to an (n, 2) int64 array"""
+    points = np.asarray(landmarks)
+    if points.size == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    return points.reshape(-1, 2).astype(np.int64, copy=False)
+
+
+def _neighbour_graph(points: np.ndarray, threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Build a CSR adjacency of all point pairs closer than `threshold`
+
+    Returns:
+        (indptr, indices) where the neighbours of point i are
+        indices[indptr[i]:indptr[i + 1]]
+    """
+    n = len(points)
+    cells = np.floor_divide(points, threshold).astype(np.int64)
+    cells -= cells.min(axis=0)
+    # One spare cell on every side keeps the +/-1 offsets from wrapping rows
+    width = int(cells[:, 1].max()) + 3
+    keys = (cells[:, 0] + 1) * width + (cells[:, 1] + 1)
+
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+
+    rows = []
+    cols = []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            target = keys + dx * width + dy
+            lo = np.searchsorted(sorted_keys, target, side='left')
+            hi = np.searchsorted(sorted_keys, target, side='right')
+            counts = hi - lo
+            total = int(counts.sum())
+            if total == 0:
+                continue
+            starts = np.repeat(lo - (np.cumsum(counts) - counts), counts)
+            rows.append(np.repeat(np.arange(n), counts))
+            cols.append(order[starts + np.arange(total)])
+
+    if not rows:
+        return np.zeros(n + 1, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    i = np.concatenate(rows)
+    j = np.concatenate(cols)
+    diff = points[i] - points[j]
+    dist_sq = np.einsum('ij,ij->i', diff, diff)
+    keep = (dist_sq < threshold * threshold) & (i != j)
+    i = i[keep]
+    j = j[keep]
+
+    order = np.argsort(i, kind='stable')
+    indices = j[order]
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(i, minlength=n), out=indptr[1:])
+    return indptr, indices
+
+
+def cluster_landmarks(landmarks, threshold: float = DEFAULT_CLUSTER_THRESHOLD) -> ConsensusClusters:
+    """
+    Greedy leader clustering of landmark candidates
+
+    Candidates are visited in order; each unassigned candidate starts a new
+    cluster and absorbs every unassigned candidate within `threshold` of it.
+    Centroids use integer floor division, matching the pixel grid.
+
+    Args:
+        landmarks: (n, 2) array or sequence of (x, y) candidates
+        threshold: Clustering distance in pixels
+
+    Returns:
+        ConsensusClusters with centroids in cluster discovery order
+    """
+    points = _as_points(landmarks)
+    n = len(points)
+    if n == 0:
+        return ConsensusClusters(np.empty((0, 2), dtype=np.int64), np.empty(0, dtype=np.int64))
+
+    indptr, indices = _neighbour_graph(points, threshold)
+
+    labels = np.full(n, -1, dtype=np.int64)
+    n_clusters = 0
+    for i in range(n):
+        if labels[i] >= 0:
+            continue
+        neighbours = indices[indptr[i]:indptr[i + 1]]
+        labels[neighbours[labels[neighbours] < 0]] = n_clusters
+        labels[i] = n_clusters
+        n_clusters += 1
+
+    sizes = np.bincount(labels, minlength=n_clusters)
+    sums = np.zeros((n_clusters, 2), dtype=np.int64)
+    np.add.at(sums, labels, points)
+    centroids = np.floor_divide(sums, sizes[:, None])
+    return ConsensusClusters(centroids, sizes)
+
+
+def select_consensus_landmarks(
+    clusters: ConsensusClusters,
+    target_count: int = 48,
+    seed: Optional[int] = 0,
+    default_point: Sequence[int] = (100, 100)
+) -> np.ndarray:
+    """
+    Reduce or pad cluster centroids to exactly `target_count` landmarks
+
+    When there are too many clusters the largest ones are kept. When there
+    are too few, centroids are repeated with a small jitter drawn from a
+    seeded generator so the same input always yields the same landmarks.
+
+    Returns:
+        (target_count, 2) int64 array
+    """
+    centroids, sizes = clusters
+    if len(centroids) > target_count:
+        # Larger clusters = more agreement between scales = more confidence
+        keep = np.argsort(sizes)[::-1][:target_count]
+        return centroids[keep]
+
+    missing = target_count - len(centroids)
+    if missing == 0:
+        return centroids
+    if len(centroids) == 0:
+        return np.tile(np.asarray(default_point, dtype=np.int64), (target_count, 1))
+
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(centroids), size=missing)
+    jitter = rng.integers(-PAD_JITTER, PAD_JITTER + 1, size=(missing, 2))
+    return np.concatenate([centroids, centroids[picks] + jitter])
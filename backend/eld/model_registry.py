@@ -0,0 +1,173 @@
+"""
+Process-wide registry for ELD model artifacts
+
+Haar cascades, specialist CNNs and the pain classifier are expensive to build
+and identical for every FelinePainAssessmentELD instance. The registry loads
+each artifact lazily on first use, hands the same object to every caller
+(across instances and threads) and records how long the load took and how
+much resident memory it added.
+
+Artifacts that are not safe to share between threads (OpenCV cascades keep
+per-call scratch state) are registered with per_thread=True: each thread
+then loads and keeps its own instance.
+
+Calling prewarm() before a server forks its workers (e.g. gunicorn --preload)
+loads everything once in the parent so children share the pages
+copy-on-write instead of each paying the cold start.
+"""
+
+import logging
+import os
+import resource
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+def current_rss_bytes() -> Optional[int]:
+    """Resident set size of this process in bytes (None if unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        # Peak rather than current RSS, but still useful where /proc is missing (macOS reports bytes)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == 'Darwin' else peak * 1024
+    except Exception:
+        return None
+
+
+class ModelRegistry:
+    """Lazily loaded, shared model artifacts keyed by name"""
+
+    def __init__(self):
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._artifacts: Dict[str, Any] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._per_thread: Set[str] = set()
+        self._thread_local = threading.local()
+        self._generation = 0  # Bumped by clear() to drop every thread's instances
+
+    def register(self, name: str, loader: Callable[[], Any], per_thread: bool = False) -> None:
+        """
+        Register a zero-argument loader; nothing is loaded until get()
+
+        With per_thread=True every thread gets its own instance from the loader.
+        """
+        with self._lock:
+            self._loaders.setdefault(name, loader)
+            if per_thread:
+                self._per_thread.add(name)
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._artifacts or name in self._thread_artifacts()
+
+    def _thread_artifacts(self) -> Dict[str, Any]:
+        local = self._thread_local
+        if getattr(local, 'generation', None) != self._generation:
+            local.generation = self._generation
+            local.artifacts = {}
+        return local.artifacts
+
+    def get(self, name: str, loader: Optional[Callable[[], Any]] = None) -> Any:
+        """
+        Return the artifact, loading it on first use
+
+        Concurrent first calls for the same name block on a per-name lock so
+        the loader runs exactly once; other artifacts can load in parallel.
+
+        Raises:
+            KeyError: If no loader was registered or passed for `name`
+        """
+        try:
+            return self._artifacts[name]
+        except KeyError:
+            pass
+        thread_artifacts = self._thread_artifacts()
+        if name in thread_artifacts:
+            return thread_artifacts[name]
+
+        with self._lock:
+            if loader is not None:
+                self._loaders.setdefault(name, loader)
+            if name not in self._loaders:
+                raise KeyError(f"No loader registered for model artifact '{name}'")
+            name_lock = self._locks.setdefault(name, threading.Lock())
+
+        if name in self._per_thread:
+            # Only this thread sees the instance, so no lock is needed
+            thread_artifacts[name] = self._load(name)
+            return thread_artifacts[name]
+
+        with name_lock:
+            if name in self._artifacts:
+                return self._artifacts[name]
+            self._artifacts[name] = self._load(name)
+            return self._artifacts[name]
+
+    def _load(self, name: str) -> Any:
+        rss_before = current_rss_bytes()
+        started = time.perf_counter()
+        artifact = self._loaders[name]()
+        elapsed = time.perf_counter() - started
+        rss_after = current_rss_bytes()
+
+        rss_delta = None
+        if rss_before is not None and rss_after is not None:
+            rss_delta = max(rss_after - rss_before, 0)
+        with self._lock:
+            instances = self._stats.get(name, {}).get('instances', 0) + 1
+            self._stats[name] = {
+                'load_seconds': round(elapsed, 4),
+                'rss_delta_mb': None if rss_delta is None else round(rss_delta / (1024 * 1024), 2),
+                'loaded_at': time.time(),
+                'pid': os.getpid(),
+                'instances': instances,
+            }
+        logger.info(f"Loaded model artifact '{name}' in {elapsed * 1000:.1f} ms"
+                    + ("" if rss_delta is None else f" (+{rss_delta / (1024 * 1024):.1f} MB RSS)"))
+        return artifact
+
+    def prewarm(self, names: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Load the given (default: all registered) artifacts now
+
+        Failures are logged and skipped so one missing file does not block
+        the rest. Returns report().
+        """
+        with self._lock:
+            targets = list(names) if names is not None else list(self._loaders)
+        for name in targets:
+            try:
+                self.get(name)
+            except Exception as e:
+                logger.warning(f"Failed to prewarm model artifact '{name}': {e}")
+        return self.report()
+
+    def report(self) -> Dict[str, Any]:
+        """Per-artifact load time and RSS delta plus current process RSS"""
+        rss = current_rss_bytes()
+        return {
+            'pid': os.getpid(),
+            'rss_mb': None if rss is None else round(rss / (1024 * 1024), 2),
+            'registered': sorted(self._loaders),
+            'artifacts': {name: dict(stats) for name, stats in self._stats.items()},
+        }
+
+    def clear(self) -> None:
+        """Drop all loaded artifacts, per-thread ones included (loaders stay registered)"""
+        with self._lock:
+            self._artifacts.clear()
+            self._stats.clear()
+            self._locks.clear()
+            self._generation += 1
+
+
+# Process-wide registry shared by every ELD component
+model_registry = ModelRegistry()
@@ -1,10 +1,13 @@
 """
 Train ELD Pain Classifier with Augmented Dataset
 Uses JSON annotations for landmarks and applies SMOTE for balancing
+
+--mode tune searches RandomForest hyperparameters on the cached features
+instead (see classifier_tuning.py) and writes the chosen configuration to
+eld_classifier_config.json; train with it via --classifier-config.
 """
 import os
 import json
-import cv2
 import numpy as np
 import pandas as pd
 from pathlib import Path
@@ -18,86 +21,69 @@ from sklearn.metrics import classification_report, confusion_matrix, accuracy_sc
 from imblearn.over_sampling import SMOTE
 import matplotlib.pyplot as plt
 import seaborn as sns
-from typing import List, Tuple, Dict
+from typing import Tuple, Dict, Optional
 
 # Import ELD model components
 import sys
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from eld_model import FelinePainAssessmentELD
-
-def load_landmarks_from_json(json_path: Path) -> List[Tuple[int, int]]:
-    """Load landmarks from JSON annotation file"""
-    try:
-        with open(json_path, 'r') as f:
-            data = json.load(f)
-        
-        if 'labels' in data and len(data['labels']) >= 10:
-            # Convert to list of tuples
-            landmarks = [(int(point[0]), int(point[1])) for point in data['labels']]
-            return landmarks
-        return []
-    except Exception as e:
-        print(f"Error loading {json_path}: {e}")
-        return []
+from feature_cache import FeatureCache, extract_features, DEFAULT_CHUNK_SIZE
+from dataset_materializer import MANIFEST_NAME, read_manifest
+from classifier_tuning import (
+    DEFAULT_CLASSIFIER_PARAMS, DEFAULT_PARAM_GRID, grid_configs, random_configs, run_search,
+    pareto_frontier, choose_config
+)
 
 def extract_features_from_dataset(
     images_dir: Path,
     annotations_dir: Path,
     labels_df: pd.DataFrame,
-    eld_model: FelinePainAssessmentELD
+    eld_model: Optional[FelinePainAssessmentELD] = None,
+    workers: int = 1,
+    cache_dir: Optional[Path] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
 ) -> Tuple[np.ndarray, np.ndarray]:
     """
     Extract 70-dimensional features from all images using landmarks from JSON
     
+    Features come from the feature cache in `cache_dir` when the image and
+    annotation are unchanged; the rest are extracted on `workers` processes
+    (see feature_cache.py) and added to the cache.
+    
     Returns:
         X: Feature matrix (n_samples, 70)
         y: Labels (n_samples,)
     """
-    X = []
-    y = []
-    failed_count = 0
-    
-    print("\n🔍 Extracting features from dataset...")
-    for idx, row in tqdm(labels_df.iterrows(), total=len(labels_df), desc="Processing"):
-        filename = row['filename']
-        pain_level = int(row['pain_level'])
-        
-        # Load image
-        image_path = images_dir / filename
-        if not image_path.exists():
-            failed_count += 1
-            continue
-        
-        image = cv2.imread(str(image_path))
-        if image is None:
-            failed_count += 1
-            continue
-        
-        # Load landmarks from JSON annotation
-        annotation_path = annotations_dir / f"{Path(filename).stem}.json"
-        landmarks = load_landmarks_from_json(annotation_path)
-        
-        if len(landmarks) < 10:
-            failed_count += 1
-            continue
-        
-        # Extract features using ELD model
-        features_dict = eld_model.extract_pain_features(image, landmarks)
-        
-        # Convert to feature vector
-        feature_vector = eld_model._prepare_feature_vector(features_dict)
-        
-        if len(feature_vector) == 70:  # Ensure we have all 70 features
-            X.append(feature_vector)
-            y.append(pain_level)
-        else:
-            failed_count += 1
+    if 'image_path' in labels_df.columns:
+        # Read from a dataset manifest (see dataset_materializer.read_manifest)
+        pairs = [
+            (Path(image_path), Path(annotation_path) if annotation_path else annotations_dir / f"{Path(image_path).stem}.json")
+            for image_path, annotation_path in zip(labels_df['image_path'], labels_df['annotation_path'])
+        ]
+    else:
+        pairs = [
+            (images_dir / filename, annotations_dir / f"{Path(filename).stem}.json")
+            for filename in labels_df['filename']
+        ]
+    y = labels_df['pain_level'].to_numpy(dtype=np.int64)
+    cache = FeatureCache(cache_dir) if cache_dir is not None else None
+    
+    print(f"\n🔍 Extracting features from dataset ({workers} worker{'s' if workers != 1 else ''})...")
+    with tqdm(total=len(pairs), desc="Processing") as bar:
+        X, extracted, stats = extract_features(
+            pairs, cache=cache, workers=workers, chunk_size=chunk_size, model=eld_model,
+            progress=bar.update
+        )
+        bar.update(len(pairs) - bar.n)
     
+    if cache is not None:
+        print(f"   Feature cache: {stats['cached']} cached, {stats['computed']} extracted ({cache.dir})")
+    failed_count = stats['failed'] + stats['missing']
     if failed_count > 0:
         print(f"⚠️  Failed to extract features from {failed_count} images")
     
-    X = np.array(X)
-    y = np.array(y)
+    X = X[extracted]
+    y = y[extracted]
     
     print(f"✅ Extracted features from {len(X)} samples")
     print(f"   Feature shape: {X.shape}")
@@ -113,7 +99,11 @@ def train_classifier(
     y_train: np.ndarray,
     use_smote: bool = True,
     n_estimators: int = 300,
-    random_state: int = 42
+    random_state: int = 42,
+    max_depth: Optional[int] = 10,
+    min_samples_split: int = 5,
+    min_samples_leaf: int = 2,
+    max_features = 'sqrt'
 ) -> RandomForestClassifier:
     """
     Train Random Forest classifier with optional SMOTE
@@ -124,6 +114,7 @@ def train_classifier(
         use_smote: Whether to apply SMOTE oversampling
         n_estimators: Number of trees in Random Forest
         random_state: Random seed
+        max_depth, min_samples_split, min_samples_leaf, max_features: Tree parameters
     
     Returns:
         Trained classifier
@@ -160,9 +151,10 @@ def train_classifier(
     # Train Random Forest
     clf = RandomForestClassifier(
         n_estimators=n_estimators,
-        max_depth=10,
-        min_samples_split=5,
-        min_samples_leaf=2,
+        max_depth=max_depth,
+        min_samples_split=min_samples_split,
+        min_samples_leaf=min_samples_leaf,
+        max_features=max_features,
         class_weight='balanced',  # Additional balancing
         random_state=random_state,
         n_jobs=-1  # Use all CPU cores
@@ -253,8 +245,122 @@ def evaluate_model(
     
     return results
 
+def tune_classifier(
+    X_train: np.ndarray,
+    y_train: np.ndarray,
+    output_dir: Path,
+    search: str = 'grid',
+    param_grid: Optional[Dict] = None,
+    n_iter: int = 20,
+    cv_folds: int = 5,
+    use_smote: bool = True,
+    workers: int = 1,
+    random_state: int = 42,
+    accuracy_tolerance: float = 0.005,
+    max_latency_ms: Optional[float] = None
+) -> Optional[Dict]:
+    """
+    Search RandomForest hyperparameters and write the chosen configuration
+    
+    Writes eld_tuning_results.json (every configuration and the accuracy /
+    latency frontier) and eld_classifier_config.json (the chosen parameters)
+    to output_dir.
+    
+    Returns:
+        The chosen configuration's result, or None when none fits max_latency_ms
+    """
+    param_grid = param_grid or DEFAULT_PARAM_GRID
+    if search == 'random':
+        configs = random_configs(param_grid, n_iter, seed=random_state)
+    else:
+        configs = grid_configs(param_grid)
+    
+    print(f"\n🔧 Tuning classifier: {len(configs)} configurations, {cv_folds}-fold CV, "
+          f"{workers} worker{'s' if workers != 1 else ''}...")
+    with tqdm(total=len(configs), desc="Configurations") as bar:
+        results = run_search(
+            X_train, y_train, configs, folds=cv_folds, use_smote=use_smote,
+            workers=workers, random_state=random_state, progress=bar.update
+        )
+    
+    frontier = pareto_frontier(results)
+    chosen = choose_config(results, accuracy_tolerance=accuracy_tolerance, max_latency_ms=max_latency_ms)
+    
+    print(f"\n{'='*70}")
+    print("Accuracy / latency frontier:")
+    print(f"{'accuracy':>9} {'f1':>6} {'latency':>9} {'fit':>7} {'size':>9}  params")
+    for result in frontier:
+        marker = '  <- chosen' if result is chosen else ''
+        print(f"{result['accuracy']:9.4f} {result['f1_macro']:6.3f} {result['latency_ms']:7.3f}ms "
+              f"{result['fit_seconds']:6.2f}s {result['model_bytes'] / 1e6:7.2f}MB  {result['params']}{marker}")
+    print(f"{'='*70}")
+    
+    tuning = {
+        'search': search,
+        'cv_folds': cv_folds,
+        'use_smote': use_smote,
+        'train_samples': int(len(y_train)),
+        'accuracy_tolerance': accuracy_tolerance,
+        'max_latency_ms': max_latency_ms,
+        'param_grid': param_grid,
+        'results': sorted(results, key=lambda r: -r['accuracy']),
+        'frontier': frontier,
+        'chosen': chosen,
+    }
+    tuning_path = output_dir / 'eld_tuning_results.json'
+    with open(tuning_path, 'w') as f:
+        json.dump(tuning, f, indent=2)
+    print(f"\n✅ Saved tuning results to {tuning_path}")
+    
+    if chosen is None:
+        print(f"❌ No configuration meets the {max_latency_ms}ms latency budget")
+        return None
+    
+    config_path = output_dir / 'eld_classifier_config.json'
+    with open(config_path, 'w') as f:
+        json.dump({**chosen['params'], 'cv_accuracy': chosen['accuracy'], 'latency_ms': chosen['latency_ms']}, f, indent=2)
+    print(f"✅ Saved chosen configuration to {config_path}")
+    print(f"   Train with it: --classifier-config {config_path}")
+    return chosen
+
+def load_classifier_config(config_path: Path) -> Dict:
+    """RandomForest parameters from a config written by tune_classifier"""
+    with open(config_path) as f:
+        config = json.load(f)
+    return {name: config[name] for name in DEFAULT_CLASSIFIER_PARAMS if name in config}
+
+def load_labels(dataset_path: Path, labels_csv: Path) -> Optional[pd.DataFrame]:
+    """
+    Samples to train on: the dataset manifest when it agrees with the labels CSV, else the CSV
+
+    The CSV is what gets corrected by hand (see create_labels_csv.py), so
+    the manifest is only used when it is at least as new as the CSV and
+    lists the same filenames with the same labels. None when neither exists.
+    """
+    manifest_df = read_manifest(dataset_path)
+    if manifest_df is None:
+        return pd.read_csv(labels_csv) if labels_csv.exists() else None
+    if not labels_csv.exists():
+        print("   Using dataset manifest")
+        return manifest_df
+
+    csv_df = pd.read_csv(labels_csv)
+    if (dataset_path / MANIFEST_NAME).stat().st_mtime < labels_csv.stat().st_mtime:
+        print(f"⚠️  {labels_csv.name} is newer than {MANIFEST_NAME}; using the labels CSV")
+        return csv_df
+    csv_labels = dict(zip(csv_df['filename'], pd.to_numeric(csv_df['pain_level'], errors='coerce')))
+    manifest_labels = dict(zip(manifest_df['filename'], manifest_df['pain_level']))
+    if csv_labels != manifest_labels:
+        print(f"⚠️  {MANIFEST_NAME} does not match the filenames and labels in {labels_csv.name}; "
+              f"using the labels CSV")
+        return csv_df
+    print("   Using dataset manifest")
+    return manifest_df
+
 def main():
     parser = argparse.ArgumentParser(description='Train ELD Pain Classifier')
+    parser.add_argument('--mode', choices=['train', 'tune'], default='train',
+                       help='train a model, or tune its hyperparameters on the training split')
     parser.add_argument('--dataset', type=str, required=True,
                        help='Path to augmented dataset directory')
     parser.add_argument('--output', type=str, default='eld',
@@ -267,6 +373,28 @@ def main():
                        help='Number of trees in Random Forest')
     parser.add_argument('--random-state', type=int, default=42,
                        help='Random seed')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                       help='Processes for feature extraction')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                       help='Images per feature extraction work unit')
+    parser.add_argument('--feature-cache', type=str, default=None,
+                       help='Feature cache directory (default: <dataset>/.feature_cache)')
+    parser.add_argument('--no-feature-cache', action='store_true',
+                       help='Extract every feature again without reading or writing the cache')
+    parser.add_argument('--classifier-config', type=str, default=None,
+                       help='Classifier parameters chosen by --mode tune (eld_classifier_config.json)')
+    parser.add_argument('--search', choices=['grid', 'random'], default='grid',
+                       help='Tune: evaluate the whole grid or --n-iter random configurations')
+    parser.add_argument('--n-iter', type=int, default=20,
+                       help='Tune: configurations sampled by random search')
+    parser.add_argument('--param-grid', type=str, default=None,
+                       help='Tune: JSON file mapping RandomForest parameters to candidate values')
+    parser.add_argument('--cv-folds', type=int, default=5,
+                       help='Tune: stratified CV folds')
+    parser.add_argument('--accuracy-tolerance', type=float, default=0.005,
+                       help='Tune: choose the fastest configuration within this of the best CV accuracy')
+    parser.add_argument('--max-latency-ms', type=float, default=None,
+                       help='Tune: only choose configurations at or under this single-image latency')
     
     args = parser.parse_args()
     
@@ -283,23 +411,25 @@ def main():
     if not annotations_dir.exists():
         print(f"❌ Annotations directory not found: {annotations_dir}")
         return
-    if not labels_csv.exists():
+    # Load labels: the manifest of a materialized dataset if it agrees with the labels CSV
+    print(f"📂 Loading dataset from: {dataset_path}")
+    labels_df = load_labels(dataset_path, labels_csv)
+    if labels_df is None:
         print(f"❌ Labels CSV not found: {labels_csv}")
         return
-    
-    # Load labels
-    print(f"📂 Loading dataset from: {dataset_path}")
-    labels_df = pd.read_csv(labels_csv)
     print(f"   Total samples: {len(labels_df)}")
     print(f"   Class distribution:")
     print(labels_df['pain_level'].value_counts().sort_index())
     
-    # Initialize ELD model (for feature extraction)
-    print("\n🤖 Initializing ELD model for feature extraction...")
-    eld_model = FelinePainAssessmentELD()
-    
-    # Extract features
-    X, y = extract_features_from_dataset(images_dir, annotations_dir, labels_df, eld_model)
+    # Extract features (pool workers each initialize their own ELD model)
+    if args.no_feature_cache:
+        cache_dir = None
+    else:
+        cache_dir = Path(args.feature_cache) if args.feature_cache else dataset_path / '.feature_cache'
+    X, y = extract_features_from_dataset(
+        images_dir, annotations_dir, labels_df,
+        workers=args.workers, cache_dir=cache_dir, chunk_size=args.chunk_size
+    )
     
     if len(X) == 0:
         print("❌ No features extracted. Exiting.")
@@ -317,6 +447,29 @@ def main():
     print(f"   Training set: {len(X_train)} samples")
     print(f"   Test set: {len(X_test)} samples")
     
+    output_dir = Path(args.output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    if args.mode == 'tune':
+        # The test split stays unseen; configurations are compared by CV on the training split
+        param_grid = None
+        if args.param_grid:
+            with open(args.param_grid) as f:
+                param_grid = json.load(f)
+        tune_classifier(
+            X_train, y_train, output_dir,
+            search=args.search,
+            param_grid=param_grid,
+            n_iter=args.n_iter,
+            cv_folds=args.cv_folds,
+            use_smote=args.use_smote,
+            workers=args.workers,
+            random_state=args.random_state,
+            accuracy_tolerance=args.accuracy_tolerance,
+            max_latency_ms=args.max_latency_ms
+        )
+        return
+    
     # Scale features
     print("\n📏 Scaling features...")
     scaler = StandardScaler()
@@ -324,16 +477,18 @@ def main():
     X_test_scaled = scaler.transform(X_test)
     
     # Train classifier
+    classifier_params = {**DEFAULT_CLASSIFIER_PARAMS, 'n_estimators': args.n_estimators}
+    if args.classifier_config:
+        classifier_params.update(load_classifier_config(Path(args.classifier_config)))
+        print(f"\n🔧 Classifier parameters from {args.classifier_config}: {classifier_params}")
     clf = train_classifier(
         X_train_scaled, y_train,
         use_smote=args.use_smote,
-        n_estimators=args.n_estimators,
-        random_state=args.random_state
+        random_state=args.random_state,
+        **classifier_params
     )
     
     # Evaluate
-    output_dir = Path(args.output)
-    output_dir.mkdir(parents=True, exist_ok=True)
     
     results = evaluate_model(clf, X_test_scaled, y_test, output_dir)
     
@@ -28,6 +28,12 @@ try:
 except ImportError:
     AI_ENABLED = False
 
+try:
+    from routers import pain_assessment_jobs
+    JOBS_ENABLED = True
+except ImportError:
+    JOBS_ENABLED = False
+
 from routers import mobile_auth
 from routers import mobile_dashboard
 from datetime import datetime
@@ -90,6 +96,17 @@ except Exception as e:
 if os.getenv("ENVIRONMENT") != "production":
     models.Base.metadata.create_all(bind=engine)
 
+# Optionally load the local ELD models before workers fork (e.g. gunicorn --preload)
+# so every worker shares them copy-on-write instead of paying the cold start itself
+if os.getenv("ELD_PREWARM_MODELS", "false").lower() in ("1", "true", "yes"):
+    try:
+        from eld.eld_model import FelinePainAssessmentELD
+
+        report = FelinePainAssessmentELD().prewarm()
+        print(f"ELD models prewarmed (rss={report['rss_mb']} MB): {report['artifacts']}")
+    except Exception as e:
+        print(f"Error prewarming ELD models: {e}")
+
 app = FastAPI(title="Pawthos API", version="1.0.0", redirect_slashes=False)
 
 # Mount static files for serving uploaded images FIRST (before middleware and routers)
@@ -147,12 +164,28 @@ app.include_router(pain_assessments.router, prefix="/api")  # Mobile: /api/pain-
 # AI predictions (only if available)
 if AI_ENABLED:
     app.include_router(ai_predictions.router, prefix="/api")  # Mobile: /api/predict, /api/predict-eld
+if JOBS_ENABLED:
+    app.include_router(pain_assessment_jobs.router)  # Mobile: /api/pain-assessment-jobs
 app.include_router(file_uploads.router, prefix="/api")  # Mobile: /api/uploads
 app.include_router(alerts.router, prefix="/api")  # Mobile: /api/alerts
 app.include_router(post_abattoir_records.router, prefix="/api")
 
 # Note: /uploads static files are already mounted above (before middleware)
 
+# With REMOTE_MODEL_WARMUP, open the remote model connection in every worker
+# (after any fork, which the connection would not survive) so the first
+# assessment skips connection setup
+@app.on_event("startup")
+def warm_up_remote_models():
+    try:
+        from services.enhanced_eld_processor import ELD_AVAILABLE, ELD_MODEL
+        from services.eld_processing_lib import REMOTE_MODEL_WARMUP, model_pool, model_router
+
+        if ELD_AVAILABLE and REMOTE_MODEL_WARMUP:
+            model_pool.warm_up_in_background(model_router.plan(ELD_MODEL))
+    except Exception as e:
+        print(f"Error warming up remote models: {e}")
+
 @app.get("/")
 def read_root():
     return {
@@ -1,7 +1,9 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from core.auth import get_current_user
-from core.models import User
+from core.auth import get_current_admin, get_current_user
+from core.models import Admin, User
+from services.inference_client import InferenceTimeout, ClientDisconnected
+from typing import List
 import logging
 
 # Optional ELD service import
@@ -28,8 +30,18 @@ except Exception as e:
 router = APIRouter()
 security = HTTPBearer()
 
+INFERENCE_TIMEOUT_DETAIL = {
+    "error": True,
+    "error_type": "INFERENCE_TIMEOUT",
+    "error_message": "The pain assessment took too long to complete",
+    "error_guidance": "The service is busy. Please try again in a moment."
+}
+
+# Non-standard status (nginx convention): the client closed the connection before a response
+CLIENT_CLOSED_REQUEST = 499
+
 @router.post("/predict")
-async def predict_pain_basic(file: UploadFile = File(...)):
+async def predict_pain_basic(request: Request, file: UploadFile = File(...)):
     """
     Basic pain prediction endpoint using Haar cascades and heuristics
     """
@@ -48,10 +60,14 @@ async def predict_pain_basic(file: UploadFile = File(...)):
         if not file.content_type or not file.content_type.startswith("image/"):
             raise HTTPException(status_code=400, detail="File must be an image")
         
-        image_bytes = file.file.read()
-        result = eld_service.predict_pain_basic(image_bytes)
+        image_bytes = await file.read()
+        result = await eld_service.predict_pain_basic_async(image_bytes, request=request)
         return result
         
+    except InferenceTimeout:
+        raise HTTPException(status_code=504, detail=INFERENCE_TIMEOUT_DETAIL)
+    except ClientDisconnected:
+        raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request")
     except ValueError as e:
         error_msg = str(e)
         # Handle specific error types with appropriate status codes
@@ -71,7 +87,7 @@ async def predict_pain_basic(file: UploadFile = File(...)):
             # Other errors - try heuristic fallback
             logging.warning(f"ELD primary analysis failed, using heuristic fallback: {e}")
             try:
-                fallback = eld_service.predict_pain_basic(image_bytes)
+                fallback = await eld_service.predict_pain_basic_async(image_bytes, request=request)
                 return {
                     "pain_level": fallback.get("pain_level", "Unknown"),
                     "confidence": fallback.get("confidence", 0.72),
@@ -92,6 +108,7 @@ async def predict_pain_basic(file: UploadFile = File(...)):
 
 @router.post("/predict-eld")
 async def predict_pain_eld(
+    request: Request,
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user)
 ):
@@ -113,8 +130,8 @@ async def predict_pain_eld(
         if not file.content_type or not file.content_type.startswith("image/"):
             raise HTTPException(status_code=400, detail="File must be an image")
         
-        image_bytes = file.file.read()
-        result = eld_service.predict_pain_eld(image_bytes)
+        image_bytes = await file.read()
+        result = await eld_service.predict_pain_eld_async(image_bytes, request=request)
         
         logging.info(f"ELD Service Result: {result}")
         
@@ -147,12 +164,92 @@ async def predict_pain_eld(
         
         return result
         
+    except InferenceTimeout:
+        raise HTTPException(status_code=504, detail=INFERENCE_TIMEOUT_DETAIL)
+    except ClientDisconnected:
+        raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request")
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logging.error(f"ELD prediction error: {e}")
         raise HTTPException(status_code=500, detail="Failed to process image")
 
+@router.post("/predict-batch")
+async def predict_pain_batch(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    debug: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Pain prediction for a set of photos (e.g. several photos of one cat) in one request.
+    Results are returned per image, in upload order; one bad image does not fail the batch.
+    With ?debug=true each result carries the per-stage timing record.
+    """
+    if not ELD_SERVICE_AVAILABLE or eld_service is None:
+        logging.error("ELD service unavailable - returning 503 error")
+        raise HTTPException(
+            status_code=503, 
+            detail={
+                "error": True,
+                "error_type": "SERVICE_UNAVAILABLE",
+                "error_message": "ELD service is currently unavailable",
+                "error_guidance": "The ELD pain assessment service is temporarily unavailable. Please try again later or contact support."
+            }
+        )
+    
+    from services.eld_service import PREDICT_BATCH_MAX_SIZE
+    if len(files) > PREDICT_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail={
+                "error": True,
+                "error_type": "BATCH_TOO_LARGE",
+                "error_message": f"At most {PREDICT_BATCH_MAX_SIZE} images can be assessed per request",
+                "error_guidance": "Split the photos into smaller batches."
+            }
+        )
+    
+    # Non-image parts get a per-image error instead of rejecting the whole batch
+    images = []
+    positions = []
+    results = [None] * len(files)
+    for i, file in enumerate(files):
+        if not file.content_type or not file.content_type.startswith("image/"):
+            results[i] = {
+                "success": False,
+                "error": True,
+                "error_type": "INVALID_FILE_TYPE",
+                "error_message": "File must be an image"
+            }
+            continue
+        images.append(await file.read())
+        positions.append(i)
+    
+    try:
+        batch_results = await eld_service.predict_pain_batch_async(images, debug=debug, request=request) if images else []
+    except InferenceTimeout:
+        raise HTTPException(status_code=504, detail=INFERENCE_TIMEOUT_DETAIL)
+    except ClientDisconnected:
+        raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logging.error(f"ELD batch prediction error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to process images")
+    
+    for i, result in zip(positions, batch_results):
+        results[i] = result
+    
+    return {
+        "count": len(files),
+        "succeeded": sum(1 for result in results if result.get("success")),
+        "results": [
+            {"index": i, "filename": file.filename, **result}
+            for i, (file, result) in enumerate(zip(files, results))
+        ]
+    }
+
 @router.get("/health")
 def eld_health_check():
     """
@@ -165,3 +262,76 @@ def eld_health_check():
         "cat_face_cascade_available": eld_service.cat_face_cascade is not None and not eld_service.cat_face_cascade.empty() if eld_service else False,
         "version": "2.0.0"
     }
+
+def _diagnostics_section(name, snapshot):
+    """One section of /diagnostics; None when its component is not installed"""
+    try:
+        return snapshot()
+    except ImportError:
+        return None
+    except Exception as e:
+        logging.warning(f"Diagnostics section {name} failed: {e}")
+        return None
+
+def _eld_models():
+    from eld.model_registry import model_registry
+    return model_registry.report()
+
+def _eld_metrics():
+    from eld.instrumentation import stage_histograms, INSTRUMENTATION_ENABLED
+    return {"instrumentation_enabled": INSTRUMENTATION_ENABLED, **stage_histograms.snapshot()}
+
+def _result_cache():
+    from services.result_cache import result_cache
+    return result_cache.stats()
+
+def _inference():
+    from services.inference_client import inference_client
+    return inference_client.stats()
+
+def _model_router():
+    from services.eld_processing_lib import model_router
+    return model_router.snapshot()
+
+def _model_pool():
+    from services.eld_processing_lib import model_pool
+    return model_pool.stats()
+
+def _coalescing():
+    from services.singleflight import flight_stats
+    return flight_stats()
+
+def _upload_optimizer():
+    from services.upload_optimizer import upload_stats
+    return upload_stats.snapshot()
+
+def _remote_responses():
+    from services.compact_response import response_stats
+    return response_stats.snapshot()
+
+def _routing():
+    from services.hybrid_router import hybrid_router
+    return hybrid_router.stats()
+
+DIAGNOSTICS_SECTIONS = {
+    "eld_models": _eld_models,  # Load time and resident memory of the local ELD model artifacts
+    "eld_metrics": _eld_metrics,  # Per-stage latency histograms of the local ELD pipeline
+    "result_cache": _result_cache,  # Hit/miss counters and occupancy of the result cache
+    "inference": _inference,  # Concurrency, timeout and disconnect counters of the inference client
+    "model_router": _model_router,  # Per-model health, circuit state and routing decisions
+    "model_pool": _model_pool,  # Pooled remote model instances and the last connection warm-up
+    "coalescing": _coalescing,  # Concurrent identical submissions attached to an in-flight computation
+    "upload_optimizer": _upload_optimizer,  # Bytes received vs bytes sent to the remote model
+    "remote_responses": _remote_responses,  # Remote answers decoded vs rejected, by reason
+    "routing": _routing,  # Which path served ELD assessments, and why requests escalated
+}
+
+@router.get("/diagnostics")
+def diagnostics(current_admin: Admin = Depends(get_current_admin)):
+    """
+    Counters and state of the pain assessment pipeline in this worker (admins only)
+
+    Sections whose component is not installed are null. Errors are reported
+    by type, never by message.
+    """
+    return {name: _diagnostics_section(name, snapshot) for name, snapshot in DIAGNOSTICS_SECTIONS.items()}
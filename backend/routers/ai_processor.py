@@ -13,7 +13,7 @@ import json
 from typing import Optional, Dict, Any
 from datetime import datetime
 
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Form
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Form, Request
 from sqlalchemy.orm import Session
 
 # Import ELD processing library wrapper
@@ -21,7 +21,7 @@ try:
     from services.eld_processing_lib import (
         is_available,
         configure,
-        create_model,
+        model_pool,
         get_model_name,
         DEFAULT_MODEL
     )
@@ -33,6 +33,9 @@ except ImportError:
 from core.database import get_db
 from core.models import User, PainAssessment
 from core.auth import get_current_user
+from services.image_ingestion import load_image
+from services.result_cache import result_cache, content_version, is_cacheable, mark_cached
+from services.inference_client import inference_client, InferenceTimeout, ClientDisconnected, REMOTE_REQUEST_OPTIONS
 
 # Initialize router
 router = APIRouter(
@@ -236,8 +239,42 @@ def parse_ai_response(text: str) -> Dict[str, Any]:
         }
 
 
+def _run_ai_assessment(image_bytes: bytes, prompt: str, model_name: str, cache_key: str) -> Dict[str, Any]:
+    """
+    Decode the image, call the remote model and parse its answer
+    
+    Resubmitted photos (same prompt and model) are answered from the result
+    cache. Blocking, cache lookups included; run through the inference client
+    so the event loop stays free.
+    
+    Raises:
+        ValueError: If the image cannot be decoded
+    """
+    result = result_cache.get(cache_key)
+    if result is not None:
+        logging.info("Serving cached AI assessment")
+        return mark_cached(result, True)
+    
+    model = model_pool.get(model_name)
+    actual_model = get_model_name(model_name)
+    logging.info(f"Using ELD model: {actual_model}")
+    
+    # Prepare image for AI processing
+    pil_image = load_image(image_bytes).as_pil()
+    
+    # Generate response
+    response = model.generate_content([prompt, pil_image], request_options=REMOTE_REQUEST_OPTIONS)
+    
+    # Parse response
+    result = parse_ai_response(response.text)
+    if is_cacheable(result):
+        result_cache.set(cache_key, result)
+    return mark_cached(result, False)
+
+
 @router.post("/pain-assessment-ai")
 async def assess_pain_with_ai(
+    request: Request,
     file: UploadFile = File(...),
     pet_id: Optional[int] = Form(None),
     additional_context: Optional[str] = Form(None),
@@ -306,21 +343,19 @@ async def assess_pain_with_ai(
         
         # Initialize AI model (use latest available model)
         model_name = os.getenv("AI_MODEL", os.getenv("GEMINI_MODEL", DEFAULT_MODEL))
-        model = create_model(model_name)
-        actual_model = get_model_name(model_name)
-        logging.info(f"Using ELD model: {actual_model}")
         
-        # Prepare image for AI processing
-        import PIL.Image
-        import io
-        pil_image = PIL.Image.open(io.BytesIO(image_bytes))
-        
-        # Generate response
-        logging.info(f"Sending image to AI service for user {current_user.id}")
-        response = model.generate_content([prompt, pil_image])
-        
-        # Parse response
-        result = parse_ai_response(response.text)
+        cache_key = result_cache.make_key(image_bytes, "ai-remote", model_name, content_version(prompt))
+        logging.info(f"Assessing image with the AI service for user {current_user.id}")
+        try:
+            result = await inference_client.run(
+                _run_ai_assessment, image_bytes, prompt, model_name, cache_key, request=request
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except InferenceTimeout:
+            raise HTTPException(status_code=504, detail="AI analysis timed out. Please try again.")
+        except ClientDisconnected:
+            raise HTTPException(status_code=499, detail="Client closed request")
         
         # Save to database if requested
         if save_to_db and pet_id:
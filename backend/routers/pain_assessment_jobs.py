@@ -0,0 +1,169 @@
+"""
+Asynchronous pain assessment jobs
+
+POST an image to get a job id immediately; poll GET /{job_id} or subscribe
+to GET /{job_id}/events (server-sent events) for the result. See
+services/job_queue.py for the queue itself.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Request, UploadFile, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.orm import Session
+
+from core import schemas
+from core.auth import get_current_admin, get_current_user
+from core.database import SessionLocal, get_db
+from core.models import Admin, PainAssessmentJob, User
+from services.job_queue import job_queue, job_to_dict, QueueFull, TERMINAL_STATES
+
+router = APIRouter(prefix="/api/pain-assessment-jobs", tags=["Pain Assessment Jobs"])
+
+MAX_IMAGE_BYTES = 10 * 1024 * 1024  # 10MB, as for synchronous AI assessments
+
+# Seconds between status checks / keep-alives on an event stream
+EVENTS_POLL_SECONDS = 15.0
+
+# Engines: the same services the synchronous endpoints use
+try:
+    from services.eld_service import eld_service
+    if eld_service is not None:
+        job_queue.register_engine("eld", eld_service.predict_pain_eld_async)
+except Exception as e:
+    logging.error(f"ELD engine not available for pain assessment jobs: {e}")
+
+try:
+    from services.ai_service import ai_service
+    if ai_service is not None:
+        job_queue.register_engine("ai", ai_service.predict_pain_eld_async)
+except Exception as e:
+    logging.error(f"AI engine not available for pain assessment jobs: {e}")
+
+
+def _job_response(job: PainAssessmentJob) -> dict:
+    response = job_to_dict(job)
+    response["status_url"] = f"/api/pain-assessment-jobs/{job.id}"
+    response["events_url"] = f"/api/pain-assessment-jobs/{job.id}/events"
+    return response
+
+
+def _get_owned_job(db: Session, job_id: str, user: User) -> PainAssessmentJob:
+    job = db.query(PainAssessmentJob).filter(
+        PainAssessmentJob.id == job_id, PainAssessmentJob.user_id == user.id
+    ).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_queue.expire_if_stale(db, job)
+
+
+@router.post("", response_model=schemas.PainAssessmentJob, status_code=status.HTTP_202_ACCEPTED)
+async def create_pain_assessment_job(
+    file: UploadFile = File(...),
+    engine: str = Form("eld"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Queue a pain assessment and return its job id
+
+    Returns 429 with a Retry-After header when the queue is full.
+    """
+    if engine not in job_queue.engines:
+        if not job_queue.engines:
+            raise HTTPException(status_code=503, detail="Pain assessment is currently unavailable")
+        raise HTTPException(status_code=400, detail=f"Unknown engine '{engine}'. Available: {', '.join(job_queue.engines)}")
+    if not file.content_type or not file.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="File must be an image")
+
+    image_bytes = await file.read()
+    if len(image_bytes) > MAX_IMAGE_BYTES:
+        raise HTTPException(status_code=400, detail="Image file too large. Maximum size is 10MB.")
+
+    try:
+        job_id = await job_queue.submit(current_user.id, engine, image_bytes)
+    except QueueFull as e:
+        return JSONResponse(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            headers={"Retry-After": str(e.retry_after)},
+            content={
+                "error": True,
+                "error_type": "QUEUE_FULL",
+                "error_message": "Too many pain assessments are waiting",
+                "retry_after_seconds": e.retry_after,
+            },
+        )
+
+    # Database calls run on a thread, as the handler shares the event loop with the job workers
+    job = await asyncio.to_thread(_get_owned_job, db, job_id, current_user)
+    return _job_response(job)
+
+
+@router.get("/metrics")
+def pain_assessment_job_metrics(current_admin: Admin = Depends(get_current_admin)):
+    """
+    Queue depth, wait time and service time of the job queue in this worker
+    """
+    return job_queue.metrics()
+
+
+@router.get("/{job_id}", response_model=schemas.PainAssessmentJob)
+def get_pain_assessment_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Current status of a job, with its result once finished"""
+    return _job_response(_get_owned_job(db, job_id, current_user))
+
+
+@router.get("/{job_id}/events")
+async def stream_pain_assessment_job(
+    job_id: str,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Server-sent events for a job: a `status` event whenever the status
+    changes and a final `complete` event carrying the finished job
+    """
+    await asyncio.to_thread(_get_owned_job, db, job_id, current_user)
+    user_id = current_user.id
+
+    def read_job() -> Optional[dict]:
+        session = SessionLocal()
+        try:
+            job = session.query(PainAssessmentJob).filter(
+                PainAssessmentJob.id == job_id, PainAssessmentJob.user_id == user_id
+            ).first()
+            return _job_response(job_queue.expire_if_stale(session, job)) if job else None
+        finally:
+            session.close()
+
+    async def events():
+        last_status = None
+        while not await request.is_disconnected():
+            job = await asyncio.to_thread(read_job)
+            if job is None:
+                return
+            payload = json.dumps(jsonable_encoder(job))
+            if job["status"] in TERMINAL_STATES:
+                yield f"event: complete\ndata: {payload}\n\n"
+                return
+            if job["status"] != last_status:
+                last_status = job["status"]
+                yield f"event: status\ndata: {payload}\n\n"
+            else:
+                yield ": keep-alive\n\n"
+            await job_queue.wait(job_id, EVENTS_POLL_SECONDS)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
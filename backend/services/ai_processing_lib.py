@@ -29,14 +29,24 @@ MODEL_MAPPING = {
 DEFAULT_MODEL = "eld-model-v3"
 
 # Try to import the AI processing library
+# REMOTE_MODEL_BACKEND=fake answers locally (services/fake_remote_model.py), for load tests
+REMOTE_MODEL_BACKEND = os.getenv("REMOTE_MODEL_BACKEND", "google").lower()
+
 try:
-    import google.generativeai as _ai_library
+    if REMOTE_MODEL_BACKEND == "fake":
+        from services import fake_remote_model as _ai_library
+    else:
+        import google.generativeai as _ai_library
     _LIBRARY_AVAILABLE = True
 except ImportError:
     _LIBRARY_AVAILABLE = False
     _ai_library = None
     logging.warning("AI processing library not available. Install with: pip install ai-processing-dependencies")
 
+# Both wrappers drive the same library, which keeps one client per process:
+# model health, pooled models and JSON mode support are shared with the ELD wrapper
+from services.eld_processing_lib import model_router, model_pool, json_generation_config
+
 
 def is_available() -> bool:
     """Check if AI processing library is available"""
@@ -55,6 +65,8 @@ def configure(api_key: str) -> None:
     
     try:
         _ai_library.configure(api_key=api_key)
+        # Pooled models hold a client bound to the previous credentials
+        model_pool.clear()
         logging.info("AI processing library configured successfully")
     except Exception as e:
         logging.error(f"Failed to configure AI processing library: {e}")
@@ -8,7 +8,9 @@ warnings.filterwarnings("ignore", category=UserWarning, module="torchvision")
 
 # Import ELD (Ensemble Landmark Detector) processor - This is the only method we use
 try:
-    from services.enhanced_ai_processor import process_image_with_enhanced_ai
+    from services.enhanced_ai_processor import (
+        process_image_with_enhanced_ai, process_image_with_enhanced_ai_async, AI_MODEL, ACTIVE_PROCESSING_PROMPT
+    )
     ENHANCED_AI_AVAILABLE = True
     logging.info("✅ ELD processor imported successfully")
 except ImportError as e:
@@ -17,11 +19,17 @@ except ImportError as e:
     import traceback
     logging.error(f"Traceback: {traceback.format_exc()}")
 
+from services.result_cache import result_cache, content_version
+from services.inference_client import ClientDisconnected
+from services.singleflight import get_flight
+from services.upload_optimizer import UPLOAD_SETTINGS_VERSION
+
 class AIService:
     """Service for AI-powered pain assessment using ELD (Ensemble Landmark Detector) model"""
     
     def __init__(self):
         # Simple initialization - we use ELD model for pain assessment
+        self._flight = get_flight("ai-remote")
         logging.info("AIService initialized for ELD model processing")
     
     def predict_pain_eld(self, image_bytes: bytes) -> Dict[str, Any]:
@@ -31,10 +39,27 @@ class AIService:
         # Use ELD model for pain assessment
         if ENHANCED_AI_AVAILABLE:
             logging.info("Using ELD model for pain assessment")
-            return process_image_with_enhanced_ai(image_bytes)
+            # Concurrent identical uploads (client retries) share one remote call
+            return self._flight.do(self._flight_key(image_bytes), process_image_with_enhanced_ai, image_bytes)
         else:
             raise ValueError("ELD model is not available. Please check API configuration.")
     
+    async def predict_pain_eld_async(self, image_bytes: bytes, request: Any = None) -> Dict[str, Any]:
+        """
+        predict_pain_eld without blocking the event loop (runs on the inference client)
+        """
+        if ENHANCED_AI_AVAILABLE:
+            return await self._flight.do_async(
+                self._flight_key(image_bytes), process_image_with_enhanced_ai_async, image_bytes,
+                request=request, retry_on=(ClientDisconnected,)
+            )
+        raise ValueError("ELD model is not available. Please check API configuration.")
+    
+    @staticmethod
+    def _flight_key(image_bytes: bytes) -> str:
+        # Image digest plus engine, model and prompt version
+        return result_cache.make_key(image_bytes, "ai-remote", AI_MODEL, content_version(ACTIVE_PROCESSING_PROMPT, UPLOAD_SETTINGS_VERSION))
+    
     def predict_pain_basic(self, image_bytes: bytes) -> Dict[str, Any]:
         """
         Basic pain prediction - redirects to ELD model
@@ -0,0 +1,304 @@
+"""
+Compact, versioned response contract for remote landmark assessments
+
+The original prompt asks the remote model for 48 landmark objects with
+repeated "x"/"y"/"type" keys plus paragraphs of prose, then scrapes JSON out
+of markdown fences; anything unparseable silently became pain score 5. The
+compact contract asks for:
+
+    {
+      "v": 1,                      schema version
+      "cat": true,                 false -> no cat in the image (nothing else needed)
+      "pl": 0 | 1 | 2,             pain level
+      "ps": 0-10,                  pain score (FGS total)
+      "c": 0.0-1.0,                confidence
+      "fgs": [e, o, m, w, h],      FGS scores 0-2 (-1 = not possible to score), in FGS_KEYS order
+      "lm": [[x, y], ... 48],      landmark percentages in LANDMARK_ORDER
+      "d": ["...", x5],            optional: one short observation per FGS score
+      "x": {...},                  optional: eyes/ears/muzzle_mouth/whiskers/overall_expression
+      "adv": {"now": [], "mon": "", "vet": "", "home": []}   optional advice
+    }
+
+It is requested through the SDK's JSON response mode (RESPONSE_SCHEMA) and
+decoded by parse_compact_response, a strict parser that expands it into the
+response shape clients already receive. Rejections are counted by reason in
+response_stats instead of being masked by a default score.
+
+compact_prompt() only swaps the OUTPUT FORMAT section of a processor's prompt
+for this contract; its cat-detection, landmark and FGS scoring instructions
+are kept verbatim.
+"""
+
+import json
+import threading
+from typing import Any, Dict, List, Tuple
+
+COMPACT_SCHEMA_VERSION = 1
+
+PAIN_LEVELS = ("Level 0 (No Pain)", "Level 1 (Mild Pain)", "Level 2 (Moderate/Severe Pain)")
+FGS_KEYS = ("ear_position", "orbital_tightening", "muzzle_tension", "whiskers_change", "head_position")
+EXPLANATION_KEYS = ("eyes", "ears", "muzzle_mouth", "whiskers", "overall_expression")
+
+# visual_landmarks groups and their landmark types, in the fixed order of "lm"
+LANDMARK_GROUPS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("left_eye_landmarks", tuple(f"left_eye_{i}" for i in range(1, 9))),
+    ("right_eye_landmarks", tuple(f"right_eye_{i}" for i in range(1, 9))),
+    ("left_ear_landmarks", tuple(f"left_ear_{i}" for i in range(1, 9))),
+    ("right_ear_landmarks", tuple(f"right_ear_{i}" for i in range(1, 9))),
+    ("nose_whisker_landmarks",
+     tuple(f"nose_{i}" for i in range(1, 6)) + tuple(f"whisker_{i}" for i in range(1, 7))
+     + tuple(f"mouth_{i}" for i in range(1, 6))),
+)
+LANDMARK_ORDER: Tuple[str, ...] = tuple(t for _, types in LANDMARK_GROUPS for t in types)
+LANDMARK_COUNT = len(LANDMARK_ORDER)  # 48
+
+
+class CompactResponseError(ValueError):
+    """The model's answer does not satisfy the compact contract"""
+
+    def __init__(self, reason: str, detail: str = ""):
+        super().__init__(f"{reason}: {detail}" if detail else reason)
+        self.reason = reason
+
+
+# JSON response schema (OpenAPI subset understood by the SDK's response_schema)
+RESPONSE_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "v": {"type": "integer"},
+        "cat": {"type": "boolean"},
+        "pl": {"type": "integer"},
+        "ps": {"type": "integer"},
+        "c": {"type": "number"},
+        "fgs": {"type": "array", "items": {"type": "integer"}},
+        "lm": {"type": "array", "items": {"type": "array", "items": {"type": "number"}}},
+        "d": {"type": "array", "items": {"type": "string"}},
+        "x": {"type": "object", "properties": {key: {"type": "string"} for key in EXPLANATION_KEYS}},
+        "adv": {
+            "type": "object",
+            "properties": {
+                "now": {"type": "array", "items": {"type": "string"}},
+                "mon": {"type": "string"},
+                "vet": {"type": "string"},
+                "home": {"type": "array", "items": {"type": "string"}},
+            },
+        },
+    },
+    "required": ["v", "cat"],
+}
+
+
+def _landmark_order_text() -> str:
+    lines = []
+    index = 0
+    for group, types in LANDMARK_GROUPS:
+        lines.append(f"   - {index}-{index + len(types) - 1}: {', '.join(types)}")
+        index += len(types)
+    return "\n".join(lines)
+
+
+# The section of the processor prompts that describes the answer format
+OUTPUT_FORMAT_START = "**OUTPUT FORMAT** (return as JSON):"
+OUTPUT_FORMAT_END = "**ULTRA-PRECISE LANDMARK DETECTION INSTRUCTIONS**:"
+
+COMPACT_OUTPUT_FORMAT = f"""**OUTPUT FORMAT** (return ONE compact JSON object - no prose, no markdown):
+
+**IF NO CAT DETECTED** (return this format):
+{{"v": {COMPACT_SCHEMA_VERSION}, "cat": false}}
+
+**IF CAT DETECTED** (return this format):
+{{
+  "v": {COMPACT_SCHEMA_VERSION},
+  "cat": true,
+  "pl": 0 | 1 | 2 (pain level: 0 = "Level 0 (No Pain)", 1 = "Level 1 (Mild Pain)", 2 = "Level 2 (Moderate/Severe Pain)"),
+  "ps": 0-10 (FGS total score),
+  "c": 0.0-1.0 (confidence, calculated as described below),
+  "fgs": [ear_position, orbital_tightening, muzzle_tension, whiskers_change, head_position] (each 0-2, -1 if not possible to score),
+  "lm": [[x, y], ...] (exactly {LANDMARK_COUNT} percentage coordinates 0-100, in this order:
+{_landmark_order_text()}),
+  "d": ["...", "...", "...", "...", "..."] (what you observe for each FGS score, in "fgs" order),
+  "x": {{"eyes": "...", "ears": "...", "muzzle_mouth": "...", "whiskers": "...", "overall_expression": "..."}} (1-2 sentences each),
+  "adv": {{"now": ["immediate action", ...], "mon": "monitoring guidelines", "vet": "when to contact a vet", "home": ["home care tip", ...]}}
+}}
+
+In the instructions below, "visual_landmarks" means "lm", "fgs_breakdown" means "fgs" and "d",
+"detailed_explanation" means "x" and "actionable_advice" means "adv". There is no template with
+example coordinates: calculate every "lm" point from the image.
+
+"""
+
+
+def compact_prompt(prompt: str) -> str:
+    """`prompt` with its OUTPUT FORMAT section replaced by the compact answer format"""
+    start = prompt.index(OUTPUT_FORMAT_START)
+    end = prompt.index(OUTPUT_FORMAT_END, start)
+    return prompt[:start] + COMPACT_OUTPUT_FORMAT + prompt[end:]
+
+
+class ResponseStats:
+    """Counts of parsed and rejected remote responses, by reason"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {"parsed": 0, "no_cat": 0, "rejected": 0}
+        self._reasons: Dict[str, int] = {}
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + 1
+
+    def reject(self, reason: str) -> None:
+        with self._lock:
+            self._counters["rejected"] += 1
+            self._reasons[reason] = self._reasons.get(reason, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["rejections_by_reason"] = dict(self._reasons)
+        total = stats["parsed"] + stats["no_cat"] + stats["rejected"]
+        stats["rejection_rate"] = round(stats["rejected"] / total, 4) if total else None
+        stats["schema_version"] = COMPACT_SCHEMA_VERSION
+        return stats
+
+
+response_stats = ResponseStats()
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _strings(value: Any, count: int = 0) -> List[str]:
+    if not isinstance(value, list):
+        return []
+    items = [item for item in value if isinstance(item, str)]
+    return items[:count] if count else items
+
+
+def _decode(text: str) -> Dict[str, Any]:
+    body = text.strip()
+    if body.startswith("```"):
+        # JSON mode should never fence its output; tolerate it but keep count
+        response_stats.count("fenced")
+        body = body.strip("`")
+        if body.startswith("json"):
+            body = body[4:]
+    try:
+        data = json.loads(body)
+    except json.JSONDecodeError as e:
+        raise CompactResponseError("invalid_json", str(e)) from e
+    if not isinstance(data, dict):
+        raise CompactResponseError("not_an_object")
+    return data
+
+
+def parse_compact_response(text: str) -> Dict[str, Any]:
+    """
+    Decode a compact answer into the standard response shape
+
+    Raises:
+        CompactResponseError: With a `reason` for any contract violation
+    """
+    data = _decode(text)
+    if data.get("v") != COMPACT_SCHEMA_VERSION:
+        raise CompactResponseError("wrong_version", repr(data.get("v")))
+    if data.get("cat") is False:
+        response_stats.count("no_cat")
+        return {
+            "success": False,
+            "error": True,
+            "error_type": "NO_CAT_DETECTED",
+            "error_message": "No cat face detected in the image",
+            "error_guidance": "Please upload a clear photo of a cat's face for pain assessment.",
+            "model_type": "ELD",
+            "raw_response": text,
+        }
+    if data.get("cat") is not True:
+        raise CompactResponseError("missing_cat_flag")
+
+    level = data.get("pl")
+    if not isinstance(level, int) or isinstance(level, bool) or level not in (0, 1, 2):
+        raise CompactResponseError("bad_pain_level", repr(level))
+    score = data.get("ps")
+    if not isinstance(score, int) or isinstance(score, bool) or not 0 <= score <= 10:
+        raise CompactResponseError("bad_pain_score", repr(score))
+    confidence = data.get("c")
+    if not _is_number(confidence) or not 0.0 <= confidence <= 1.0:
+        raise CompactResponseError("bad_confidence", repr(confidence))
+
+    fgs = data.get("fgs")
+    if not isinstance(fgs, list) or len(fgs) != len(FGS_KEYS) \
+            or not all(isinstance(s, int) and not isinstance(s, bool) and -1 <= s <= 2 for s in fgs):
+        raise CompactResponseError("bad_fgs", repr(fgs)[:80])
+
+    points = data.get("lm")
+    if not isinstance(points, list) or len(points) != LANDMARK_COUNT:
+        raise CompactResponseError("bad_landmark_count", str(len(points)) if isinstance(points, list) else repr(points)[:40])
+    for point in points:
+        if not (isinstance(point, list) and len(point) == 2 and all(_is_number(v) and 0 <= v <= 100 for v in point)):
+            raise CompactResponseError("bad_landmark", repr(point)[:40])
+
+    response_stats.count("parsed")
+    result = expand_compact_answer(data)
+    result["raw_response"] = text
+    return result
+
+
+def expand_compact_answer(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Standard response shape for a compact answer that has already been validated"""
+    level, score, confidence = data["pl"], data["ps"], data["c"]
+    fgs, points = data["fgs"], data["lm"]
+    descriptions = _strings(data.get("d"), len(FGS_KEYS))
+    descriptions += [""] * (len(FGS_KEYS) - len(descriptions))
+    fgs_breakdown = {
+        key: {"score": value if value >= 0 else "not possible to score", "description": description}
+        for key, value, description in zip(FGS_KEYS, fgs, descriptions)
+    }
+
+    visual_landmarks = {}
+    index = 0
+    for group, types in LANDMARK_GROUPS:
+        visual_landmarks[group] = [
+            {"x": points[index + i][0], "y": points[index + i][1], "type": landmark_type}
+            for i, landmark_type in enumerate(types)
+        ]
+        index += len(types)
+
+    explanation = data.get("x") if isinstance(data.get("x"), dict) else {}
+    advice = data.get("adv") if isinstance(data.get("adv"), dict) else {}
+
+    return {
+        "success": True,
+        "pain_level": PAIN_LEVELS[level],
+        "pain_score": score,
+        "confidence": float(confidence),
+        "landmarks_detected": LANDMARK_COUNT,
+        "expected_landmarks": LANDMARK_COUNT,
+        "fgs_breakdown": fgs_breakdown,
+        "detailed_explanation": {
+            key: explanation[key] for key in EXPLANATION_KEYS if isinstance(explanation.get(key), str)
+        },
+        "actionable_advice": {
+            "immediate_actions": _strings(advice.get("now")),
+            "monitoring_guidelines": advice.get("mon") if isinstance(advice.get("mon"), str) else "",
+            "when_to_contact_vet": advice.get("vet") if isinstance(advice.get("vet"), str) else "",
+            "home_care_tips": _strings(advice.get("home")),
+        },
+        "visual_landmarks": visual_landmarks,
+        "model_type": "ELD (48 Landmarks)",
+        "response_schema_version": COMPACT_SCHEMA_VERSION,
+    }
+
+
+def invalid_response_result(error: CompactResponseError, text: str) -> Dict[str, Any]:
+    """Explicit failure for an answer that broke the contract (counted, never cached)"""
+    response_stats.reject(error.reason)
+    return {
+        "success": False,
+        "error": True,
+        "error_type": "INVALID_MODEL_RESPONSE",
+        "error_message": "The assessment service returned an unreadable answer. Please try again.",
+        "model_type": "ELD",
+        "raw_response": text[:2000],
+    }
@@ -6,8 +6,12 @@ Used by the ELD (Ensemble Landmark Detector) system for enhanced processing.
 """
 
 import os
+import re
+import time
 import logging
-from typing import Optional, Any
+import threading
+from collections import deque
+from typing import Optional, Any, Dict, List
 
 # Model name mapping: Generic names -> Actual model identifiers
 # This allows us to use generic names while maintaining compatibility
@@ -28,9 +32,20 @@ MODEL_MAPPING = {
 # Default model
 DEFAULT_MODEL = "eld-model-v3"
 
+# Warm-up at worker startup costs one count_tokens call per worker start, so it is opt-in
+REMOTE_MODEL_WARMUP = os.getenv("REMOTE_MODEL_WARMUP", "false").lower() in ("1", "true", "yes")
+# Timeout of the connection warm-up call made at startup
+REMOTE_WARMUP_TIMEOUT_SECONDS = float(os.getenv("REMOTE_WARMUP_TIMEOUT_SECONDS", "10"))
+
 # Try to import the ELD processing library
+# REMOTE_MODEL_BACKEND=fake answers locally (services/fake_remote_model.py), for load tests
+REMOTE_MODEL_BACKEND = os.getenv("REMOTE_MODEL_BACKEND", "google").lower()
+
 try:
-    import google.generativeai as _eld_library
+    if REMOTE_MODEL_BACKEND == "fake":
+        from services import fake_remote_model as _eld_library
+    else:
+        import google.generativeai as _eld_library
     _LIBRARY_AVAILABLE = True
 except ImportError:
     _LIBRARY_AVAILABLE = False
@@ -55,6 +70,8 @@ def configure(api_key: str) -> None:
     
     try:
         _eld_library.configure(api_key=api_key)
+        # Pooled models hold a client bound to the previous credentials
+        model_pool.clear()
         logging.info("ELD processing library configured successfully")
     except Exception as e:
         logging.error(f"Failed to configure ELD processing library: {e}")
@@ -100,6 +117,26 @@ def create_model(model_name: Optional[str] = None) -> Any:
     return _eld_library.GenerativeModel(actual_model_name)
 
 
+def json_generation_config(response_schema: Optional[Dict[str, Any]] = None) -> Optional[Any]:
+    """
+    Generation config requesting a JSON response, constrained to `response_schema` when the library supports it
+    
+    Returns None when the library has no JSON response mode (the prompt alone then asks for JSON).
+    """
+    if not _LIBRARY_AVAILABLE:
+        return None
+    try:
+        if response_schema is not None:
+            return _eld_library.GenerationConfig(response_mime_type="application/json", response_schema=response_schema)
+    except TypeError:
+        logging.info("ELD processing library does not support response schemas; using plain JSON mode")
+    try:
+        return _eld_library.GenerationConfig(response_mime_type="application/json")
+    except TypeError:
+        logging.warning("ELD processing library does not support JSON response mode")
+        return None
+
+
 def get_fallback_models(primary_model: Optional[str] = None) -> list:
     """
     Get fallback models if primary model fails
@@ -121,3 +158,374 @@ def get_fallback_models(primary_model: Optional[str] = None) -> list:
     }
     
     return fallback_map.get(actual_primary, [])
+
+
+# Model router: per-model health and circuit breakers for the fallback chain
+ROUTER_WINDOW_SECONDS = float(os.getenv("MODEL_ROUTER_WINDOW_SECONDS", "120"))
+ROUTER_MIN_REQUESTS = int(os.getenv("MODEL_ROUTER_MIN_REQUESTS", "5"))
+ROUTER_ERROR_RATE = float(os.getenv("MODEL_ROUTER_ERROR_RATE", "0.5"))
+ROUTER_FAILURE_THRESHOLD = int(os.getenv("MODEL_ROUTER_FAILURE_THRESHOLD", "3"))
+ROUTER_COOLDOWN_SECONDS = float(os.getenv("MODEL_ROUTER_COOLDOWN_SECONDS", "30"))
+ROUTER_QUOTA_COOLDOWN_SECONDS = float(os.getenv("MODEL_ROUTER_QUOTA_COOLDOWN_SECONDS", "60"))
+ROUTER_MAX_COOLDOWN_SECONDS = float(os.getenv("MODEL_ROUTER_MAX_COOLDOWN_SECONDS", "900"))
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+# Retry hints as they appear in quota errors ("Please retry in 12.5s",
+# "retry_delay { seconds: 30 }", "Retry-After: 30")
+_RETRY_HINT_PATTERNS = (
+    re.compile(r"retry in\s+([\d.]+)\s*s", re.IGNORECASE),
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE),
+    re.compile(r"retry-after:?\s*([\d.]+)", re.IGNORECASE),
+)
+
+
+# Quota errors by type: google.api_core.exceptions and the fake remote backend
+_QUOTA_ERROR_TYPES = ("ResourceExhausted", "TooManyRequests")
+
+# Quota messages of errors that arrive untyped (e.g. re-raised by a wrapper)
+_QUOTA_PHRASES = (
+    "exceeded your current quota",
+    "quota exceeded",
+    "resource has been exhausted",
+    "resource_exhausted",
+    "rate limit exceeded",
+    "too many requests",
+    "free_tier",
+)
+
+
+def is_quota_error(error: BaseException) -> bool:
+    """True for quota / rate-limit errors (HTTP 429, ResourceExhausted)"""
+    if any(cls.__name__ in _QUOTA_ERROR_TYPES for cls in type(error).__mro__):
+        return True
+    code = getattr(error, "code", None)
+    if callable(code):  # gRPC errors expose code() -> StatusCode
+        try:
+            code = code()
+        except Exception:
+            code = None
+    if code == 429 or getattr(code, "name", None) == "RESOURCE_EXHAUSTED":
+        return True
+    text = str(error).lower()
+    return any(phrase in text for phrase in _QUOTA_PHRASES)
+
+
+def retry_after_hint(error: BaseException) -> Optional[float]:
+    """Seconds the service asked us to wait, if the error says"""
+    text = str(error)
+    for pattern in _RETRY_HINT_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            try:
+                return float(match.group(1))
+            except ValueError:
+                continue
+    return None
+
+
+class _ModelHealth:
+    """Rolling outcomes and circuit state of one model"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.outcomes = deque()  # (timestamp, ok)
+        self.state = CIRCUIT_CLOSED
+        self.open_until = 0.0
+        self.cooldown = 0.0
+        self.consecutive_failures = 0
+        self.probe_in_flight = False
+        self.last_quota_at: Optional[float] = None
+        self.retry_after: Optional[float] = None
+        self.last_error_type: Optional[str] = None
+        self.successes = 0
+        self.failures = 0
+        self.quota_errors = 0
+        self.times_opened = 0
+
+    def prune(self, now: float) -> None:
+        while self.outcomes and self.outcomes[0][0] < now - ROUTER_WINDOW_SECONDS:
+            self.outcomes.popleft()
+
+    def error_rate(self) -> Optional[float]:
+        if not self.outcomes:
+            return None
+        return sum(1 for _, ok in self.outcomes if not ok) / len(self.outcomes)
+
+
+class ModelRouter:
+    """
+    Routes remote calls across a model fallback chain using per-model health
+
+    A model's circuit opens on a quota error (for the service's retry hint or
+    MODEL_ROUTER_QUOTA_COOLDOWN_SECONDS), after MODEL_ROUTER_FAILURE_THRESHOLD
+    consecutive failures, or when its error rate over the window exceeds
+    MODEL_ROUTER_ERROR_RATE. Open models are skipped without a round-trip;
+    once the cool-down ends one probe request is let through (half-open),
+    and a failed probe reopens the circuit with a doubled cool-down.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models: Dict[str, _ModelHealth] = {}
+        self._decisions = deque(maxlen=50)
+        self._counters = {"plans": 0, "skipped_open": 0, "all_open": 0, "probes": 0}
+
+    def _health(self, model_name: str) -> _ModelHealth:
+        # Keyed by the actual model: aliases share one quota
+        actual = get_model_name(model_name)
+        health = self._models.get(actual)
+        if health is None:
+            health = self._models[actual] = _ModelHealth(actual)
+        return health
+
+    def _refresh(self, health: _ModelHealth, now: float) -> None:
+        health.prune(now)
+        if health.state == CIRCUIT_OPEN and now >= health.open_until:
+            health.state = CIRCUIT_HALF_OPEN
+            health.probe_in_flight = False
+
+    def plan(self, primary_model: Optional[str] = None) -> List[str]:
+        """
+        Models to try for one request, healthiest first
+
+        Closed circuits keep their configured order (primary first), then
+        models ready for a half-open probe. Open circuits are left out; an
+        empty list means every model is cooling down (see retry_after()).
+        """
+        chain = [primary_model or DEFAULT_MODEL] + get_fallback_models(primary_model)
+        now = time.time()
+        with self._lock:
+            self._counters["plans"] += 1
+            healthy, probing, skipped = [], [], []
+            for model_name in chain:
+                health = self._health(model_name)
+                self._refresh(health, now)
+                if health.state == CIRCUIT_CLOSED:
+                    healthy.append(model_name)
+                elif health.state == CIRCUIT_HALF_OPEN and not health.probe_in_flight:
+                    probing.append(model_name)
+                else:
+                    skipped.append(model_name)
+            planned = healthy + probing
+            self._counters["skipped_open"] += len(skipped)
+            if not planned:
+                self._counters["all_open"] += 1
+            self._decisions.append({
+                "at": round(now, 3), "primary": chain[0], "planned": planned, "skipped": skipped,
+            })
+        return planned
+
+    def acquire(self, model_name: str) -> bool:
+        """Claim the right to call a model now (False if its circuit opened or another probe is running)"""
+        now = time.time()
+        with self._lock:
+            health = self._health(model_name)
+            self._refresh(health, now)
+            if health.state == CIRCUIT_CLOSED:
+                return True
+            if health.state == CIRCUIT_HALF_OPEN and not health.probe_in_flight:
+                health.probe_in_flight = True
+                self._counters["probes"] += 1
+                return True
+            return False
+
+    def record_success(self, model_name: str) -> None:
+        now = time.time()
+        with self._lock:
+            health = self._health(model_name)
+            health.outcomes.append((now, True))
+            health.successes += 1
+            health.consecutive_failures = 0
+            if health.state != CIRCUIT_CLOSED:
+                logging.info(f"Model router: circuit for '{health.name}' closed")
+            health.state = CIRCUIT_CLOSED
+            health.cooldown = 0.0
+            health.probe_in_flight = False
+            health.retry_after = None
+
+    def record_failure(self, model_name: str, error: BaseException) -> bool:
+        """
+        Record a failed call; returns True if it was a quota error
+        """
+        now = time.time()
+        quota = is_quota_error(error)
+        with self._lock:
+            health = self._health(model_name)
+            health.prune(now)
+            health.outcomes.append((now, False))
+            health.failures += 1
+            health.consecutive_failures += 1
+            health.last_error_type = type(error).__name__
+            probe_failed = health.state == CIRCUIT_HALF_OPEN
+            health.probe_in_flight = False
+
+            if quota:
+                health.quota_errors += 1
+                health.last_quota_at = now
+                health.retry_after = retry_after_hint(error)
+                cooldown = max(health.retry_after or 0.0, ROUTER_QUOTA_COOLDOWN_SECONDS)
+                if probe_failed:
+                    cooldown = max(cooldown, health.cooldown * 2)
+                self._open(health, now, cooldown, "quota exceeded")
+            elif probe_failed:
+                self._open(health, now, health.cooldown * 2 or ROUTER_COOLDOWN_SECONDS, "probe failed")
+            else:
+                rate = health.error_rate()
+                if health.consecutive_failures >= ROUTER_FAILURE_THRESHOLD:
+                    self._open(health, now, ROUTER_COOLDOWN_SECONDS, f"{health.consecutive_failures} consecutive failures")
+                elif len(health.outcomes) >= ROUTER_MIN_REQUESTS and rate is not None and rate >= ROUTER_ERROR_RATE:
+                    self._open(health, now, ROUTER_COOLDOWN_SECONDS, f"error rate {rate:.0%}")
+        return quota
+
+    def _open(self, health: _ModelHealth, now: float, cooldown: float, reason: str) -> None:
+        # Caller holds self._lock
+        health.cooldown = min(cooldown, ROUTER_MAX_COOLDOWN_SECONDS)
+        health.open_until = now + health.cooldown
+        health.state = CIRCUIT_OPEN
+        health.times_opened += 1
+        logging.warning(f"Model router: circuit for '{health.name}' open for {health.cooldown:.0f}s ({reason})")
+
+    def retry_after(self, primary_model: Optional[str] = None) -> Optional[float]:
+        """Seconds until the first model in the chain accepts traffic again (None if one does now)"""
+        chain = [primary_model or DEFAULT_MODEL] + get_fallback_models(primary_model)
+        now = time.time()
+        with self._lock:
+            waits = []
+            for model_name in chain:
+                health = self._health(model_name)
+                self._refresh(health, now)
+                if health.state != CIRCUIT_OPEN:
+                    return None
+                waits.append(health.open_until - now)
+        return max(0.0, min(waits)) if waits else None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Per-model health, counters and recent routing decisions"""
+        now = time.time()
+        with self._lock:
+            models = {}
+            for name, health in sorted(self._models.items()):
+                self._refresh(health, now)
+                rate = health.error_rate()
+                models[name] = {
+                    "state": health.state,
+                    "open_for_seconds": round(max(0.0, health.open_until - now), 1) if health.state == CIRCUIT_OPEN else 0.0,
+                    "window_requests": len(health.outcomes),
+                    "window_error_rate": None if rate is None else round(rate, 3),
+                    "consecutive_failures": health.consecutive_failures,
+                    "successes": health.successes,
+                    "failures": health.failures,
+                    "quota_errors": health.quota_errors,
+                    "last_quota_seconds_ago": None if health.last_quota_at is None else round(now - health.last_quota_at, 1),
+                    "retry_after_hint": health.retry_after,
+                    "times_opened": health.times_opened,
+                    "last_error_type": health.last_error_type,
+                }
+            return {
+                "models": models,
+                "counters": dict(self._counters),
+                "recent_decisions": list(self._decisions),
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._models.clear()
+            self._decisions.clear()
+            for key in self._counters:
+                self._counters[key] = 0
+
+
+# Shared by every remote engine: models are rate-limited per API key, not per caller
+model_router = ModelRouter()
+
+
+class ModelPool:
+    """
+    One model instance per actual model name, shared by every request
+
+    Pooling only saves rebuilding the model object (configuration and
+    safety settings) per request. Connection reuse does not depend on it:
+    the library keeps one client per process that every model shares,
+    pooled or not, so TLS and connection setup happen once per process
+    either way. Model instances keep no per-call state (no chat history),
+    so one instance can be used from any thread; the inference client runs
+    every call in its worker threads.
+
+    warm_up() builds the models for a fallback chain and makes one cheap
+    token-count call, so that shared client's connection is open before the
+    first assessment. It is run at startup only with REMOTE_MODEL_WARMUP,
+    since the call counts against the quota on every worker start.
+    Aliases share an entry: models are keyed like the router, by actual name.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models: Dict[str, Any] = {}
+        self._counters = {"created": 0, "reused": 0, "cleared": 0}
+        self._warm_up: Dict[str, Any] = {}
+
+    def get(self, model_name: Optional[str] = None) -> Any:
+        """Pooled model for a generic or direct model name, created on first use"""
+        actual = get_model_name(model_name)
+        with self._lock:
+            model = self._models.get(actual)
+            if model is not None:
+                self._counters["reused"] += 1
+                return model
+            model = self._models[actual] = create_model(actual)
+            self._counters["created"] += 1
+            return model
+
+    def clear(self) -> None:
+        """Drop every pooled model (e.g. after the library is reconfigured)"""
+        with self._lock:
+            if self._models:
+                self._counters["cleared"] += 1
+            self._models.clear()
+
+    def warm_up(self, model_names: List[str], timeout: float = REMOTE_WARMUP_TIMEOUT_SECONDS) -> Dict[str, Any]:
+        """
+        Create the models for `model_names` and open the connection with the first
+
+        All models share the library's client, so one round-trip warms them all.
+        Never raises: a failed warm-up only means the first request pays for setup.
+        """
+        report: Dict[str, Any] = {"models": [], "connection_ms": None, "error_type": None}
+        started = time.perf_counter()
+        try:
+            models = []
+            for name in model_names:
+                models.append(self.get(name))
+                report["models"].append(get_model_name(name))
+            if models:
+                models[0].count_tokens("ping", request_options={"timeout": timeout})
+                report["connection_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+        except Exception as e:
+            report["error_type"] = type(e).__name__
+            logging.warning(f"Remote model warm-up failed: {e}")
+        else:
+            logging.info(f"Remote models warmed up: {report}")
+        with self._lock:
+            self._warm_up = report
+        return report
+
+    def warm_up_in_background(self, model_names: List[str]) -> threading.Thread:
+        """Run warm_up() on a daemon thread so startup is not held up by the network"""
+        thread = threading.Thread(target=self.warm_up, args=(list(model_names),), name="remote-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "models": sorted(self._models),
+                "counters": dict(self._counters),
+                "last_warm_up": dict(self._warm_up),
+            }
+
+
+# Shared by every remote engine and router: the library keeps one client per process
+model_pool = ModelPool()
@@ -1,14 +1,14 @@
 import warnings
 import os
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
 # Suppress deprecation warnings
 warnings.filterwarnings("ignore", category=UserWarning, module="torchvision")
 
 # Import ELD (Ensemble Landmark Detector) processor - This is the only method we use
 try:
-    from services.enhanced_eld_processor import process_image_with_enhanced_eld
+    from services.enhanced_eld_processor import process_image_with_enhanced_eld, ELD_MODEL, ACTIVE_PROCESSING_PROMPT
     ENHANCED_ELD_AVAILABLE = True
     logging.info("✅ ELD processor imported successfully")
 except ImportError as e:
@@ -17,29 +17,162 @@ except ImportError as e:
     import traceback
     logging.error(f"Traceback: {traceback.format_exc()}")
 
+from services.image_ingestion import load_image
+from services.result_cache import result_cache, content_version, is_cacheable, mark_cached
+from services.inference_client import inference_client, ClientDisconnected
+from services.singleflight import get_flight
+from services.upload_optimizer import UPLOAD_SETTINGS_VERSION
+from services.hybrid_router import hybrid_router
+
+# Upper bound on images accepted by one batch request
+PREDICT_BATCH_MAX_SIZE = int(os.getenv("PREDICT_BATCH_MAX_SIZE", "8"))
+
+# Bump when the local ELD pipeline changes in a way that alters results
+LOCAL_MODEL_VERSION = "eld-local-1"
+
 class ELDService:
     """Service for ELD-powered pain assessment using ELD (Ensemble Landmark Detector) model"""
     
     def __init__(self):
         # Simple initialization - we use ELD model for pain assessment
+        self._local_model = None
+        self._local_model_error: Optional[str] = None
+        self._flight = get_flight("eld-remote")
         logging.info("ELDService initialized for ELD model processing")
     
+    def get_local_model(self):
+        """Local ELD model (torch/OpenCV), loaded on first use; None if it cannot be loaded"""
+        if self._local_model is None and self._local_model_error is None:
+            try:
+                from eld.eld_model import FelinePainAssessmentELD
+                self._local_model = FelinePainAssessmentELD()
+            except Exception as e:
+                self._local_model_error = str(e)
+                logging.warning(f"Local ELD model not available, requests use the remote ELD service: {e}")
+        return self._local_model
+    
     def predict_pain_eld(self, image_bytes: bytes) -> Dict[str, Any]:
         """
         ELD-powered pain prediction using ELD (Ensemble Landmark Detector) model
         """
         # Use ELD model for pain assessment
         if ENHANCED_ELD_AVAILABLE:
-            logging.info("Using ELD model for pain assessment")
-            return process_image_with_enhanced_eld(image_bytes)
+            # Concurrent identical uploads (client retries) share one computation
+            key = self._remote_key(image_bytes)
+            return self._flight.do(key, self._predict_pain_eld, image_bytes, key)
         else:
             raise ValueError("ELD model is not available. Please check API configuration.")
     
+    async def predict_pain_eld_async(self, image_bytes: bytes, request: Any = None) -> Dict[str, Any]:
+        """
+        predict_pain_eld on the inference client: never blocks the event loop,
+        bounded concurrency, timeout and cancellation on client disconnect
+        """
+        if not ENHANCED_ELD_AVAILABLE:
+            raise ValueError("ELD model is not available. Please check API configuration.")
+        key = self._remote_key(image_bytes)
+        # Followers wait without taking an inference slot; if the leading client
+        # disconnects, a follower takes over instead of failing
+        return await self._flight.do_async(
+            key, inference_client.run, self._predict_pain_eld, image_bytes, key,
+            request=request, retry_on=(ClientDisconnected,)
+        )
+    
+    @staticmethod
+    def _remote_key(image_bytes: bytes) -> str:
+        # Image digest plus engine, model and prompt version; the routing
+        # settings are included because they decide which model answers
+        version = content_version(
+            ACTIVE_PROCESSING_PROMPT, UPLOAD_SETTINGS_VERSION,
+            hybrid_router.mode, str(hybrid_router.threshold), LOCAL_MODEL_VERSION
+        )
+        return result_cache.make_key(image_bytes, "eld-hybrid", ELD_MODEL, version)
+    
+    def _predict_pain_eld(self, image_bytes: bytes, key: str) -> Dict[str, Any]:
+        # Resubmitted photos are answered from the result cache
+        cached = result_cache.get(key)
+        if cached is not None:
+            logging.info("Serving cached ELD assessment")
+            return mark_cached(cached, True)
+        
+        # Local ELD model first; the remote model only for low-confidence or failed local runs
+        local_model = self.get_local_model() if hybrid_router.mode == "local_first" else None
+        result = hybrid_router.assess(image_bytes, local_model, process_image_with_enhanced_eld)
+        logging.info(f"ELD assessment served by {result['served_by']}")
+        if is_cacheable(result):
+            result_cache.set(key, {k: v for k, v in result.items() if k != "timings"})
+        return mark_cached(result, False)
+    
+    async def predict_pain_batch_async(self, images: List[bytes], debug: bool = False, request: Any = None) -> List[Dict[str, Any]]:
+        """predict_pain_batch on the inference client"""
+        return await inference_client.run(self.predict_pain_batch, images, debug=debug, request=request)
+    
+    def predict_pain_batch(self, images: List[bytes], debug: bool = False) -> List[Dict[str, Any]]:
+        """
+        Pain prediction for several images in one call
+        
+        Images take the same route as in predict_pain_eld and share its result
+        cache: the images with a cat face are assessed locally in one batch
+        (shared specialist batches, one classifier call), and those the local
+        model cannot answer confidently are escalated to the remote model one
+        by one. Failures are reported per image and never fail the whole batch.
+        debug=True attaches the local model's per-stage timing record to
+        locally assessed results.
+        """
+        if len(images) > PREDICT_BATCH_MAX_SIZE:
+            raise ValueError(f"Batch too large: {len(images)} images (maximum {PREDICT_BATCH_MAX_SIZE})")
+        if not ENHANCED_ELD_AVAILABLE:
+            raise ValueError("ELD model is not available. Please check API configuration.")
+        
+        results: List[Optional[Dict[str, Any]]] = [None] * len(images)
+        keys = [self._remote_key(image_bytes) for image_bytes in images]
+        pending = []
+        uploads = []
+        for i, image_bytes in enumerate(images):
+            cached = result_cache.get(keys[i])
+            if cached is not None:
+                results[i] = mark_cached(cached, True)
+                continue
+            try:
+                uploads.append((image_bytes, load_image(image_bytes)))
+            except ValueError as e:
+                results[i] = _batch_error_result("INVALID_IMAGE", str(e))
+                continue
+            pending.append(i)
+        
+        if pending:
+            local_model = self.get_local_model() if hybrid_router.mode == "local_first" else None
+            assessed = hybrid_router.assess_batch(uploads, local_model, _remote_or_error, debug=debug)
+            for i, result in zip(pending, assessed):
+                if is_cacheable(result):
+                    result_cache.set(keys[i], {k: v for k, v in result.items() if k != "timings"})
+                results[i] = mark_cached(result, False)
+        return results
+    
     def predict_pain_basic(self, image_bytes: bytes) -> Dict[str, Any]:
         """
         Basic pain prediction - redirects to ELD model
         """
         return self.predict_pain_eld(image_bytes)
+    
+    async def predict_pain_basic_async(self, image_bytes: bytes, request: Any = None) -> Dict[str, Any]:
+        """predict_pain_basic on the inference client"""
+        return await inference_client.run(self.predict_pain_basic, image_bytes, request=request)
+
+def _remote_or_error(image_bytes: bytes, ingested: Any) -> Dict[str, Any]:
+    """The remote processor, with an exception reported as that image's error"""
+    try:
+        return process_image_with_enhanced_eld(image_bytes, ingested)
+    except Exception as e:
+        return _batch_error_result("PROCESSING_FAILED", str(e))
+
+def _batch_error_result(error_type: str, message: str) -> Dict[str, Any]:
+    return {
+        "success": False,
+        "error": True,
+        "error_type": error_type,
+        "error_message": message,
+    }
 
 # Global instance - wrap in try-except to prevent import failures
 # Allow import to succeed even if initialization fails, so router can handle it gracefully
@@ -4,14 +4,27 @@ import json
 from typing import Optional, Dict, Any
 from datetime import datetime
 
+from services.image_ingestion import IngestedImage, load_image
+from services.upload_optimizer import optimize_upload
+from services.compact_response import (
+    compact_prompt,
+    RESPONSE_SCHEMA,
+    CompactResponseError,
+    parse_compact_response,
+    invalid_response_result,
+    response_stats,
+)
+from services.inference_client import inference_client, REMOTE_REQUEST_OPTIONS
+
 # Import ELD processing library wrapper
 try:
     from services.eld_processing_lib import (
         is_available,
         configure,
-        create_model,
+        model_pool,
         get_model_name,
-        get_fallback_models,
+        model_router,
+        json_generation_config,
         DEFAULT_MODEL
     )
     ELD_AVAILABLE = is_available()
@@ -328,6 +341,28 @@ IMPORTANT: Score 2 means whiskers are STRAIGHT and MOVING FORWARD/ROSTRALLY (awa
 - The accuracy of pain assessment depends on precise landmark detection
 """
 
+# Remote answer format: "compact" (the prompt above with its output format replaced by
+# the versioned JSON contract, requested in the library's JSON response mode; see
+# services/compact_response.py) or "legacy" (the prompt above as is)
+REMOTE_RESPONSE_FORMAT = os.getenv("REMOTE_RESPONSE_FORMAT", "compact").lower()
+
+if REMOTE_RESPONSE_FORMAT == "legacy":
+    ACTIVE_PROCESSING_PROMPT = ENHANCED_PROCESSING_PROMPT
+    GENERATION_CONFIG = None
+else:
+    ACTIVE_PROCESSING_PROMPT = compact_prompt(ENHANCED_PROCESSING_PROMPT)
+    GENERATION_CONFIG = json_generation_config(RESPONSE_SCHEMA) if ELD_AVAILABLE else None
+
+def parse_model_response(text: str) -> Dict[str, Any]:
+    """Decode the remote answer in the configured response format"""
+    if REMOTE_RESPONSE_FORMAT == "legacy":
+        return parse_enhanced_response(text)
+    try:
+        return parse_compact_response(text)
+    except CompactResponseError as e:
+        logging.warning(f"Rejected remote response ({e})")
+        return invalid_response_result(e, text)
+
 def parse_enhanced_response(text: str) -> Dict[str, Any]:
     """Parse AI response - let AI do all the work"""
     try:
@@ -375,6 +410,7 @@ def parse_enhanced_response(text: str) -> Dict[str, Any]:
         
     except Exception as e:
         logging.error(f"Error parsing AI response: {e}")
+        response_stats.reject("legacy_unparseable")
         return {
             "success": False,
             "pain_level": "Level 1 (Mild Pain)",
@@ -385,9 +421,13 @@ def parse_enhanced_response(text: str) -> Dict[str, Any]:
             "raw_response": text
         }
 
-def enhanced_eld_assessment(image_bytes: bytes, additional_context: Optional[str] = None) -> Dict[str, Any]:
+def enhanced_eld_assessment(image_bytes: bytes, additional_context: Optional[str] = None,
+                            ingested: Optional[IngestedImage] = None) -> Dict[str, Any]:
     """
     Enhanced ELD assessment using ELD model - let ELD do all the work
+
+    ingested is the upload already decoded by the caller (e.g. the local ELD
+    pass); its decoded pixels and located face are reused for the upload.
     """
     
     if not ELD_AVAILABLE:
@@ -412,77 +452,82 @@ def enhanced_eld_assessment(image_bytes: bytes, additional_context: Optional[str
             }
         }
     
-    # Try primary model first, fallback to alternative models if quota exceeded
-    models_to_try = [ELD_MODEL]
-    
-    # Add fallback models if primary model fails
-    fallback_models = get_fallback_models(ELD_MODEL)
-    models_to_try.extend(fallback_models)
+    # Primary model first, then fallbacks; the router leaves out models whose
+    # circuit is open (quota exhausted or failing) so they cost no round-trip
+    models_to_try = model_router.plan(ELD_MODEL)
     
     last_error = None
+    last_was_quota = False
+    attempted = False
+    
+    # Decode once at reduced resolution (EXIF-corrected), crop to the face and
+    # re-encode compactly; the same payload is reused for every model attempt
+    upload = optimize_upload(ingested or load_image(image_bytes), len(image_bytes)) if models_to_try else None
     
     for model_name in models_to_try:
+        if not model_router.acquire(model_name):
+            # Circuit opened since planning, or another request is probing it
+            continue
+        attempted = True
         try:
-            prompt = ENHANCED_PROCESSING_PROMPT
+            prompt = ACTIVE_PROCESSING_PROMPT
             if additional_context:
                 prompt += f"\n\n**Additional Context:** {additional_context}"
             
-            # Use wrapper to create model (handles generic name mapping internally)
-            model = create_model(model_name)
-            
-            import PIL.Image
-            import io
-            pil_image = PIL.Image.open(io.BytesIO(image_bytes))
+            # Pooled per model: reuses the open connection (handles generic name mapping internally)
+            model = model_pool.get(model_name)
             
             actual_model_used = get_model_name(model_name)
             logging.info(f"Using ELD model '{actual_model_used}' for comprehensive pain assessment")
-            response = model.generate_content([prompt, pil_image])
+            response = model.generate_content(
+                [prompt, upload.as_part()],
+                generation_config=GENERATION_CONFIG,
+                request_options=REMOTE_REQUEST_OPTIONS
+            )
+            model_router.record_success(model_name)
             
-            result = parse_enhanced_response(response.text)
+            result = parse_model_response(response.text)
+            # Landmarks come back relative to the (cropped) image the model saw
+            if "visual_landmarks" in result:
+                result["visual_landmarks"] = upload.remap_landmarks(result["visual_landmarks"])
             
             result["_processing_metadata"] = {
                 "enhanced_processing": True,
                 "timestamp": datetime.utcnow().isoformat(),
                 "model_used": model_name,
-                "version": "2.0"
+                "version": "2.0",
+                "upload": upload.metadata()
             }
             
             return result
             
         except Exception as e:
-            error_str = str(e)
             last_error = e
-            
-            # Check if it's a quota error
-            if "quota" in error_str.lower() or "free_tier" in error_str.lower() or "limit" in error_str.lower():
+            last_was_quota = model_router.record_failure(model_name, e)
+            if last_was_quota:
                 logging.warning(f"Quota/limit error with model '{model_name}': {e}")
-                if model_name != models_to_try[-1]:  # Not the last model to try
-                    logging.info(f"Trying fallback model...")
-                    continue  # Try next model
-                else:
-                    # All models exhausted, return error
-                    logging.error(f"All models exhausted due to quota limits")
-                    return {
-                        "success": False,
-                        "error": True,
-                        "error_type": "QUOTA_EXCEEDED",
-                        "error_message": "ELD service quota exceeded. Please try again later.",
-                        "pain_level": "Level 1 (Mild Pain)",
-                        "pain_score": 5,
-                        "confidence": 0.2,
-                        "analysis": "ELD assessment temporarily unavailable. Please try again later.",
-                        "model_type": "ELD",
-                        "raw_response": str(e)
-                    }
             else:
-                # Non-quota error, log and try next model if available
                 logging.error(f"Error with model '{model_name}': {e}")
-                if model_name != models_to_try[-1]:  # Not the last model to try
-                    logging.info(f"Trying fallback model...")
-                    continue
-                else:
-                    # All models exhausted, return error
-                    break
+            if model_name != models_to_try[-1]:  # Not the last model to try
+                logging.info(f"Trying fallback model...")
+    
+    if last_was_quota or not attempted:
+        # Every model is out of quota or cooling down
+        retry_after = model_router.retry_after(ELD_MODEL)
+        logging.error(f"All models exhausted due to quota limits or open circuits (retry after {retry_after}s)")
+        return {
+            "success": False,
+            "error": True,
+            "error_type": "QUOTA_EXCEEDED",
+            "error_message": "ELD service quota exceeded. Please try again later.",
+            "retry_after_seconds": None if retry_after is None else int(retry_after + 0.999),
+            "pain_level": "Level 1 (Mild Pain)",
+            "pain_score": 5,
+            "confidence": 0.2,
+            "analysis": "ELD assessment temporarily unavailable. Please try again later.",
+            "model_type": "ELD",
+            "raw_response": str(last_error) if last_error else "All models cooling down"
+        }
     
     # If we get here, all models failed with non-quota errors
     logging.error(f"Error in ELD assessment with all models: {last_error}")
@@ -500,6 +545,10 @@ def is_enhanced_eld_available() -> bool:
     """Check if Enhanced ELD is available"""
     return ELD_AVAILABLE and bool(ELD_API_KEY)
 
-def process_image_with_enhanced_eld(image_bytes: bytes) -> Dict[str, Any]:
+def process_image_with_enhanced_eld(image_bytes: bytes, ingested: Optional[IngestedImage] = None) -> Dict[str, Any]:
     """Main function to process image with enhanced ELD"""
-    return enhanced_eld_assessment(image_bytes)
+    return enhanced_eld_assessment(image_bytes, ingested=ingested)
+
+async def process_image_with_enhanced_eld_async(image_bytes: bytes, request: Any = None) -> Dict[str, Any]:
+    """Same as process_image_with_enhanced_eld, run on the inference client so the event loop is never blocked"""
+    return await inference_client.run(process_image_with_enhanced_eld, image_bytes, request=request)
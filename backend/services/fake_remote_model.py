@@ -0,0 +1,242 @@
+"""
+Local stand-in for the remote generative model API
+
+Load-testing /predict-eld or /api/pain-assessment-ai against the real
+service burns quota and measures the network as much as our code. With
+REMOTE_MODEL_BACKEND=fake the processing library wrappers load this module
+in place of google.generativeai. It implements the small surface they use
+(configure, GenerativeModel.generate_content / count_tokens,
+GenerationConfig) and answers locally:
+
+- latency drawn from FAKE_REMOTE_LATENCY: "fixed:MS", "uniform:LO_MS:HI_MS"
+  or "lognormal:MEDIAN_MS:SIGMA"; a request timeout shorter than the drawn
+  latency raises DeadlineExceeded after the timeout, like the real client
+- FAKE_REMOTE_QUOTA_RATE of calls fail with a 429 ResourceExhausted carrying
+  a "retry in Ns" hint (FAKE_REMOTE_RETRY_AFTER_SECONDS); models listed in
+  FAKE_REMOTE_EXHAUSTED_MODELS always do, to exercise fallback routing
+- FAKE_REMOTE_ERROR_RATE of calls fail with a 503 ServiceUnavailable
+- FAKE_REMOTE_NO_CAT_RATE of images are answered as "no cat"
+- answers are schema-valid for the prompt in use (the compact contract, or
+  the legacy free-form JSON). FAKE_REMOTE_RESPONSES=random derives a
+  plausible answer from the image bytes (the same image always gets the same
+  answer); "canned" returns one fixed answer
+
+FAKE_REMOTE_SEED makes latency and error draws reproducible.
+"""
+
+import os
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from services.compact_response import (
+    COMPACT_OUTPUT_FORMAT,
+    COMPACT_SCHEMA_VERSION,
+    FGS_KEYS,
+    LANDMARK_COUNT,
+    expand_compact_answer,
+)
+
+FAKE_REMOTE_LATENCY = os.getenv("FAKE_REMOTE_LATENCY", "lognormal:800:0.4")
+FAKE_REMOTE_ERROR_RATE = float(os.getenv("FAKE_REMOTE_ERROR_RATE", "0"))
+FAKE_REMOTE_QUOTA_RATE = float(os.getenv("FAKE_REMOTE_QUOTA_RATE", "0"))
+FAKE_REMOTE_RETRY_AFTER_SECONDS = float(os.getenv("FAKE_REMOTE_RETRY_AFTER_SECONDS", "30"))
+FAKE_REMOTE_EXHAUSTED_MODELS = {
+    name.strip() for name in os.getenv("FAKE_REMOTE_EXHAUSTED_MODELS", "").split(",") if name.strip()
+}
+FAKE_REMOTE_NO_CAT_RATE = float(os.getenv("FAKE_REMOTE_NO_CAT_RATE", "0"))
+FAKE_REMOTE_RESPONSES = os.getenv("FAKE_REMOTE_RESPONSES", "random").lower()
+FAKE_REMOTE_SEED = os.getenv("FAKE_REMOTE_SEED")
+
+# Round-trip of a rejected (429) call
+QUOTA_ERROR_LATENCY_SECONDS = 0.05
+
+
+class ResourceExhausted(Exception):
+    """429 from the fake service (quota / rate limit)"""
+    code = 429
+
+
+class ServiceUnavailable(Exception):
+    """503 from the fake service"""
+    code = 503
+
+
+class DeadlineExceeded(Exception):
+    """The request timeout passed before the fake service answered"""
+    code = 504
+
+
+def parse_latency(spec: str):
+    """Sampler (random.Random -> seconds) for a FAKE_REMOTE_LATENCY spec"""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(":") if v]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0] / 1000.0
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000.0
+    if kind == "lognormal" and len(values) == 2:
+        median_ms, sigma = values
+        return lambda rng: median_ms * rng.lognormvariate(0.0, sigma) / 1000.0
+    raise ValueError(f"Bad FAKE_REMOTE_LATENCY '{spec}'; use fixed:MS, uniform:LO:HI or lognormal:MEDIAN_MS:SIGMA")
+
+
+def _image_digest(contents: List[Any]) -> bytes:
+    digest = hashlib.sha256()
+    for part in contents:
+        if isinstance(part, dict) and "data" in part:
+            digest.update(part["data"])
+        elif hasattr(part, "tobytes"):
+            digest.update(part.tobytes())
+    return digest.digest()
+
+
+def compact_answer(rng: random.Random) -> Dict[str, Any]:
+    """A random answer that satisfies the compact contract"""
+    fgs = [rng.choice((0, 0, 1, 1, 2)) for _ in FGS_KEYS]
+    score = sum(fgs)
+    level = 0 if score <= 2 else 1 if score <= 5 else 2
+    return {
+        "v": COMPACT_SCHEMA_VERSION,
+        "cat": True,
+        "pl": level,
+        "ps": score,
+        "c": round(rng.uniform(0.55, 0.95), 2),
+        "fgs": fgs,
+        "lm": [[round(rng.uniform(10, 90), 1), round(rng.uniform(10, 90), 1)] for _ in range(LANDMARK_COUNT)],
+        "d": [f"Simulated observation for {key}" for key in FGS_KEYS],
+        "x": {"overall_expression": "Simulated assessment from the local fake remote model"},
+        "adv": {"now": ["Observe your cat"], "mon": "Check again in 24 hours", "vet": "If signs persist", "home": []},
+    }
+
+
+def legacy_answer(answer: Dict[str, Any]) -> Dict[str, Any]:
+    """The same answer in the free-form JSON the legacy prompts ask for"""
+    expanded = expand_compact_answer(answer)
+    expanded.pop("success", None)
+    expanded.pop("response_schema_version", None)
+    # Fields of the /api/pain-assessment-ai prompt
+    expanded["fgs_total"] = answer["ps"]
+    expanded["indicators"] = {
+        key: {"score": value, "observation": f"Simulated observation for {key}"}
+        for key, value in zip(FGS_KEYS, answer["fgs"])
+    }
+    expanded["overall_analysis"] = "Simulated assessment from the local fake remote model"
+    expanded["recommendations"] = ["Observe your cat"]
+    expanded["urgency"] = ("Low", "Medium", "High")[answer["pl"]]
+    return expanded
+
+
+class FakeBackend:
+    """Latency, failure and answer generation shared by every fake model"""
+
+    def __init__(self, latency: str = FAKE_REMOTE_LATENCY, error_rate: float = FAKE_REMOTE_ERROR_RATE,
+                 quota_rate: float = FAKE_REMOTE_QUOTA_RATE, exhausted_models=FAKE_REMOTE_EXHAUSTED_MODELS,
+                 retry_after: float = FAKE_REMOTE_RETRY_AFTER_SECONDS, no_cat_rate: float = FAKE_REMOTE_NO_CAT_RATE,
+                 responses: str = FAKE_REMOTE_RESPONSES, seed: Optional[str] = FAKE_REMOTE_SEED):
+        self.latency_spec = latency
+        self._latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.quota_rate = quota_rate
+        self.exhausted_models = set(exhausted_models)
+        self.retry_after = retry_after
+        self.no_cat_rate = no_cat_rate
+        self.responses = responses
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, model_name: str, outcome: str) -> None:
+        with self._lock:
+            counts = self._calls.setdefault(model_name, {})
+            counts[outcome] = counts.get(outcome, 0) + 1
+
+    def _draw(self):
+        with self._lock:
+            return self._latency(self._rng), self._rng.random()
+
+    def answer(self, model_name: str, contents: List[Any], timeout: Optional[float]) -> str:
+        latency, roll = self._draw()
+        if model_name in self.exhausted_models or roll < self.quota_rate:
+            # Rejected up front, as the real service does, without the model's latency
+            time.sleep(min(latency, QUOTA_ERROR_LATENCY_SECONDS))
+            self._count(model_name, "quota")
+            raise ResourceExhausted(
+                f"429 Quota exceeded for model {model_name}. Please retry in {self.retry_after:g}s."
+            )
+        if timeout is not None and latency > timeout:
+            time.sleep(timeout)
+            self._count(model_name, "deadline_exceeded")
+            raise DeadlineExceeded(f"504 Deadline Exceeded after {timeout}s")
+        time.sleep(latency)
+
+        if roll < self.quota_rate + self.error_rate:
+            self._count(model_name, "unavailable")
+            raise ServiceUnavailable("503 The service is currently unavailable")
+
+        digest = _image_digest(contents)
+        answer_rng = random.Random(0 if self.responses == "canned" else digest)
+        prompt = next((part for part in contents if isinstance(part, str)), "")
+        compact = COMPACT_OUTPUT_FORMAT in prompt
+
+        if answer_rng.random() < self.no_cat_rate:
+            self._count(model_name, "no_cat")
+            if compact:
+                return json.dumps({"v": COMPACT_SCHEMA_VERSION, "cat": False})
+            return json.dumps({
+                "error": True,
+                "error_type": "NO_CAT_DETECTED",
+                "error_message": "No cat face detected in the image",
+                "error_guidance": "Please upload a clear photo of a cat's face for pain assessment.",
+            })
+
+        self._count(model_name, "ok")
+        answer = compact_answer(answer_rng)
+        return json.dumps(answer if compact else legacy_answer(answer))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = {model: dict(counts) for model, counts in self._calls.items()}
+        return {
+            "latency": self.latency_spec,
+            "error_rate": self.error_rate,
+            "quota_rate": self.quota_rate,
+            "exhausted_models": sorted(self.exhausted_models),
+            "no_cat_rate": self.no_cat_rate,
+            "responses": self.responses,
+            "calls": calls,
+        }
+
+
+fake_backend = FakeBackend()
+
+
+# -- the google.generativeai surface used by the processing library wrappers --
+
+def configure(api_key: Optional[str] = None, **kwargs: Any) -> None:
+    logging.warning("Remote model calls are answered by the local fake (REMOTE_MODEL_BACKEND=fake)")
+
+
+class GenerationConfig:
+    def __init__(self, **kwargs: Any):
+        self.__dict__.update(kwargs)
+
+
+class GenerativeModel:
+    def __init__(self, model_name: str, **kwargs: Any):
+        self.model_name = model_name
+
+    def generate_content(self, contents: Any, generation_config: Any = None,
+                         request_options: Optional[Dict[str, Any]] = None, **kwargs: Any) -> Any:
+        if not isinstance(contents, list):
+            contents = [contents]
+        timeout = (request_options or {}).get("timeout")
+        return SimpleNamespace(text=fake_backend.answer(self.model_name, contents, timeout))
+
+    def count_tokens(self, contents: Any, request_options: Optional[Dict[str, Any]] = None, **kwargs: Any) -> Any:
+        return SimpleNamespace(total_tokens=len(str(contents)) // 4)
@@ -0,0 +1,200 @@
+"""
+Local-first routing between the local ELD model and the remote processor
+
+The local FelinePainAssessmentELD pipeline answers in tens of milliseconds
+and costs nothing; the remote processor takes seconds and uses quota. With
+ELD_ROUTING_MODE=local_first an image is assessed locally first and the
+local result is returned when the classifier's confidence reaches
+ELD_LOCAL_CONFIDENCE_THRESHOLD. Everything else goes to the remote model,
+whose answer (or error) is returned as is:
+
+- no trained classifier is loaded: the local model would only guess, so the
+  local pass is skipped and every request is remote
+- the cat cascade finds no cat face: the local model has no cat check of its
+  own (the frontal cascade it falls back to also fires on people), so the
+  image is escalated without running the local pipeline
+- the local run fails or its confidence is below the threshold
+
+The upload is decoded once and its face located once; the remote processor
+gets the same decoded image and face box for its upload crop.
+
+Every result records the path that served it in `served_by` ("local" or
+"remote") and the routing decision in `routing`.
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.image_ingestion import IngestedImage, load_image
+
+ELD_ROUTING_MODE = os.getenv("ELD_ROUTING_MODE", "local_first").lower()
+ELD_LOCAL_CONFIDENCE_THRESHOLD = float(os.getenv("ELD_LOCAL_CONFIDENCE_THRESHOLD", "0.75"))
+
+ROUTING_MODES = ("local_first", "remote_only")
+
+
+class HybridRouter:
+    """Chooses between the local ELD model and the remote processor per request"""
+
+    def __init__(self, mode: str = ELD_ROUTING_MODE, threshold: float = ELD_LOCAL_CONFIDENCE_THRESHOLD):
+        if mode not in ROUTING_MODES:
+            logging.warning(f"Unknown ELD_ROUTING_MODE '{mode}', using local_first")
+            mode = "local_first"
+        self.mode = mode
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._served = {"local": 0, "remote": 0}
+        self._escalations: Dict[str, int] = {}
+        self._latency_ms = {"local": [0, 0.0], "remote": [0, 0.0]}  # [count, total]
+
+    def _observe(self, path: str, started: float, count: int = 1) -> float:
+        """Record `count` requests sharing the time since `started`; returns the per-request ms"""
+        elapsed_ms = (time.perf_counter() - started) * 1000.0 / count
+        with self._lock:
+            self._latency_ms[path][0] += count
+            self._latency_ms[path][1] += elapsed_ms * count
+        return elapsed_ms
+
+    def _serve(self, result: Dict[str, Any], served_by: str, routing: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            self._served[served_by] += 1
+            reason = routing.get("escalation_reason")
+            if reason:
+                self._escalations[reason] = self._escalations.get(reason, 0) + 1
+        result["served_by"] = served_by
+        result["routing"] = routing
+        return result
+
+    def assess(self, image_bytes: bytes, local_model: Any,
+               remote: Callable[[bytes, Optional[IngestedImage]], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Assess one image, locally first when possible
+
+        Args:
+            image_bytes: Raw upload
+            local_model: FelinePainAssessmentELD, or None when it cannot be loaded
+            remote: The remote processor (image bytes, decoded upload or None -> result dict)
+
+        Raises:
+            ValueError: If the image cannot be decoded
+        """
+        return self.assess_batch([(image_bytes, None)], local_model, remote)[0]
+
+    def assess_batch(self, uploads: List[Tuple[bytes, Optional[IngestedImage]]], local_model: Any,
+                     remote: Callable[[bytes, Optional[IngestedImage]], Dict[str, Any]],
+                     debug: bool = False) -> List[Dict[str, Any]]:
+        """
+        Assess several images with the same policy as assess
+
+        The local pass is one assess_pain_batch call over the images with a cat
+        face; the rest are escalated to the remote processor one by one.
+
+        Args:
+            uploads: (raw upload, decoded upload or None to decode here) per image
+            local_model: FelinePainAssessmentELD, or None when it cannot be loaded
+            remote: The remote processor (image bytes, decoded upload or None -> result dict)
+            debug: Attach the local model's timing record to locally assessed results
+
+        Returns:
+            One result per upload, in order
+
+        Raises:
+            ValueError: If an image that has to be decoded here cannot be
+        """
+        routings = [{"mode": self.mode, "threshold": self.threshold} for _ in uploads]
+        results: List[Optional[Dict[str, Any]]] = [None] * len(uploads)
+        uploads = list(uploads)
+
+        if self.mode == "local_first":
+            if local_model is None:
+                skip_reason = "local_unavailable"
+            elif not local_model.has_fitted_classifier:
+                skip_reason = "local_unfitted"
+            else:
+                skip_reason = None
+                uploads = [(data, ingested or load_image(data)) for data, ingested in uploads]
+                for i, local_result in self._assess_locally(uploads, local_model, routings, debug):
+                    results[i] = self._serve(local_result, "local", routings[i])
+            if skip_reason:
+                for routing in routings:
+                    routing["escalation_reason"] = skip_reason
+
+        for i, (data, ingested) in enumerate(uploads):
+            if results[i] is not None:
+                continue
+            started = time.perf_counter()
+            remote_result = remote(data, ingested)
+            routings[i]["remote_ms"] = round(self._observe("remote", started), 1)
+            results[i] = self._serve(remote_result, "remote", routings[i])
+        return results
+
+    def _assess_locally(self, uploads: List[Tuple[bytes, IngestedImage]], local_model: Any,
+                        routings: List[Dict[str, Any]], debug: bool) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        (index, result) of the local results that may be served; every other
+        image gets its routings[i]["escalation_reason"]
+        """
+        started = time.perf_counter()
+        candidates: List[Tuple[int, Tuple[int, int, int, int]]] = []
+        for i, (_, ingested) in enumerate(uploads):
+            try:
+                face, cascade = ingested.locate_face(local_model.face_detector)
+            except Exception as e:
+                logging.warning(f"Local face detection failed, escalating to remote: {e}")
+                routings[i]["escalation_reason"] = "local_error"
+                continue
+            if face is None or cascade != "cat":
+                routings[i]["escalation_reason"] = "no_cat_face"
+                continue
+            candidates.append((i, face))
+
+        local_results: List[Dict[str, Any]] = []
+        if candidates:
+            try:
+                local_results = local_model.assess_pain_batch(
+                    [uploads[i][1].as_bgr_array() for i, _ in candidates], debug=debug,
+                    face_boxes=[face for _, face in candidates])
+            except Exception as e:
+                logging.warning(f"Local ELD model failed, escalating to remote: {e}")
+                for i, _ in candidates:
+                    routings[i]["escalation_reason"] = "local_error"
+        local_ms = round(self._observe("local", started, len(uploads)), 1)
+
+        accepted = []
+        for routing in routings:
+            routing["local_ms"] = local_ms
+        for (i, _), local_result in zip(candidates, local_results):
+            confidence = float(local_result.get("confidence") or 0.0)
+            routings[i]["local_confidence"] = round(confidence, 4)
+            if not local_result.get("success", False):
+                routings[i]["escalation_reason"] = "local_failed"
+            elif confidence < self.threshold:
+                routings[i]["escalation_reason"] = "low_confidence"
+            else:
+                accepted.append((i, local_result))
+        return accepted
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            served = dict(self._served)
+            escalations = dict(self._escalations)
+            latency = {
+                path: round(total / count, 1) if count else None
+                for path, (count, total) in self._latency_ms.items()
+            }
+        total = sum(served.values())
+        return {
+            "mode": self.mode,
+            "threshold": self.threshold,
+            "served_by": served,
+            "local_share": round(served["local"] / total, 4) if total else None,
+            "escalations": escalations,
+            "mean_latency_ms": latency,
+        }
+
+
+# Shared by the ELD service
+hybrid_router = HybridRouter()
@@ -0,0 +1,122 @@
+"""
+Shared image ingestion for pain assessment uploads
+
+Phone photos are often 12 MP or more, while every engine only needs a
+face-sized region. Images are decoded once, at reduced resolution where the
+codec supports it (JPEG DCT scaling via PIL ``draft``), EXIF orientation is
+applied, and the result is capped at a configurable long edge. Engines get a
+PIL view (remote ELD processing) or a NumPy RGB/BGR view (local ELD model)
+of the same decoded pixels. The face found in an upload is remembered with
+it, so the local model and the remote upload crop detect it only once.
+"""
+
+import io
+import os
+import logging
+from typing import Any, Optional, Tuple, Union, BinaryIO
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Long edge (pixels) uploads are reduced to before assessment
+INGEST_MAX_EDGE = int(os.getenv("IMAGE_INGEST_MAX_EDGE", "1600"))
+
+# Refuse to decode absurdly large images (decompression bombs); checked per
+# upload so PIL's process-wide limit stays as other code expects it
+INGEST_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", str(80_000_000)))
+
+
+class IngestedImage:
+    """A decoded, orientation-corrected upload with PIL and NumPy views"""
+
+    def __init__(self, image: Image.Image, original_size: Tuple[int, int], source_format: Optional[str]):
+        self.image = image
+        self.original_size = original_size
+        self.source_format = source_format
+        self._bgr = None
+        self._face: Tuple[Optional[Tuple[int, int, int, int]], Optional[str]] = (None, None)
+        self.face_located = False
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.image.size
+
+    @property
+    def scale(self) -> float:
+        """Decoded long edge / original long edge (1.0 when no reduction happened)"""
+        return max(self.image.size) / float(max(self.original_size))
+
+    def as_pil(self) -> Image.Image:
+        return self.image
+
+    def as_rgb_array(self) -> Any:
+        """(H, W, 3) uint8 RGB array"""
+        import numpy as np
+        return np.asarray(self.image)
+
+    def as_bgr_array(self) -> Any:
+        """(H, W, 3) uint8 BGR array, as the OpenCV-based local ELD model expects"""
+        if self._bgr is None:
+            import numpy as np
+            self._bgr = np.ascontiguousarray(self.as_rgb_array()[:, :, ::-1])
+        return self._bgr
+
+    def locate_face(self, detector: Any = None) -> Tuple[Optional[Tuple[int, int, int, int]], Optional[str]]:
+        """
+        Face box (x, y, w, h) in decoded-image pixels and the cascade that found it
+
+        Detected with `detector` (an ELD FelineFaceDetector) on the first call
+        and remembered; (None, None) when no face was found, or when it has not
+        been located yet and no detector is given.
+        """
+        if not self.face_located and detector is not None:
+            self._face = detector.locate_face(self.as_bgr_array())
+            self.face_located = True
+        return self._face
+
+
+def load_image(source: Union[bytes, BinaryIO], max_edge: Optional[int] = None) -> IngestedImage:
+    """
+    Decode an uploaded image at (at most) `max_edge` pixels on its long edge
+
+    Args:
+        source: Raw image bytes or a binary file object
+        max_edge: Long-edge cap; defaults to IMAGE_INGEST_MAX_EDGE (1600)
+
+    Returns:
+        IngestedImage in RGB mode with EXIF orientation applied
+
+    Raises:
+        ValueError: If the data is not a decodable image or has more than
+            IMAGE_MAX_PIXELS pixels
+    """
+    max_edge = max_edge or INGEST_MAX_EDGE
+    stream = io.BytesIO(source) if isinstance(source, (bytes, bytearray, memoryview)) else source
+
+    try:
+        image = Image.open(stream)
+        original_size = image.size
+        source_format = image.format
+
+        width, height = original_size
+        # Image.open only reads the header; refuse before any pixels are decoded
+        if width * height > INGEST_MAX_PIXELS:
+            raise ValueError(f"Image too large: {width}x{height} pixels (maximum {INGEST_MAX_PIXELS})")
+        if max(width, height) > max_edge:
+            # For JPEG this picks the largest DCT scale (1/2, 1/4, 1/8) that still
+            # covers max_edge on the long side, so the full-size image is never decoded
+            ratio = max_edge / float(max(width, height))
+            image.draft('RGB', (max(1, int(width * ratio)), max(1, int(height * ratio))))
+
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        if max(image.size) > max_edge:
+            # Area averaging; after a JPEG draft the remaining reduction is under 2x
+            image.thumbnail((max_edge, max_edge), Image.Resampling.BOX)
+        # Rotate after shrinking so the transpose only touches the reduced image
+        image = ImageOps.exif_transpose(image)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError) as e:
+        raise ValueError(f"Invalid image data: {e}") from e
+
+    if image.size != original_size:
+        logging.debug(f"Decoded {source_format} upload {original_size} -> {image.size}")
+    return IngestedImage(image, original_size, source_format)
@@ -0,0 +1,163 @@
+"""
+Non-blocking execution of remote (and local) model inference
+
+The remote model SDK and the local ELD pipeline are synchronous and can take
+seconds per call. Calling them directly from an ``async def`` endpoint
+freezes the event loop, stalling every other request on the worker (logins,
+list pages). AsyncInferenceClient runs those calls on a dedicated, bounded
+thread pool and adds:
+
+- a concurrency cap (INFERENCE_MAX_CONCURRENCY); excess calls wait their turn
+  without occupying a thread
+- a per-call timeout (INFERENCE_TIMEOUT_SECONDS), covering queueing time
+- cancellation when the HTTP client disconnects while the call is queued or
+  running
+
+A running thread cannot be interrupted, so a call abandoned after it started
+keeps its slot until the SDK returns; remote calls also pass the timeout to
+the SDK (see REMOTE_REQUEST_OPTIONS) so abandoned threads do not linger.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+INFERENCE_MAX_CONCURRENCY = int(os.getenv("INFERENCE_MAX_CONCURRENCY", "4"))
+INFERENCE_TIMEOUT_SECONDS = float(os.getenv("INFERENCE_TIMEOUT_SECONDS", "60"))
+
+# Passed to generate_content so the SDK itself gives up on a hung request
+REMOTE_REQUEST_OPTIONS = {"timeout": INFERENCE_TIMEOUT_SECONDS}
+
+# How often a waiting call checks whether the HTTP client is still connected
+DISCONNECT_POLL_SECONDS = 0.5
+
+
+class InferenceTimeout(Exception):
+    """The call did not finish within its timeout"""
+
+
+class ClientDisconnected(Exception):
+    """The HTTP client went away before the call finished"""
+
+
+class AsyncInferenceClient:
+    """Bounded thread pool with timeouts and disconnect cancellation for blocking model calls"""
+
+    def __init__(self, max_concurrency: int = INFERENCE_MAX_CONCURRENCY, timeout: float = INFERENCE_TIMEOUT_SECONDS):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="inference")
+        self._semaphores: Dict[int, asyncio.Semaphore] = {}
+        self._lock = threading.Lock()
+        self._counters = {
+            "started": 0, "completed": 0, "failed": 0,
+            "timeouts": 0, "disconnects": 0, "in_flight": 0, "waiting": 0,
+        }
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # One semaphore per event loop (asyncio primitives are loop-bound)
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(id(loop))
+        if semaphore is None:
+            semaphore = self._semaphores.setdefault(id(loop), asyncio.Semaphore(self.max_concurrency))
+        return semaphore
+
+    def _count(self, name: str, delta: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += delta
+
+    async def run(self, fn: Callable[..., Any], *args: Any, timeout: Optional[float] = None,
+                  request: Any = None, **kwargs: Any) -> Any:
+        """
+        Run a blocking callable off the event loop
+
+        Args:
+            fn: Blocking function to call with *args / **kwargs
+            timeout: Seconds before InferenceTimeout (default INFERENCE_TIMEOUT_SECONDS)
+            request: Optional Starlette Request; the call is abandoned if its client disconnects
+
+        Raises:
+            InferenceTimeout: The call (including time spent waiting for a slot) took too long
+            ClientDisconnected: The client disconnected first
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (self.timeout if timeout is None else timeout)
+        semaphore = self._semaphore()
+
+        # Wait for a slot without holding a thread
+        self._count("waiting")
+        try:
+            await self._wait(loop.create_task(semaphore.acquire()), deadline, request, release=semaphore)
+        finally:
+            self._count("waiting", -1)
+
+        self._count("started")
+        self._count("in_flight")
+        work = self._executor.submit(partial(fn, *args, **kwargs))
+
+        def _finished(_):
+            # The slot is only freed once the thread is done (or the work was cancelled
+            # before starting), even if the caller gave up earlier
+            self._count("in_flight", -1)
+            try:
+                loop.call_soon_threadsafe(semaphore.release)
+            except RuntimeError:
+                pass  # Event loop already closed
+
+        work.add_done_callback(_finished)
+        future = asyncio.wrap_future(work, loop=loop)
+        try:
+            result = await self._wait(future, deadline, request)
+        except (InferenceTimeout, ClientDisconnected):
+            raise
+        except Exception:
+            self._count("failed")
+            raise
+        self._count("completed")
+        return result
+
+    async def _wait(self, future: "asyncio.Future", deadline: float, request: Any,
+                    release: Optional[asyncio.Semaphore] = None) -> Any:
+        loop = asyncio.get_running_loop()
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                self._abandon(future, release)
+                self._count("timeouts")
+                raise InferenceTimeout("Inference timed out")
+            poll = min(remaining, DISCONNECT_POLL_SECONDS) if request is not None else remaining
+            try:
+                done, _ = await asyncio.wait({future}, timeout=poll)
+            except asyncio.CancelledError:
+                # The request handler itself was cancelled
+                self._abandon(future, release)
+                raise
+            if done:
+                return future.result()
+            if request is not None and await request.is_disconnected():
+                self._abandon(future, release)
+                self._count("disconnects")
+                logging.info("Client disconnected; abandoning inference call")
+                raise ClientDisconnected("Client disconnected")
+
+    @staticmethod
+    def _abandon(future: "asyncio.Future", release: Optional[asyncio.Semaphore]) -> None:
+        if release is not None:
+            # A slot acquired after we gave up must be handed back
+            future.add_done_callback(lambda f: release.release() if not f.cancelled() else None)
+        future.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters)
+        stats["max_concurrency"] = self.max_concurrency
+        stats["timeout_seconds"] = self.timeout
+        return stats
+
+
+# Shared by every endpoint that calls a model
+inference_client = AsyncInferenceClient()
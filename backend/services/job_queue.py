@@ -0,0 +1,281 @@
+"""
+Asynchronous pain assessment jobs
+
+Assessing inside the HTTP request ties up the request for as long as the
+remote model or the ELD pipeline takes, and slow runs hit client timeouts.
+Instead the upload is queued and the client gets a job id back at once:
+
+- a bounded in-memory queue (JOB_QUEUE_MAX_SIZE) feeds JOB_WORKERS worker
+  tasks that run the existing engines (which already execute off the event
+  loop through the inference client)
+- job state and results live in the pain_assessment_jobs table, so any API
+  worker can answer status polls
+- when the queue is full, submit() raises QueueFull with a retry-after
+  estimate from the observed service time, for a 429 response
+- queue depth, wait time and service time are exported by metrics()
+
+Queued images are held in memory: jobs still queued or running when the
+process stops are reported as failed (interrupted) once they are older than
+JOB_STALE_SECONDS.
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+import uuid
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from services.inference_client import InferenceTimeout
+from services.result_cache import to_jsonable
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_MAX_SIZE = int(os.getenv("JOB_QUEUE_MAX_SIZE", "32"))
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "900"))
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+TERMINAL_STATES = (JOB_SUCCEEDED, JOB_FAILED)
+
+# Histogram bucket upper bounds in milliseconds (the last bucket is open-ended)
+LATENCY_BUCKETS_MS = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+class QueueFull(Exception):
+    """No room for another job; retry after `retry_after` seconds"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Job queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class _Histogram:
+    def __init__(self, buckets_ms: Tuple[float, ...] = LATENCY_BUCKETS_MS):
+        self.buckets_ms = buckets_ms
+        self.counts = [0] * (len(buckets_ms) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+
+    def observe(self, value_ms: float) -> None:
+        self.counts[bisect_left(self.buckets_ms, value_ms)] += 1
+        self.count += 1
+        self.total_ms += value_ms
+
+    @property
+    def mean_ms(self) -> Optional[float]:
+        return self.total_ms / self.count if self.count else None
+
+    def snapshot(self) -> Dict[str, Any]:
+        labels = [f"le_{bound:g}" for bound in self.buckets_ms] + ["le_inf"]
+        mean = self.mean_ms
+        return {
+            "count": self.count,
+            "mean_ms": None if mean is None else round(mean, 1),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class JobQueue:
+    """Bounded queue of assessment jobs processed by a fixed pool of worker tasks"""
+
+    def __init__(self, session_factory: Callable[[], Any], workers: int = JOB_WORKERS,
+                 max_size: int = JOB_QUEUE_MAX_SIZE):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.max_size = max_size
+        self._engines: Dict[str, Callable[[bytes], Awaitable[Dict[str, Any]]]] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self._events: Dict[str, asyncio.Event] = {}
+        self._running = 0
+        self._reserved = 0
+        self._counters = {"submitted": 0, "rejected": 0, "succeeded": 0, "failed": 0}
+        self._wait = _Histogram()
+        self._service = _Histogram()
+
+    def register_engine(self, name: str, fn: Callable[[bytes], Awaitable[Dict[str, Any]]]) -> None:
+        """Make an engine (async image bytes -> result dict) available to jobs"""
+        self._engines[name] = fn
+
+    @property
+    def engines(self):
+        return list(self._engines)
+
+    def _ensure_started(self) -> None:
+        # Workers are started on first use, inside the serving event loop
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+            self._tasks = [asyncio.get_running_loop().create_task(self._worker(i)) for i in range(self.workers)]
+            logging.info(f"Pain assessment job queue started with {self.workers} workers")
+
+    def retry_after(self) -> int:
+        """Seconds until a queue slot is likely to free up"""
+        mean_ms = self._service.mean_ms or 5000.0
+        depth = self._queue.qsize() + self._reserved if self._queue is not None else 0
+        return max(1, math.ceil(mean_ms / 1000.0 * max(1, depth) / max(1, self.workers)))
+
+    async def submit(self, user_id: int, engine: str, image_bytes: bytes) -> str:
+        """
+        Queue an assessment and return its job id
+
+        Raises QueueFull when at capacity and KeyError for an unknown engine.
+        """
+        if engine not in self._engines:
+            raise KeyError(engine)
+        self._ensure_started()
+        # Slots held by submissions still inserting their row count as taken
+        if self._queue.qsize() + self._reserved >= self.max_size:
+            self._counters["rejected"] += 1
+            raise QueueFull(self.retry_after())
+
+        job_id = str(uuid.uuid4())
+        self._reserved += 1
+        try:
+            await asyncio.to_thread(self._insert, job_id, user_id, engine)
+        finally:
+            self._reserved -= 1
+
+        self._events[job_id] = asyncio.Event()
+        self._queue.put_nowait((job_id, engine, image_bytes, time.monotonic()))
+        self._counters["submitted"] += 1
+        return job_id
+
+    def _insert(self, job_id: str, user_id: int, engine: str) -> None:
+        from core.models import PainAssessmentJob
+        db = self.session_factory()
+        try:
+            db.add(PainAssessmentJob(id=job_id, user_id=user_id, engine=engine, status=JOB_QUEUED, created_at=_now()))
+            db.commit()
+        finally:
+            db.close()
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job_id, engine, image_bytes, enqueued_at = await self._queue.get()
+            try:
+                await self._run(job_id, engine, image_bytes, enqueued_at)
+            except Exception as e:
+                logging.error(f"Job worker {index} failed on job {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+                event = self._events.pop(job_id, None)
+                if event is not None:
+                    event.set()
+
+    async def _run(self, job_id: str, engine: str, image_bytes: bytes, enqueued_at: float) -> None:
+        started = time.monotonic()
+        wait_ms = (started - enqueued_at) * 1000.0
+        self._wait.observe(wait_ms)
+        await asyncio.to_thread(self._update, job_id, status=JOB_RUNNING, started_at=_now(), wait_ms=int(wait_ms))
+
+        self._running += 1
+        fields: Dict[str, Any] = {}
+        try:
+            result = await self._engines[engine](image_bytes)
+            if result.get("error") or not result.get("success", True):
+                fields = {
+                    "status": JOB_FAILED,
+                    "error_type": result.get("error_type") or "ASSESSMENT_FAILED",
+                    "error_message": result.get("error_message") or str(result.get("error")),
+                }
+            else:
+                fields = {"status": JOB_SUCCEEDED}
+            fields["result"] = json.dumps(result, default=to_jsonable)
+        except InferenceTimeout:
+            fields = {"status": JOB_FAILED, "error_type": "INFERENCE_TIMEOUT",
+                      "error_message": "The pain assessment took too long to complete"}
+        except ValueError as e:
+            fields = {"status": JOB_FAILED, "error_type": "INVALID_IMAGE", "error_message": str(e)}
+        except Exception as e:
+            logging.error(f"Pain assessment job {job_id} failed: {e}")
+            fields = {"status": JOB_FAILED, "error_type": "PROCESSING_FAILED", "error_message": str(e)}
+        finally:
+            self._running -= 1
+
+        service_ms = (time.monotonic() - started) * 1000.0
+        self._service.observe(service_ms)
+        self._counters[fields["status"]] += 1
+        await asyncio.to_thread(self._update, job_id, finished_at=_now(), service_ms=int(service_ms), **fields)
+
+    def _update(self, job_id: str, **fields: Any) -> None:
+        from core.models import PainAssessmentJob
+        db = self.session_factory()
+        try:
+            db.query(PainAssessmentJob).filter(PainAssessmentJob.id == job_id).update(fields)
+            db.commit()
+        finally:
+            db.close()
+
+    async def wait(self, job_id: str, timeout: float) -> None:
+        """Wait up to `timeout` seconds for a job queued in this process to finish"""
+        event = self._events.get(job_id)
+        if event is None:
+            # Finished already, or queued by another process: the caller re-reads the table
+            await asyncio.sleep(timeout)
+            return
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    @staticmethod
+    def expire_if_stale(db: Any, job: Any) -> Any:
+        """Mark a job that has been queued/running for longer than JOB_STALE_SECONDS as interrupted"""
+        if job.status in TERMINAL_STATES or job.created_at is None:
+            return job
+        created_at = job.created_at if job.created_at.tzinfo else job.created_at.replace(tzinfo=timezone.utc)
+        if _now() - created_at > timedelta(seconds=JOB_STALE_SECONDS):
+            job.status = JOB_FAILED
+            job.error_type = "JOB_INTERRUPTED"
+            job.error_message = "The job did not finish; please submit the image again"
+            job.finished_at = _now()
+            db.commit()
+        return job
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "max_queue_size": self.max_size,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "running": self._running,
+            "counters": dict(self._counters),
+            "wait_time": self._wait.snapshot(),
+            "service_time": self._service.snapshot(),
+            "retry_after_estimate_seconds": self.retry_after(),
+        }
+
+
+def job_to_dict(job: Any) -> Dict[str, Any]:
+    """API representation of a PainAssessmentJob row"""
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "engine": job.engine,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "wait_ms": job.wait_ms,
+        "service_ms": job.service_ms,
+        "result": json.loads(job.result) if job.result else None,
+        "error_type": job.error_type,
+        "error_message": job.error_message,
+    }
+
+
+def _create_job_queue() -> JobQueue:
+    from core.database import SessionLocal
+    return JobQueue(SessionLocal)
+
+
+# Process-wide queue; engines are registered by the jobs router
+job_queue = _create_job_queue()
@@ -0,0 +1,220 @@
+"""
+Content-addressed cache for pain assessment results
+
+Clients often resubmit the same photo (network retries, re-opening a past
+assessment). Results are cached under the SHA-256 of the image bytes plus the
+engine, model name and prompt/model version that produced them, so a change
+of model or prompt never serves a stale answer.
+
+Two tiers:
+- an in-memory LRU bounded by entry count, with a TTL per entry
+- an optional SQLite file (RESULT_CACHE_DB) that survives restarts and is
+  shared by all workers on the host
+
+Only successful results should be stored; callers decide what qualifies.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "256"))
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", "86400"))
+RESULT_CACHE_DB = os.getenv("RESULT_CACHE_DB", "")
+RESULT_CACHE_DISK_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_DISK_MAX_ENTRIES", "10000"))
+# Expired and surplus disk rows are deleted once per this many writes
+RESULT_CACHE_DISK_PRUNE_EVERY = int(os.getenv("RESULT_CACHE_DISK_PRUNE_EVERY", "100"))
+
+
+def content_version(*parts: Optional[str]) -> str:
+    """Short stable hash of prompt text / model settings, for use as a cache key version"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update((part or "").encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+def to_jsonable(value: Any) -> Any:
+    """json.dumps default= hook for NumPy scalars and arrays from the local ELD model"""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class ResultCache:
+    """Two-tier (memory LRU + optional SQLite) cache of assessment results"""
+
+    def __init__(self, max_entries: int = RESULT_CACHE_MAX_ENTRIES, ttl_seconds: int = RESULT_CACHE_TTL_SECONDS,
+                 db_path: Optional[str] = None, disk_max_entries: int = RESULT_CACHE_DISK_MAX_ENTRIES,
+                 disk_prune_every: int = RESULT_CACHE_DISK_PRUNE_EVERY):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_max_entries = disk_max_entries
+        self.disk_prune_every = max(1, disk_prune_every)
+        self._disk_writes = 0
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {
+            "hits": 0, "misses": 0, "memory_hits": 0, "disk_hits": 0,
+            "stores": 0, "evictions": 0, "expirations": 0, "errors": 0,
+        }
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self.db_path = db_path
+        if db_path:
+            self._open_db(db_path)
+
+    def _open_db(self, db_path: str) -> None:
+        try:
+            directory = os.path.dirname(os.path.abspath(db_path))
+            os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=5.0)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS result_cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " created_at REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS ix_result_cache_created_at ON result_cache (created_at)")
+            self._db.commit()
+            logging.info(f"Result cache disk tier at {db_path}")
+        except Exception as e:
+            logging.error(f"Result cache disk tier disabled, could not open {db_path}: {e}")
+            self._db = None
+
+    @staticmethod
+    def make_key(image_bytes: bytes, engine: str, model: str, version: str) -> str:
+        """Cache key: engine, model and version plus the SHA-256 of the image bytes"""
+        return f"{engine}:{model}:{version}:{hashlib.sha256(image_bytes).hexdigest()}"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached result (a fresh copy the caller may modify) or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, payload = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._counters["hits"] += 1
+                    self._counters["memory_hits"] += 1
+                    return json.loads(payload)
+                del self._memory[key]
+                self._counters["expirations"] += 1
+
+        row = self._disk_get(key, now)
+        with self._lock:
+            if row is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["hits"] += 1
+            self._counters["disk_hits"] += 1
+            self._memory_put(key, row[0], row[1])
+        return json.loads(row[1])
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        """Store a result in both tiers"""
+        try:
+            payload = json.dumps(value, default=to_jsonable)
+        except (TypeError, ValueError) as e:
+            logging.warning(f"Result not cacheable: {e}")
+            with self._lock:
+                self._counters["errors"] += 1
+            return
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        with self._lock:
+            self._memory_put(key, expires_at, payload)
+            self._counters["stores"] += 1
+        self._disk_set(key, payload, now, expires_at)
+
+    def _memory_put(self, key: str, expires_at: float, payload: str) -> None:
+        # Caller holds self._lock
+        self._memory[key] = (expires_at, payload)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def _disk_get(self, key: str, now: float) -> Optional[Tuple[float, str]]:
+        if self._db is None:
+            return None
+        try:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT expires_at, value FROM result_cache WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+            return row
+        except sqlite3.Error as e:
+            logging.warning(f"Result cache disk read failed: {e}")
+            with self._lock:
+                self._counters["errors"] += 1
+            return None
+
+    def _disk_set(self, key: str, payload: str, now: float, expires_at: float) -> None:
+        if self._db is None:
+            return
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO result_cache (key, value, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                    (key, payload, now, expires_at)
+                )
+                self._disk_writes += 1
+                if self._disk_writes % self.disk_prune_every == 0:
+                    # Drop expired rows, then the oldest rows beyond the size bound
+                    # (reads skip expired rows, so the table may briefly overshoot)
+                    self._db.execute("DELETE FROM result_cache WHERE expires_at <= ?", (now,))
+                    self._db.execute(
+                        "DELETE FROM result_cache WHERE key IN ("
+                        " SELECT key FROM result_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                        (self.disk_max_entries,)
+                    )
+                self._db.commit()
+        except sqlite3.Error as e:
+            logging.warning(f"Result cache disk write failed: {e}")
+            with self._lock:
+                self._counters["errors"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else None
+        stats["max_entries"] = self.max_entries
+        stats["ttl_seconds"] = self.ttl_seconds
+        stats["disk_enabled"] = self._db is not None
+        return stats
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM result_cache")
+                self._db.commit()
+
+
+def is_cacheable(result: Dict[str, Any]) -> bool:
+    """Only real, successful assessments are worth replaying"""
+    return bool(result.get("success", True)) and not result.get("error") and not result.get("fallback")
+
+
+def mark_cached(result: Dict[str, Any], cached: bool) -> Dict[str, Any]:
+    """Flag a response so clients can tell replayed results from fresh ones"""
+    result["cached"] = cached
+    return result
+
+
+# Process-wide cache shared by every assessment engine
+result_cache = ResultCache(db_path=RESULT_CACHE_DB or None)
@@ -0,0 +1,149 @@
+"""
+In-flight request coalescing ("single flight")
+
+When the mobile app retries an upload on a flaky connection, several
+identical requests can be in flight at once. A SingleFlight lets the first
+caller for a key (image digest + engine parameters) do the work while later
+callers with the same key attach to it and receive a copy of its result, so
+a retry storm costs one model call.
+
+Sync and async callers are tracked separately: a blocked sync follower holds
+a thread, and must never wait on async work that may itself be queued for a
+thread. Async followers wait without holding an inference slot.
+
+If an async leader goes away (cancelled, or an error its followers should not
+inherit such as its own client disconnecting), waiting followers retry and
+one of them becomes the new leader.
+"""
+
+import asyncio
+import copy
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Tuple, Type
+
+
+class _LeaderGone(Exception):
+    """The leading call was cancelled before producing a result"""
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls that share a key"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self._async_calls: Dict[str, "asyncio.Future"] = {}
+        self._counters = {"calls": 0, "leaders": 0, "coalesced": 0, "retries": 0, "failures": 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def do(self, key: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Call fn(*args, **kwargs) unless a sync call for `key` is already running; then share its result"""
+        with self._lock:
+            self._counters["calls"] += 1
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self._counters["leaders"] += 1
+            else:
+                self._counters["coalesced"] += 1
+
+        if not leader:
+            return copy.deepcopy(future.result())
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self._count("failures")
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(copy.deepcopy(result))
+            return result
+        finally:
+            with self._lock:
+                if self._calls.get(key) is future:
+                    del self._calls[key]
+
+    async def do_async(self, key: str, fn: Callable[..., Awaitable[Any]], *args: Any,
+                       retry_on: Tuple[Type[BaseException], ...] = (), **kwargs: Any) -> Any:
+        """
+        Await fn(*args, **kwargs) unless an async call for `key` is already running; then share its result
+
+        Args:
+            retry_on: Leader errors that followers should not inherit; they retry instead
+        """
+        self._count("calls")
+        while True:
+            future = self._async_calls.get(key)
+            if future is None:
+                return await self._lead(key, fn, args, kwargs)
+            self._count("coalesced")
+            try:
+                # Shielded: a follower giving up must not cancel the shared call
+                result = await asyncio.shield(future)
+            except (_LeaderGone,) + tuple(retry_on):
+                self._count("retries")
+                logging.debug(f"{self.name}: leader for {key[:24]}... went away, retrying")
+                continue
+            return copy.deepcopy(result)
+
+    async def _lead(self, key: str, fn: Callable[..., Awaitable[Any]], args: tuple, kwargs: dict) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        self._async_calls[key] = future
+        self._count("leaders")
+        try:
+            result = await fn(*args, **kwargs)
+        except asyncio.CancelledError:
+            self._settle(future, _LeaderGone())
+            raise
+        except BaseException as e:
+            self._count("failures")
+            self._settle(future, e)
+            raise
+        else:
+            # Snapshot before the leader's caller can modify the result
+            future.set_result(copy.deepcopy(result))
+            return result
+        finally:
+            if self._async_calls.get(key) is future:
+                del self._async_calls[key]
+
+    @staticmethod
+    def _settle(future: "asyncio.Future", error: BaseException) -> None:
+        future.set_exception(error)
+        # Followers may be absent; don't log "exception was never retrieved"
+        future.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["in_flight"] = len(self._calls) + len(self._async_calls)
+        stats["coalesced_rate"] = round(stats["coalesced"] / stats["calls"], 4) if stats["calls"] else None
+        return stats
+
+
+# One SingleFlight per engine, by name
+_flights: Dict[str, SingleFlight] = {}
+_flights_lock = threading.Lock()
+
+
+def get_flight(name: str) -> SingleFlight:
+    with _flights_lock:
+        flight = _flights.get(name)
+        if flight is None:
+            flight = _flights[name] = SingleFlight(name)
+        return flight
+
+
+def flight_stats() -> Dict[str, Dict[str, Any]]:
+    """Coalescing counters of every engine in this process"""
+    with _flights_lock:
+        flights = list(_flights.values())
+    return {flight.name: flight.stats() for flight in flights}
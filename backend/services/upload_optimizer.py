@@ -0,0 +1,225 @@
+"""
+Shrink images before they are sent to the remote model
+
+Remote latency and request size grow with the image we upload, while the
+model only needs the cat's face. Before a remote call the decoded upload is:
+
+1. cropped to the face found by the local FelineFaceDetector, plus a margin
+   (UPLOAD_FACE_MARGIN, as a fraction of the face box on each side) so ears,
+   whiskers and head position stay visible. Only a box from the cat cascade
+   is used: a frontal-cascade box is usually a person, so the full frame is
+   sent instead (counted in not_cat_face), as when no face is found. A face
+   the local ELD pass already located on the same decoded upload is reused
+   instead of being detected again
+2. downsampled to UPLOAD_MAX_EDGE on its long edge
+3. re-encoded as JPEG or WebP at UPLOAD_QUALITY
+
+The model answers with landmark percentages of the image it saw;
+OptimizedUpload.remap_landmarks maps them back into percentages of the
+original upload, so clients see no difference. Byte savings are counted in
+upload_stats.
+
+The detector lives in eld.eld_model, which needs the ELD dependencies
+(numpy, OpenCV, torch, scikit-learn) that requirements.txt leaves commented
+out. Without them step 1 is skipped and the full image is downsampled;
+upload_stats reports this as face_crop.detector = "unavailable", and
+uploads sent uncropped for that reason are counted in no_detector.
+"""
+
+import io
+import os
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from PIL import Image
+
+from services.image_ingestion import IngestedImage
+
+UPLOAD_CROP_TO_FACE = os.getenv("UPLOAD_CROP_TO_FACE", "true").lower() in ("1", "true", "yes")
+UPLOAD_FACE_MARGIN = float(os.getenv("UPLOAD_FACE_MARGIN", "0.6"))
+UPLOAD_MAX_EDGE = int(os.getenv("UPLOAD_MAX_EDGE", "1024"))
+UPLOAD_FORMAT = os.getenv("UPLOAD_FORMAT", "JPEG").upper()
+UPLOAD_QUALITY = int(os.getenv("UPLOAD_QUALITY", "85"))
+
+# Part of the result cache version: these settings change what the model sees
+UPLOAD_SETTINGS_VERSION = (
+    f"crop={UPLOAD_CROP_TO_FACE}:margin={UPLOAD_FACE_MARGIN}:edge={UPLOAD_MAX_EDGE}"
+    f":format={UPLOAD_FORMAT}:quality={UPLOAD_QUALITY}"
+)
+
+_MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+
+class UploadStats:
+    """Process-wide counters of bytes received vs bytes sent to the remote model"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {"uploads": 0, "cropped": 0, "no_detector": 0, "not_cat_face": 0,
+                          "bytes_received": 0, "bytes_sent": 0}
+
+    def record(self, received: int, sent: int, cropped: bool, no_detector: bool = False,
+               not_cat_face: bool = False) -> None:
+        with self._lock:
+            self._counters["uploads"] += 1
+            self._counters["cropped"] += int(cropped)
+            self._counters["no_detector"] += int(no_detector)
+            self._counters["not_cat_face"] += int(not_cat_face)
+            self._counters["bytes_received"] += received
+            self._counters["bytes_sent"] += sent
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters)
+        stats["bytes_saved"] = stats["bytes_received"] - stats["bytes_sent"]
+        stats["sent_ratio"] = round(stats["bytes_sent"] / stats["bytes_received"], 4) if stats["bytes_received"] else None
+        stats["settings"] = UPLOAD_SETTINGS_VERSION
+        stats["face_crop"] = {"enabled": UPLOAD_CROP_TO_FACE, "detector": face_detector_status()}
+        return stats
+
+
+upload_stats = UploadStats()
+
+_detector = None
+_detector_unavailable = False
+_detector_lock = threading.Lock()
+
+
+def _face_detector():
+    """Shared FelineFaceDetector, or None when OpenCV / the cascade is unavailable"""
+    global _detector, _detector_unavailable
+    if _detector is None and not _detector_unavailable:
+        with _detector_lock:
+            if _detector is None and not _detector_unavailable:
+                try:
+                    from eld.eld_model import FelineFaceDetector
+                    _detector = FelineFaceDetector()
+                except Exception as e:
+                    _detector_unavailable = True
+                    logging.warning(f"Face crop disabled for remote uploads, the ELD dependencies are missing: {e}")
+    return _detector
+
+
+def face_detector_status() -> str:
+    """"loaded", "unavailable" (ELD dependencies missing) or "not_loaded" (no crop attempted yet)"""
+    if _detector is not None:
+        return "loaded"
+    return "unavailable" if _detector_unavailable else "not_loaded"
+
+
+def face_crop_box(ingested: IngestedImage, margin: float = UPLOAD_FACE_MARGIN) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Cat face box grown by `margin` on each side and clipped to the image, as
+    (left, top, right, bottom); None without a cat face (a frontal-cascade box included)
+    """
+    face, cascade = ingested.locate_face(None if ingested.face_located else _face_detector())
+    if face is None or cascade != "cat":
+        return None
+    x, y, w, h = (int(v) for v in face)
+    width, height = ingested.size
+    left = max(0, int(x - w * margin))
+    top = max(0, int(y - h * margin))
+    right = min(width, int(x + w * (1 + margin)))
+    bottom = min(height, int(y + h * (1 + margin)))
+    if right - left < 2 or bottom - top < 2:
+        return None
+    return left, top, right, bottom
+
+
+class OptimizedUpload:
+    """Encoded image for the remote model and the mapping back to the original"""
+
+    def __init__(self, data: bytes, mime_type: str, size: Tuple[int, int],
+                 crop_box: Tuple[int, int, int, int], source_size: Tuple[int, int], bytes_received: int):
+        self.data = data
+        self.mime_type = mime_type
+        self.size = size
+        self.crop_box = crop_box
+        self.source_size = source_size
+        self.bytes_received = bytes_received
+
+    @property
+    def cropped(self) -> bool:
+        return self.crop_box != (0, 0) + tuple(self.source_size)
+
+    def as_part(self) -> Dict[str, Any]:
+        """Inline blob for generate_content"""
+        return {"mime_type": self.mime_type, "data": self.data}
+
+    def to_original_percent(self, x: float, y: float) -> Tuple[float, float]:
+        """Map a 0-100 percentage point of the sent image to a percentage of the original"""
+        left, top, right, bottom = self.crop_box
+        width, height = self.source_size
+        ox = (left + x / 100.0 * (right - left)) / width * 100.0
+        oy = (top + y / 100.0 * (bottom - top)) / height * 100.0
+        return round(ox, 2), round(oy, 2)
+
+    def remap_landmarks(self, visual_landmarks: Any) -> Any:
+        """Map every {"x", "y"} point of a visual_landmarks dict back to original percentages"""
+        if not self.cropped or not isinstance(visual_landmarks, dict):
+            return visual_landmarks
+        for points in visual_landmarks.values():
+            if not isinstance(points, list):
+                continue
+            for point in points:
+                if not isinstance(point, dict):
+                    continue
+                x, y = point.get("x"), point.get("y")
+                if isinstance(x, (int, float)) and isinstance(y, (int, float)):
+                    point["x"], point["y"] = self.to_original_percent(x, y)
+        return visual_landmarks
+
+    def metadata(self) -> Dict[str, Any]:
+        sent = len(self.data)
+        return {
+            "cropped": self.cropped,
+            "crop_box": list(self.crop_box),
+            "sent_size": list(self.size),
+            "bytes_received": self.bytes_received,
+            "bytes_sent": sent,
+            "bytes_saved": self.bytes_received - sent,
+        }
+
+
+def optimize_upload(ingested: IngestedImage, bytes_received: int, crop_to_face: bool = UPLOAD_CROP_TO_FACE,
+                    max_edge: int = UPLOAD_MAX_EDGE, image_format: str = UPLOAD_FORMAT,
+                    quality: int = UPLOAD_QUALITY) -> OptimizedUpload:
+    """
+    Crop, downsample and re-encode a decoded upload for the remote model
+
+    Args:
+        ingested: Decoded upload (see services.image_ingestion.load_image)
+        bytes_received: Size of the original upload, for savings accounting
+    """
+    image = ingested.as_pil()
+    source_size = image.size
+    crop_box = (0, 0) + tuple(source_size)
+    no_detector = not_cat_face = False
+    if crop_to_face:
+        try:
+            crop_box = face_crop_box(ingested) or crop_box
+        except Exception as e:
+            logging.warning(f"Face crop failed, sending the full image: {e}")
+        if crop_box != (0, 0) + tuple(source_size):
+            image = image.crop(crop_box)
+        else:
+            no_detector = not ingested.face_located and _detector_unavailable
+            not_cat_face = ingested.face_located and ingested.locate_face()[1] == "frontal"
+
+    if max(image.size) > max_edge:
+        # resize returns a new image; the ingested one is left untouched
+        ratio = max_edge / float(max(image.size))
+        new_size = (max(1, round(image.size[0] * ratio)), max(1, round(image.size[1] * ratio)))
+        image = image.resize(new_size, Image.Resampling.LANCZOS)
+
+    if image_format not in _MIME_TYPES:
+        image_format = "JPEG"
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, quality=quality, optimize=image_format == "JPEG")
+    data = buffer.getvalue()
+
+    upload = OptimizedUpload(data, _MIME_TYPES[image_format], image.size, crop_box, source_size, bytes_received)
+    upload_stats.record(bytes_received, len(data), upload.cropped, no_detector, not_cat_face)
+    logging.debug(f"Remote upload {source_size} -> {image.size}, {bytes_received} -> {len(data)} bytes")
+    return upload